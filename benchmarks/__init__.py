@@ -0,0 +1,11 @@
+"""
+=============================================================================
+BENCHMARKS - HABIT TRACKER
+=============================================================================
+Mediciones de la app contra el backend en memoria (utils/memory_db.py) con
+datos sintéticos (utils/workload.py):
+
+- benchmarks.pages: tiempo, round-trips y memoria de cada página por rerun
+- benchmarks.load: sesiones concurrentes con journeys completos (throughput,
+  percentiles, CPU y memoria del proceso)
+"""
@@ -0,0 +1,204 @@
+"""
+=============================================================================
+UTILIDADES COMUNES DE LOS BENCHMARKS - HABIT TRACKER
+=============================================================================
+Backend en memoria instalado como base de datos de la app, usuarios
+sintéticos con su sesión de Streamlit y archivos de resultados por commit.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import streamlit as st
+
+import utils.database as database
+from utils.memory_db import MemoryDB
+from utils.workload import generate_user, load_user, load_workload, make_profile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Carpeta de resultados (ignorada por git, como el resto de .habit_tracker)
+RESULTS_DIR = os.getenv("HABIT_BENCH_DIR", os.path.join(REPO_DIR, ".habit_tracker", "benchmarks"))
+
+# Contraseña de los usuarios sintéticos (solo existen en el backend en memoria)
+BENCH_PASSWORD = "benchmark-password"
+
+
+
+def install_backend(latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0) -> MemoryDB:
+    """
+    Crear un MemoryDB y dejarlo como la base de datos de la app (get_db)
+
+    También activa la traza por rerun, de donde salen los round-trips, y
+    vacía las cachés de Streamlit (init_database de main.py guarda el
+    backend anterior en cache_resource).
+
+    Args:
+        latency_ms: Latencia simulada por round-trip
+        jitter_ms: Variación de la latencia
+        seed: Semilla del jitter
+
+    Returns:
+        El MemoryDB instalado
+    """
+    db = MemoryDB(latency_ms=latency_ms, jitter_ms=jitter_ms, seed=seed)
+
+    with database._registry_lock:
+        database._shared_db = db
+    database.TRACE_QUERIES_ENABLED = True
+
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+    return db
+
+
+def seed_user(db: MemoryDB, size: str, seed: int = 42, index: int = 0) -> Dict[str, Any]:
+    """
+    Cargar un usuario típico del tamaño dado (sin sesgo de nivel)
+
+    Args:
+        db: Backend en memoria
+        size: "small", "medium" o "huge" (ver utils.workload.PROFILES)
+        seed: Semilla de los datos
+        index: Número de usuario
+
+    Returns:
+        Diccionario con email, user_id y las filas cargadas por tabla
+    """
+    profile = make_profile(size, users=1, user_skew=0.0)
+    # Relativo a hoy: las páginas filtran por date.today() (últimos 7 días,
+    # semana actual, periodo del historial)
+    dataset = generate_user(profile, seed, index)
+
+    # La latencia simulada no cuenta para la carga
+    latency, jitter = db.latency_ms, db.jitter_ms
+    db.latency_ms = db.jitter_ms = 0.0
+    try:
+        summary = load_user(db, dataset, BENCH_PASSWORD)
+    finally:
+        db.latency_ms, db.jitter_ms = latency, jitter
+
+    if not summary["success"]:
+        raise RuntimeError(f"No se pudo cargar {dataset['email']}: {summary.get('message')}")
+
+    db.cache.clear()
+    db.metrics.reset()
+    db.usage.reset()
+    return summary
+
+
+def seed_users(db: MemoryDB, size: str, count: int, seed: int = 42, workers: int = 4) -> List[Dict[str, Any]]:
+    """
+    Cargar count usuarios del tamaño dado, con el sesgo de actividad normal
+    (pocos usuarios intensivos, muchos ocasionales)
+
+    Returns:
+        Lista de {email, user_id}
+    """
+    profile = make_profile(size, users=count)
+
+    latency, jitter = db.latency_ms, db.jitter_ms
+    db.latency_ms = db.jitter_ms = 0.0
+    try:
+        totals = load_workload(db, profile, seed, BENCH_PASSWORD, workers=workers)
+    finally:
+        db.latency_ms, db.jitter_ms = latency, jitter
+
+    if totals["failed_users"]:
+        raise RuntimeError(f"No se pudieron cargar {totals['failed_users']} usuarios")
+
+    db.cache.clear()
+    db.metrics.reset()
+    db.usage.reset()
+    return totals["users"]
+
+
+def login_state(db: MemoryDB, email: str) -> Dict[str, Any]:
+    """
+    Valores de st.session_state de un usuario autenticado (como tras el login)
+
+    Args:
+        db: Backend en memoria
+        email: Usuario cargado con seed_user
+
+    Returns:
+        Diccionario con authenticated, user, user_id y los tokens
+    """
+    auth = db.sign_in(email, BENCH_PASSWORD)
+    if not auth["success"]:
+        raise RuntimeError(auth["message"])
+
+    return {
+        "authenticated": True,
+        "user": SimpleNamespace(id=auth["user"].id, email=auth["user"].email),
+        "user_id": auth["user"].id,
+        "access_token": auth["session"].access_token,
+        "refresh_token": auth["session"].refresh_token,
+        "expires_at": auth["session"].expires_at
+    }
+
+
+# =============================================================================
+# RESULTADOS
+# =============================================================================
+
+def git_revision() -> str:
+    """Commit actual (con "-dirty" si hay cambios sin commitear)"""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(kind: str, results: List[Dict[str, Any]], settings: Dict[str, Any]) -> str:
+    """
+    Guardar los resultados de un benchmark en RESULTS_DIR/<kind>-<commit>.json
+
+    Args:
+        kind: Nombre del benchmark ("pages", "load")
+        results: Filas de resultados
+        settings: Parámetros de la corrida
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    revision = git_revision()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{kind}-{revision}.json")
+
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({
+            "kind": kind,
+            "revision": revision,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "settings": settings,
+            "results": results
+        }, file, indent=2, default=str)
+
+    return path
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Leer un archivo escrito por save_results"""
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
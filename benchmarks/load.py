@@ -0,0 +1,474 @@
+"""
+=============================================================================
+PRUEBA DE CARGA DE SESIONES CONCURRENTES - HABIT TRACKER
+=============================================================================
+Simula N usuarios autenticados a la vez en un solo proceso, cada uno en su
+hilo (como las sesiones del servidor de Streamlit), recorriendo:
+
+    login → inicio → dashboard → registrar sesión → historial
+
+Las páginas se ejecutan con AppTest (el mismo script que sirve Streamlit,
+sin navegador) contra el backend en memoria con latencia simulada. El login
+y el registro llaman a lo mismo que los formularios (sign_in, cola de
+sesiones) sin sus pausas de interfaz (time.sleep antes de st.rerun).
+
+Reporta journeys/s, percentiles de latencia por paso, CPU y memoria del
+proceso, y el atraso de la cola de escritura de sesiones al terminar. El
+backend en memoria vive en el mismo proceso: su CPU (medida dentro de cada
+operación) se reporta aparte de la de la app, y la memoria de la app se
+cuenta desde la RSS con los datos ya cargados.
+
+    python -m benchmarks.load --users 20 --duration 60 --latency-ms 30 --jitter-ms 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+import utils.session_queue as session_queue
+from benchmarks.common import (
+    BENCH_PASSWORD,
+    REPO_DIR,
+    elapsed_ms,
+    install_backend,
+    save_results,
+    seed_users
+)
+from utils.database import get_db, get_user_db, store_session
+from utils.instrumentation import percentile
+from utils.workload import PROFILES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Pasos de cada journey y la página que renderizan (None = solo datos)
+JOURNEY = [
+    ("login", None),
+    ("home", "main.py"),
+    ("dashboard", os.path.join("pages", "01_Dashboard.py")),
+    ("register_session", None),
+    ("history", os.path.join("pages", "04_Registrar_Sesion.py"))
+]
+
+# Segundos máximos de un rerun antes de que AppTest lo corte
+RERUN_TIMEOUT_SECONDS = 120
+
+# Cada cuánto se muestrean CPU y memoria del proceso
+SAMPLE_INTERVAL_SECONDS = 0.5
+
+STEP_COLUMNS = ["step", "count", "errors", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+
+
+def _rss_mb() -> Optional[float]:
+    """Memoria residente actual del proceso (solo Linux)"""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ResourceSampler:
+    """
+    Muestreo en segundo plano de CPU (todos los hilos) y memoria del proceso
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.samples: List[Dict[str, Any]] = []
+
+        self._started_wall = 0.0
+        self._started_cpu = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="load-sampler", daemon=True)
+
+    def _cpu_seconds(self) -> float:
+        times = os.times()
+        return times.user + times.system
+
+    def _run(self) -> None:
+        last_wall, last_cpu = time.perf_counter(), self._cpu_seconds()
+
+        while not self._stop.wait(self.interval):
+            wall, cpu = time.perf_counter(), self._cpu_seconds()
+            self.samples.append({
+                "cpu_percent": round((cpu - last_cpu) / (wall - last_wall) * 100, 1),
+                "rss_mb": _rss_mb(),
+                "threads": threading.active_count()
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def start(self) -> None:
+        self._started_wall = time.perf_counter()
+        self._started_cpu = self._cpu_seconds()
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Terminar el muestreo
+
+        Returns:
+            Diccionario con cpu_seconds, cpu_percent (promedio, 100 = un
+            núcleo), cpu_percent_max, rss_mb_max, max_rss_mb y threads_max
+        """
+        self._stop.set()
+        self._thread.join()
+
+        wall = time.perf_counter() - self._started_wall
+        cpu = self._cpu_seconds() - self._started_cpu
+        rss = [sample["rss_mb"] for sample in self.samples if sample["rss_mb"] is not None]
+
+        return {
+            "cpu_seconds": round(cpu, 2),
+            "cpu_percent": round(cpu / wall * 100, 1) if wall else 0.0,
+            "cpu_percent_max": max((sample["cpu_percent"] for sample in self.samples), default=None),
+            "rss_mb_max": max(rss, default=None),
+            # Pico histórico del proceso (incluye la carga de datos)
+            "max_rss_mb": (
+                round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+                if resource is not None and sys.platform.startswith("linux") else None
+            ),
+            "threads_max": max((sample["threads"] for sample in self.samples), default=None)
+        }
+
+
+# =============================================================================
+# USUARIO VIRTUAL
+# =============================================================================
+
+class VirtualUser:
+    """
+    Una sesión de navegador: su session_state y un AppTest por página
+    """
+
+    def __init__(self, email: str, seed: int, think_ms: float = 0.0):
+        """
+        Args:
+            email: Usuario cargado con seed_users
+            seed: Semilla de las decisiones del usuario (actividad, duración)
+            think_ms: Pausa media entre pasos
+        """
+        self.email = email
+        self.think_ms = think_ms
+        self.random = random.Random(seed)
+
+        self.state: Dict[str, Any] = {}
+        self.apps: Dict[str, AppTest] = {}
+
+    def login(self) -> None:
+        # Lo mismo que el formulario de main.py
+        result = get_db().sign_in(self.email, BENCH_PASSWORD)
+        if not result.get("success"):
+            raise RuntimeError(result.get("message"))
+
+        self.state = {
+            "authenticated": True,
+            "user": result["user"],
+            "user_id": result["user"].id
+        }
+        store_session(self.state, result["session"])
+
+    def render(self, script: str) -> None:
+        app = self.apps.get(script)
+        if app is None:
+            app = self.apps[script] = AppTest.from_file(
+                os.path.join(REPO_DIR, script),
+                default_timeout=RERUN_TIMEOUT_SECONDS
+            )
+
+        for key, value in self.state.items():
+            app.session_state[key] = value
+
+        app.run()
+
+        if app.exception:
+            raise RuntimeError(getattr(app.exception[0], "value", app.exception[0]))
+
+        # La página pudo renovar el token
+        for key in ("access_token", "refresh_token", "expires_at"):
+            if key in app.session_state:
+                self.state[key] = app.session_state[key]
+
+    def register_session(self) -> None:
+        # Lo mismo que el formulario de Registrar Sesión
+        db = get_user_db(self.state)
+        user_id = self.state["user_id"]
+
+        activities = db.get_user_activities(user_id, columns="list")
+        if activities.empty:
+            raise RuntimeError("El usuario no tiene actividades")
+
+        queued = session_queue.get_session_queue().enqueue(
+            db,
+            user_id,
+            activity_id=self.random.choice(activities["id"].tolist()),
+            duration_minutes=self.random.choice([15, 30, 45, 60, 90]),
+            session_date=date.today(),
+            mood=self.random.randint(1, 5),
+            productivity_level=self.random.randint(1, 5)
+        )
+        if queued is None:
+            raise RuntimeError("Sesión rechazada")
+
+    def run_step(self, step: str, script: Optional[str]) -> None:
+        if step == "login":
+            self.login()
+        elif step == "register_session":
+            self.register_session()
+        else:
+            self.render(script)
+
+    def think(self) -> None:
+        if self.think_ms > 0:
+            time.sleep(self.random.uniform(0, 2 * self.think_ms) / 1000)
+
+
+# =============================================================================
+# PRUEBA
+# =============================================================================
+
+def run_load_test(
+    users: int,
+    duration: float,
+    size: str = "small",
+    latency_ms: float = 30.0,
+    jitter_ms: float = 10.0,
+    think_ms: float = 0.0,
+    ramp_up: float = 0.0,
+    iterations: int = None,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """
+    Ejecutar la prueba de carga
+
+    Args:
+        users: Sesiones concurrentes (un usuario sintético cada una)
+        duration: Segundos de prueba (cada sesión termina su journey actual)
+        size: Tamaño de los usuarios (utils.workload.PROFILES)
+        latency_ms: Latencia simulada por round-trip
+        jitter_ms: Variación de la latencia
+        think_ms: Pausa media entre pasos de un usuario
+        ramp_up: Segundos en los que se van sumando las sesiones
+        iterations: Journeys por sesión (default: sin límite, hasta duration)
+        seed: Semilla de datos, latencia y decisiones
+
+    Returns:
+        Diccionario con summary (throughput, CPU, memoria, cola) y steps
+        (DataFrame con STEP_COLUMNS, incluida la fila "journey")
+    """
+    db = install_backend(latency_ms=latency_ms, jitter_ms=jitter_ms, seed=seed)
+
+    # Sesiones registradas en un journal temporal, no en el de la app
+    journal_dir = tempfile.mkdtemp(prefix="habit-load-")
+    queue = session_queue.SessionWriteQueue(os.path.join(journal_dir, "journal.jsonl"))
+    session_queue._shared_queue = queue
+
+    accounts = seed_users(db, size, users, seed)
+    # Memoria con los datos cargados: lo que la supere es de la app
+    rss_baseline = _rss_mb()
+
+    timings: Dict[str, List[float]] = {step: [] for step, _ in JOURNEY}
+    timings["journey"] = []
+    errors: Dict[str, int] = {step: 0 for step in timings}
+    error_samples: List[str] = []
+    lock = threading.Lock()
+
+    deadline = threading.Event()
+
+    def session(index: int, email: str) -> None:
+        user = VirtualUser(email, seed * 100003 + index, think_ms)
+
+        if ramp_up > 0:
+            time.sleep(ramp_up * index / users)
+
+        completed = 0
+        while not deadline.is_set() and (iterations is None or completed < iterations):
+            journey_started = time.perf_counter()
+            failed = False
+
+            for step, script in JOURNEY:
+                started = time.perf_counter()
+                try:
+                    user.run_step(step, script)
+                except Exception as e:
+                    failed = True
+                    with lock:
+                        errors[step] += 1
+                        if len(error_samples) < 20:
+                            error_samples.append(f"{step}: {e}")
+                    break
+                finally:
+                    with lock:
+                        timings[step].append(elapsed_ms(started))
+
+                user.think()
+
+            with lock:
+                if failed:
+                    errors["journey"] += 1
+                else:
+                    timings["journey"].append(elapsed_ms(journey_started))
+
+            completed += 1
+
+    sampler = ResourceSampler()
+    threads = [
+        threading.Thread(target=session, args=(index, account["email"]), name=f"load-user-{index}")
+        for index, account in enumerate(accounts)
+    ]
+
+    started = time.perf_counter()
+    sampler.start()
+    for thread in threads:
+        thread.start()
+
+    if iterations is None:
+        deadline.wait(duration)
+        deadline.set()
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - started
+    resources = sampler.stop()
+    backend = db.usage.snapshot()
+
+    # Lo que quedó en la cola de escritura al terminar, y cuánto tarda en vaciarse
+    pending = queue.stats()["pending"]
+    drain_started = time.perf_counter()
+    queue.flush()
+    drain_ms = elapsed_ms(drain_started)
+
+    steps = pd.DataFrame([
+        _step_stats(step, timings[step], errors[step])
+        for step in [step for step, _ in JOURNEY] + ["journey"]
+    ], columns=STEP_COLUMNS)
+
+    journeys = len(timings["journey"])
+    step_count = sum(len(timings[step]) for step, _ in JOURNEY)
+
+    summary = {
+        "users": users,
+        "size": size,
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "think_ms": think_ms,
+        "seconds": round(elapsed, 2),
+        "journeys": journeys,
+        "failed_journeys": errors["journey"],
+        "journeys_per_second": round(journeys / elapsed, 2) if elapsed else 0.0,
+        "steps_per_second": round(step_count / elapsed, 2) if elapsed else 0.0,
+        "pending_sessions": pending,
+        "queue_drain_ms": drain_ms,
+        **resources,
+        # CPU y tiempo dentro del backend en memoria, sin la latencia simulada
+        "backend_calls": backend["calls"],
+        "backend_seconds": backend["seconds"],
+        "backend_cpu_seconds": backend["cpu_seconds"],
+        "app_cpu_seconds": round(resources["cpu_seconds"] - backend["cpu_seconds"], 2),
+        "app_cpu_percent": (
+            round((resources["cpu_seconds"] - backend["cpu_seconds"]) / elapsed * 100, 1)
+            if elapsed else 0.0
+        ),
+        "rss_baseline_mb": rss_baseline,
+        "app_rss_mb_max": (
+            round(resources["rss_mb_max"] - rss_baseline, 1)
+            if resources["rss_mb_max"] is not None and rss_baseline is not None else None
+        )
+    }
+
+    return {
+        "summary": summary,
+        "steps": steps,
+        "queries": db.query_report(),
+        "error_samples": error_samples
+    }
+
+
+def _step_stats(step: str, values: List[float], errors: int) -> Dict[str, Any]:
+    ordered = sorted(values)
+    return {
+        "step": step,
+        "count": len(ordered),
+        "errors": errors,
+        "mean_ms": round(sum(ordered) / len(ordered), 1) if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+        "max_ms": ordered[-1] if ordered else 0.0
+    }
+
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga con sesiones concurrentes")
+    parser.add_argument("--users", type=int, default=10, help="Sesiones concurrentes")
+    parser.add_argument("--duration", type=float, default=30.0, help="Segundos de prueba")
+    parser.add_argument("--iterations", type=int, help="Journeys por sesión (en lugar de --duration)")
+    parser.add_argument("--size", choices=list(PROFILES), default="small", help="Tamaño de los usuarios")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Latencia simulada por round-trip")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Variación de la latencia (±)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pausa media entre pasos")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Segundos para sumar todas las sesiones")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla")
+    args = parser.parse_args(argv)
+
+    print(f"⏳ Cargando {args.users} usuarios ({args.size})...", flush=True)
+
+    result = run_load_test(
+        args.users,
+        args.duration,
+        size=args.size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        think_ms=args.think_ms,
+        ramp_up=args.ramp_up,
+        iterations=args.iterations,
+        seed=args.seed
+    )
+    summary = result["summary"]
+
+    print(
+        f"✅ {summary['journeys']} journeys en {summary['seconds']}s "
+        f"({summary['journeys_per_second']}/s, {summary['steps_per_second']} pasos/s), "
+        f"{summary['failed_journeys']} fallidos"
+    )
+    print(
+        f"🖥️ CPU {summary['cpu_percent']}% (máx {summary['cpu_percent_max']}%): "
+        f"app {summary['app_cpu_seconds']}s · backend {summary['backend_cpu_seconds']}s "
+        f"en {summary['backend_calls']} operaciones ({summary['backend_seconds']}s dentro del backend)"
+    )
+    print(
+        f"💾 RSS máx {summary['rss_mb_max']} MB (datos {summary['rss_baseline_mb']} MB, "
+        f"app +{summary['app_rss_mb_max']} MB) · {summary['threads_max']} hilos · "
+        f"cola: {summary['pending_sessions']} pendientes ({summary['queue_drain_ms']} ms en vaciar)"
+    )
+    print(result["steps"].to_string(index=False))
+
+    if not result["queries"].empty:
+        print(result["queries"][["method", "calls", "p50_ms", "p95_ms", "p99_ms"]].head(10).to_string(index=False))
+
+    for sample in result["error_samples"]:
+        print(f"  ❌ {sample}")
+
+    path = save_results("load", result["steps"].to_dict("records"), {**vars(args), **summary})
+    print(f"📁 Resultados en {path}")
+
+    return 0 if summary["failed_journeys"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
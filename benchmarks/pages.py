@@ -0,0 +1,320 @@
+"""
+=============================================================================
+BENCHMARK DE PÁGINAS - HABIT TRACKER
+=============================================================================
+Renderiza main.py y cada archivo de pages/ sin navegador (AppTest de
+Streamlit) contra el backend en memoria, con un usuario sintético de cada
+tamaño (small, medium, huge), y mide por rerun:
+
+- tiempo de pared del primer rerun (caché de lecturas vacía) y de los
+  siguientes (caché caliente)
+- round-trips a la capa de datos y consultas duplicadas (traza del rerun)
+- pico de memoria de Python (tracemalloc) de un rerun con la caché vacía
+
+Los resultados se guardan en .habit_tracker/benchmarks/pages-<commit>.json;
+--compare muestra las diferencias con una corrida anterior y falla si hay
+regresiones.
+
+    python -m benchmarks.pages
+    python -m benchmarks.pages --sizes huge --pages 02_Mis_Habitos --latency-ms 20
+    python -m benchmarks.pages --compare .habit_tracker/benchmarks/pages-abc1234.json
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.common import (
+    REPO_DIR,
+    elapsed_ms,
+    install_backend,
+    load_results,
+    login_state,
+    save_results,
+    seed_user
+)
+from utils.tracing import last_trace, page_name
+from utils.workload import PROFILES
+
+# Reruns con la caché caliente por página
+DEFAULT_RUNS = 3
+
+# Segundos máximos de un rerun antes de que AppTest lo corte
+RERUN_TIMEOUT_SECONDS = 300
+
+# Aumento relativo que se considera regresión en tiempos y memoria
+DEFAULT_THRESHOLD = 0.2
+
+RESULT_COLUMNS = [
+    "size", "page", "sessions", "cold_ms", "warm_ms", "cold_round_trips",
+    "warm_round_trips", "duplicates", "peak_mb", "error"
+]
+
+# Métricas comparadas entre corridas (ver compare_results)
+COMPARED_METRICS = ["cold_ms", "warm_ms", "peak_mb", "cold_round_trips", "warm_round_trips", "duplicates"]
+
+
+def page_scripts() -> List[str]:
+    """main.py y las páginas de pages/, en el orden de la barra lateral"""
+    pages = sorted(
+        path for path in glob.glob(os.path.join(REPO_DIR, "pages", "*.py"))
+        if not os.path.basename(path).startswith("__")
+    )
+    return [os.path.join(REPO_DIR, "main.py")] + pages
+
+
+def _rerun(app: AppTest, page: str, measure_memory: bool = False) -> Dict[str, Any]:
+    """
+    Ejecutar un rerun y medirlo
+
+    Returns:
+        Diccionario con ms, round_trips, duplicates, peak_mb y error
+    """
+    started_at = time.time()
+
+    if measure_memory:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    try:
+        app.run()
+    finally:
+        ms = elapsed_ms(started)
+        peak_mb = None
+        if measure_memory:
+            peak_mb = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            tracemalloc.stop()
+
+    errors = [str(getattr(element, "value", element)) for element in app.exception]
+
+    # La traza es de este rerun solo si la abrió get_user_db después de
+    # empezar; sin ella no hay round-trips que reportar (no son 0)
+    trace = last_trace(page)
+    if trace is None or trace.started_at < started_at:
+        round_trips, duplicates = None, None
+        errors.append("El rerun no abrió una traza de consultas")
+    else:
+        round_trips, duplicates = trace.round_trips, trace.duplicates
+
+    return {
+        "ms": ms,
+        "round_trips": round_trips,
+        "duplicates": duplicates,
+        "peak_mb": peak_mb,
+        "error": errors[0] if errors else None
+    }
+
+
+def benchmark_page(
+    db,
+    script: str,
+    state: Dict[str, Any],
+    runs: int = DEFAULT_RUNS
+) -> Dict[str, Any]:
+    """
+    Medir una página: un rerun en frío, runs en caliente y uno en frío con
+    tracemalloc (la medición de memoria agrega tiempo, por eso va aparte)
+
+    Args:
+        db: Backend en memoria instalado (install_backend)
+        script: Ruta del script de Streamlit
+        state: Valores de session_state (login_state)
+        runs: Reruns con la caché caliente
+
+    Returns:
+        Fila con las columnas de RESULT_COLUMNS (salvo size y sessions)
+    """
+    page = page_name(script)
+
+    app = AppTest.from_file(script, default_timeout=RERUN_TIMEOUT_SECONDS)
+    for key, value in state.items():
+        app.session_state[key] = value
+
+    db.cache.clear()
+    cold = _rerun(app, page)
+    warm = [_rerun(app, page) for _ in range(runs)]
+
+    db.cache.clear()
+    memory = _rerun(app, page, measure_memory=True)
+
+    error = next((run["error"] for run in [cold, *warm, memory] if run["error"]), None)
+
+    return {
+        "page": page,
+        "cold_ms": cold["ms"],
+        "warm_ms": round(statistics.median(run["ms"] for run in warm), 1) if warm else None,
+        "cold_round_trips": cold["round_trips"],
+        "warm_round_trips": max(
+            (run["round_trips"] for run in warm if run["round_trips"] is not None),
+            default=None
+        ),
+        "duplicates": cold["duplicates"],
+        "peak_mb": memory["peak_mb"],
+        "error": error
+    }
+
+
+def run_benchmark(
+    sizes: List[str],
+    pages: Optional[List[str]] = None,
+    runs: int = DEFAULT_RUNS,
+    latency_ms: float = 0.0,
+    seed: int = 42,
+    on_result=None
+) -> pd.DataFrame:
+    """
+    Medir todas las páginas en cada tamaño
+
+    Args:
+        sizes: Tamaños de utils.workload.PROFILES
+        pages: Nombres de página a medir (default: todas)
+        runs: Reruns con la caché caliente por página
+        latency_ms: Latencia simulada por round-trip
+        seed: Semilla de los datos
+        on_result: Función llamada con cada fila
+
+    Returns:
+        DataFrame con RESULT_COLUMNS
+    """
+    scripts = [
+        script for script in page_scripts()
+        if not pages or page_name(script) in pages
+    ]
+    rows = []
+
+    for size in sizes:
+        db = install_backend(latency_ms=latency_ms, seed=seed)
+
+        user = seed_user(db, size, seed)
+        state = login_state(db, user["email"])
+
+        for script in scripts:
+            row = {
+                "size": size,
+                "sessions": user["inserted"] + user["duplicates"],
+                **benchmark_page(db, script, state, runs)
+            }
+            rows.append(row)
+
+            if on_result:
+                on_result(row)
+
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def compare_results(
+    base: pd.DataFrame,
+    current: pd.DataFrame,
+    threshold: float = DEFAULT_THRESHOLD
+) -> pd.DataFrame:
+    """
+    Comparar dos corridas
+
+    Los tiempos y la memoria son regresión si suben más de threshold; los
+    round-trips y duplicados, si suben en cualquier cantidad.
+
+    Args:
+        base: Resultados de referencia
+        current: Resultados nuevos
+        threshold: Aumento relativo tolerado
+
+    Returns:
+        DataFrame con size, page, metric, base, current, change y regression
+    """
+    merged = base.merge(current, on=["size", "page"], suffixes=("_base", "_current"))
+    rows = []
+
+    for _, row in merged.iterrows():
+        for metric in COMPARED_METRICS:
+            before, after = row[f"{metric}_base"], row[f"{metric}_current"]
+            if pd.isna(before) or pd.isna(after):
+                continue
+
+            change = (after - before) / before if before else (float("inf") if after else 0.0)
+            tolerance = threshold if metric in ("cold_ms", "warm_ms", "peak_mb") else 0.0
+
+            rows.append({
+                "size": row["size"],
+                "page": row["page"],
+                "metric": metric,
+                "base": before,
+                "current": after,
+                "change": round(change * 100, 1) if change != float("inf") else change,
+                "regression": change > tolerance
+            })
+
+    return pd.DataFrame(rows, columns=["size", "page", "metric", "base", "current", "change", "regression"])
+
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de renderizado de páginas (AppTest)")
+    parser.add_argument("--sizes", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--pages", nargs="+", help="Páginas a medir (p. ej. main 01_Dashboard)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Reruns en caliente por página")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia simulada por round-trip")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de los datos")
+    parser.add_argument("--compare", help="Resultados anteriores (pages-<commit>.json)")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Aumento relativo de tiempo/memoria tolerado al comparar"
+    )
+    args = parser.parse_args(argv)
+
+    def report(row: Dict[str, Any]) -> None:
+        status = f"❌ {row['error']}" if row["error"] else "✅"
+        print(
+            f"  {row['size']:<6} {row['page']:<22} frío {row['cold_ms']:>8.1f} ms · "
+            f"caliente {row['warm_ms'] or 0:>8.1f} ms · {row['cold_round_trips']} round-trips · "
+            f"{row['peak_mb']} MB {status}",
+            flush=True
+        )
+
+    results = run_benchmark(
+        args.sizes,
+        pages=args.pages,
+        runs=args.runs,
+        latency_ms=args.latency_ms,
+        seed=args.seed,
+        on_result=report
+    )
+
+    path = save_results("pages", results.to_dict("records"), {
+        "sizes": args.sizes,
+        "runs": args.runs,
+        "latency_ms": args.latency_ms,
+        "seed": args.seed
+    })
+    print(f"📁 Resultados en {path}")
+
+    failed = results["error"].notna().any()
+
+    if args.compare:
+        base = pd.DataFrame(load_results(args.compare)["results"])
+        comparison = compare_results(base, results, args.threshold)
+        regressions = comparison[comparison["regression"]]
+
+        if regressions.empty:
+            print("✅ Sin regresiones")
+        else:
+            print(f"⚠️ {len(regressions)} regresiones:")
+            print(regressions.drop(columns=["regression"]).to_string(index=False))
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
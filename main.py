@@ -7,8 +7,9 @@ Sistema de tracking de hábitos con cruces inteligentes entre actividades y meta
 
 import streamlit as st
 import time
-from utils.database import SupabaseDB
-from utils.helpers import validate_email, validate_password
+from datetime import date, timedelta
+from utils.database import QUERY_PANEL_ENABLED, get_db, get_user_db, store_session
+from utils.helpers import show_data_errors, validate_email, validate_password
 
 # Configuración de la página
 st.set_page_config(
@@ -75,7 +76,7 @@ st.markdown("""
 def init_database():
     """Inicializar conexión con Supabase"""
     try:
-        return SupabaseDB()
+        return get_db()
     except Exception as e:
         st.error(f"Error conectando con Supabase: {e}")
         st.stop()
@@ -89,6 +90,8 @@ if "user" not in st.session_state:
     st.session_state.user = None
 if "user_id" not in st.session_state:
     st.session_state.user_id = None
+if "access_token" not in st.session_state:
+    st.session_state.access_token = None
 
 
 def login_page():
@@ -143,6 +146,7 @@ def login_page():
                             st.session_state.authenticated = True
                             st.session_state.user = result.get("user")
                             st.session_state.user_id = result["user"].id
+                            store_session(st.session_state, result.get("session"))
                             st.success("✅ ¡Bienvenido de vuelta!")
                             time.sleep(1)
                             st.rerun()
@@ -225,6 +229,29 @@ def login_page():
 def main_app():
     """Aplicación principal (después de login)"""
 
+    # Cliente ligado al JWT de este usuario
+    db = get_user_db(st.session_state)
+
+    # Obtener datos (consultas en paralelo)
+    data = db.fetch_many(
+        habits=("get_user_habits", st.session_state.user_id, {"columns": "list"}),
+        activities=("get_user_activities", st.session_state.user_id, {"columns": "list"}),
+        progress=("get_habit_progress", st.session_state.user_id),
+        recent_sessions=(
+            "get_user_sessions",
+            st.session_state.user_id,
+            10,
+            date.today() - timedelta(days=7),
+            {"columns": "summary"}
+        )
+    )
+    habits = data["habits"]
+    activities = data["activities"]
+    progress = data["progress"]
+    recent_sessions = data["recent_sessions"]
+
+    show_data_errors(db)
+
     # Sidebar
     with st.sidebar:
         st.markdown(f"### 👤 {st.session_state.user.email}")
@@ -247,10 +274,6 @@ def main_app():
         # Estadísticas rápidas
         st.markdown("### 📊 Resumen Rápido")
 
-        # Obtener datos
-        habits = db.get_user_habits(st.session_state.user_id)
-        activities = db.get_user_activities(st.session_state.user_id)
-
         col1, col2 = st.columns(2)
         with col1:
             st.metric("Hábitos", len(habits))
@@ -259,12 +282,28 @@ def main_app():
 
         st.markdown("---")
 
+        # Latencia por consulta (HABIT_QUERY_PANEL=1)
+        if QUERY_PANEL_ENABLED:
+            with st.expander("⏱️ Consultas a Supabase"):
+                report = db.query_report()
+                if report.empty:
+                    st.caption("Sin consultas registradas")
+                else:
+                    st.dataframe(
+                        report[["method", "calls", "errors", "p50_ms", "p95_ms", "p99_ms", "rows"]],
+                        hide_index=True
+                    )
+            st.markdown("---")
+
         # Botón de cerrar sesión
         if st.button("🚪 Cerrar Sesión", width='stretch'):
             db.sign_out()
             st.session_state.authenticated = False
             st.session_state.user = None
             st.session_state.user_id = None
+            st.session_state.access_token = None
+            st.session_state.refresh_token = None
+            st.session_state.expires_at = None
             st.rerun()
 
     # Contenido principal
@@ -303,9 +342,6 @@ def main_app():
                 unsafe_allow_html=True
             )
 
-        # Obtener progreso
-        progress = db.get_habit_progress(st.session_state.user_id)
-
         if not progress.empty:
             avg_completion = progress["completion_percentage"].mean()
 
@@ -320,14 +356,7 @@ def main_app():
                     unsafe_allow_html=True
                 )
 
-        # Sesiones recientes
-        from datetime import date, timedelta
-        recent_sessions = db.get_user_sessions(
-            st.session_state.user_id,
-            limit=10,
-            start_date=date.today() - timedelta(days=7)
-        )
-
+        # Sesiones recientes (últimos 7 días)
         with col4:
             st.markdown(
                 f"""
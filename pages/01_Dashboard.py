@@ -9,12 +9,13 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date, timedelta
 import pandas as pd
-from utils.database import SupabaseDB
+from utils.database import get_user_db
 from utils.helpers import (
     format_duration,
     categorize_completion,
     calculate_weekly_compliance,
-    get_color_for_category
+    get_color_for_category,
+    show_data_errors
 )
 
 st.set_page_config(
@@ -28,17 +29,24 @@ if not st.session_state.get("authenticated"):
     st.warning("⚠️ Debes iniciar sesión primero")
     st.stop()
 
-db = SupabaseDB()
+db = get_user_db(st.session_state)
 user_id = st.session_state.user_id
 
 # Título
 st.title("📈 Dashboard de Progreso")
 st.markdown("---")
 
-# Obtener datos
-progress = db.get_habit_progress(user_id)
-weekly_summary = db.get_weekly_summary(user_id)
-activities_matrix = db.get_habit_activities_matrix(user_id)
+# Obtener datos (consultas en paralelo)
+data = db.fetch_many(
+    progress=("get_habit_progress", user_id),
+    weekly_summary=("get_weekly_summary", user_id),
+    activities_matrix=("get_habit_activities_matrix", user_id)
+)
+progress = data["progress"]
+weekly_summary = data["weekly_summary"]
+activities_matrix = data["activities_matrix"]
+
+show_data_errors(db)
 
 # Verificar si hay datos
 if progress.empty:
@@ -7,11 +7,12 @@ GESTIÓN DE HÁBITOS - CREAR, EDITAR, ELIMINAR
 import streamlit as st
 import time
 from datetime import datetime, timedelta
-from utils.database import SupabaseDB
+from utils.database import get_user_db
 from utils.helpers import (
     calculate_weeks_to_goal,
     format_duration,
-    categorize_completion
+    categorize_completion,
+    show_data_errors
 )
 
 st.set_page_config(
@@ -25,7 +26,7 @@ if not st.session_state.get("authenticated"):
     st.warning("⚠️ Debes iniciar sesión primero")
     st.stop()
 
-db = SupabaseDB()
+db = get_user_db(st.session_state)
 user_id = st.session_state.user_id
 
 # Título
@@ -292,6 +293,8 @@ with tab2:
     # Obtener hábitos
     habits = db.get_user_habits(user_id, active_only=False)
 
+    show_data_errors(db)
+
     if habits.empty:
         st.info("📝 Aún no has creado ninguna meta. ¡Crea la primera en la pestaña '➕ Crear Hábito'!")
     else:
@@ -315,6 +318,14 @@ with tab2:
 
         st.markdown("---")
 
+        # Métricas de todos los hábitos en una sola consulta
+        user_metrics = db.get_user_habit_metrics(user_id)
+        habits_metrics = {
+            metrics["habit_id"]: metrics for metrics in user_metrics.to_dict("records")
+        }
+
+        show_data_errors(db)
+
         # Mostrar cada hábito
         for idx, habit in habits_filtrados.iterrows():
             with st.expander(
@@ -354,7 +365,7 @@ with tab2:
                         st.metric("Status", status_text)
 
                     # Obtener progreso
-                    metrics = db.get_habit_metrics(habit["id"])
+                    metrics = habits_metrics.get(habit["id"])
 
                     if metrics:
                         st.markdown("---")
@@ -365,17 +376,17 @@ with tab2:
                         with prog_cols[0]:
                             st.metric(
                                 "Tiempo Invertido",
-                                format_duration(metrics.get("total_minutes_invested", 0))
+                                format_duration(int(metrics.get("total_minutes_invested") or 0))
                             )
 
                         with prog_cols[1]:
                             st.metric(
                                 "Sesiones Totales",
-                                metrics.get("total_sessions", 0)
+                                int(metrics.get("total_sessions") or 0)
                             )
 
                         with prog_cols[2]:
-                            completion = metrics.get("completion_percentage", 0)
+                            completion = metrics.get("completion_percentage") or 0
                             st.metric(
                                 "Completado",
                                 f"{completion:.1f}%"
@@ -7,8 +7,8 @@ GESTIÓN DE ACTIVIDADES Y VINCULACIÓN
 import streamlit as st
 import pandas as pd
 import time
-from utils.database import SupabaseDB
-from utils.helpers import format_duration
+from utils.database import get_user_db
+from utils.helpers import format_duration, show_data_errors
 
 st.set_page_config(
     page_title="Actividades - Habit Tracker",
@@ -21,9 +21,18 @@ if not st.session_state.get("authenticated"):
     st.warning("⚠️ Debes iniciar sesión primero")
     st.stop()
 
-db = SupabaseDB()
+db = get_user_db(st.session_state)
 user_id = st.session_state.user_id
 
+# Obtener datos de las pestañas (consultas en paralelo)
+data = db.fetch_many(
+    activities=("get_user_activities", user_id),
+    habits=("get_user_habits", user_id, {"columns": "list"}),
+    matrix=("get_habit_activities_matrix", user_id)
+)
+
+show_data_errors(db)
+
 # Título
 st.title("⚡ Gestión de Actividades")
 st.markdown("---")
@@ -111,8 +120,8 @@ with tab2:
     )
 
     # Obtener actividades y hábitos
-    activities = db.get_user_activities(user_id)
-    habits = db.get_user_habits(user_id)
+    activities = data["activities"]
+    habits = data["habits"]
 
     if activities.empty:
         st.warning("⚠️ No tienes actividades creadas. Ve a la pestaña '➕ Crear Actividad'")
@@ -120,7 +129,7 @@ with tab2:
         st.warning("⚠️ No tienes hábitos creados. Ve a '🎯 Mis Hábitos'")
     else:
         # Selector de actividad
-        activity_names = {row['name']: row['id'] for _, row in activities.iterrows()}
+        activity_names = dict(zip(activities["name"], activities["id"]))
         selected_activity_name = st.selectbox(
             "Selecciona una actividad",
             list(activity_names.keys())
@@ -132,13 +141,10 @@ with tab2:
 
         # Obtener vínculos existentes
         existing_links = db.get_activity_links(selected_activity_id)
-        existing_habit_ids = []
+        existing_weights = {}
 
         if not existing_links.empty:
-            existing_habit_ids = [
-                link.get('habit_id') or link.get('habits', {}).get('id')
-                for _, link in existing_links.iterrows()
-            ]
+            existing_weights = dict(zip(existing_links["habit_id"], existing_links["weight"]))
 
         st.markdown("### ¿A cuáles hábitos contribuye esta actividad?")
 
@@ -152,7 +158,7 @@ with tab2:
                 col1, col2 = st.columns([1, 2])
 
                 with col1:
-                    is_linked = habit['id'] in existing_habit_ids
+                    is_linked = habit['id'] in existing_weights
 
                     vincular = st.checkbox(
                         "Vincular",
@@ -163,16 +169,7 @@ with tab2:
                 with col2:
                     if vincular:
                         # Obtener peso actual si existe
-                        current_weight = 1.0
-
-                        if not existing_links.empty:
-                            link_row = existing_links[
-                                (existing_links['habit_id'] == habit['id']) |
-                                (existing_links.get('habits', {}).get('id') == habit['id'])
-                            ]
-
-                            if not link_row.empty:
-                                current_weight = link_row.iloc[0].get('weight', 1.0)
+                        current_weight = existing_weights.get(habit['id'], 1.0)
 
                         weight = st.slider(
                             "Peso de contribución",
@@ -202,18 +199,15 @@ with tab2:
 
             if submit:
                 with st.spinner("Guardando vínculos..."):
-                    # Eliminar vínculos viejos que ya no están
-                    for habit_id in existing_habit_ids:
-                        if habit_id not in [l['habit_id'] for l in links_to_create]:
-                            db.unlink_activity_from_habit(habit_id, selected_activity_id)
-
-                    # Crear/actualizar nuevos vínculos
-                    for link in links_to_create:
-                        db.link_activity_to_habit(
-                            habit_id=link['habit_id'],
-                            activity_id=selected_activity_id,
-                            weight=link['weight']
-                        )
+                    # Reemplazar todos los vínculos en una sola operación
+                    saved = db.set_activity_links(
+                        selected_activity_id,
+                        {link['habit_id']: link['weight'] for link in links_to_create}
+                    )
+
+                    if not saved:
+                        st.error("❌ Error guardando vínculos. Intenta de nuevo.")
+                        st.stop()
 
                     st.success("✅ Vínculos guardados!")
 
@@ -236,13 +230,13 @@ with tab2:
 with tab3:
     st.subheader("Tus Actividades")
 
-    activities = db.get_user_activities(user_id)
+    activities = data["activities"]
 
     if activities.empty:
         st.info("📝 No tienes actividades creadas. ¡Crea la primera en la pestaña '➕ Crear Actividad'!")
     else:
         # Obtener matriz de actividades
-        matrix = db.get_habit_activities_matrix(user_id)
+        matrix = data["matrix"]
 
         for _, activity in activities.iterrows():
             with st.expander(f"⚡ {activity['name']}", expanded=False):
@@ -5,15 +5,22 @@ REGISTRAR SESIÓN - TRACKING DIARIO
 """
 
 import streamlit as st
+import os
+import tempfile
 import time
 from datetime import date, datetime, timedelta
 import pandas as pd
-from utils.database import SupabaseDB
+from utils.database import get_user_db
+from utils.session_queue import get_session_queue
+from utils.importer import detect_format, import_sessions
+from utils.exporter import EXPORT_FORMATS, export_sessions, parquet_available
 from utils.helpers import (
     format_duration,
     get_mood_emoji,
     get_productivity_bars,
-    format_date_spanish
+    format_date_spanish,
+    index_activity_links,
+    show_data_errors
 )
 
 st.set_page_config(
@@ -27,15 +34,39 @@ if not st.session_state.get("authenticated"):
     st.warning("⚠️ Debes iniciar sesión primero")
     st.stop()
 
-db = SupabaseDB()
+db = get_user_db(st.session_state)
 user_id = st.session_state.user_id
 
+# Cola de escritura: las sesiones se guardan al instante y se suben en segundo plano
+session_queue = get_session_queue()
+session_queue.bind(db, user_id)
+
 # Título
 st.title("📝 Registrar Sesión")
 st.markdown("---")
 
+# Estado de sincronización
+queue_stats = session_queue.stats(user_id)
+
+if queue_stats["pending"]:
+    st.info(f"🔄 {queue_stats['pending']} sesión(es) pendiente(s) de sincronizar")
+
+if queue_stats["failed"]:
+    col_warn, col_retry = st.columns([3, 1])
+
+    with col_warn:
+        st.error(
+            f"❌ {queue_stats['failed']} sesión(es) no se pudieron guardar "
+            "después de varios intentos"
+        )
+
+    with col_retry:
+        if st.button("🔁 Reintentar", width='stretch'):
+            session_queue.retry_failed(user_id)
+            st.rerun()
+
 # Tabs
-tab1, tab2 = st.tabs(["➕ Nueva Sesión", "📋 Sesiones Recientes"])
+tab1, tab2, tab3 = st.tabs(["➕ Nueva Sesión", "📋 Sesiones Recientes", "📥 Importar"])
 
 # ============================================================================
 # TAB 1: NUEVA SESIÓN
@@ -43,8 +74,14 @@ tab1, tab2 = st.tabs(["➕ Nueva Sesión", "📋 Sesiones Recientes"])
 with tab1:
     st.subheader("Registrar Nueva Sesión")
 
-    # Obtener actividades
-    activities = db.get_user_activities(user_id)
+    # Obtener actividades y vínculos (consultas en paralelo)
+    data = db.fetch_many(
+        activities=("get_user_activities", user_id, {"columns": "list"}),
+        links=("get_user_activity_links", user_id)
+    )
+    activities = data["activities"]
+
+    show_data_errors(db)
 
     if activities.empty:
         st.warning(
@@ -54,189 +91,188 @@ with tab1:
             "2. Crear al menos una actividad\n"
             "3. Vincularla a tus hábitos"
         )
-        st.stop()
-
-    # Verificar que al menos una actividad esté vinculada
-    has_linked_activities = False
-    for _, activity in activities.iterrows():
-        links = db.get_activity_links(activity['id'])
-        if not links.empty:
-            has_linked_activities = True
-            break
+    else:
+        # Vínculos de todas las actividades en una sola consulta
+        links_by_activity = index_activity_links(data["links"])
 
-    if not has_linked_activities:
-        st.warning(
-            "⚠️ **Tus actividades no están vinculadas a hábitos**\n\n"
-            "Para que las sesiones cuenten hacia tus metas:\n"
-            "1. Ve a **⚡ Actividades**\n"
-            "2. Pestaña '🔗 Vincular a Hábitos'\n"
-            "3. Conecta tus actividades con tus hábitos"
+        # Verificar que al menos una actividad esté vinculada
+        has_linked_activities = any(
+            activity_id in links_by_activity for activity_id in activities["id"]
         )
 
-    with st.form("registrar_sesion_form"):
-        # Actividad
-        activity_names = {row['name']: row['id'] for _, row in activities.iterrows()}
+        if not has_linked_activities:
+            st.warning(
+                "⚠️ **Tus actividades no están vinculadas a hábitos**\n\n"
+                "Para que las sesiones cuenten hacia tus metas:\n"
+                "1. Ve a **⚡ Actividades**\n"
+                "2. Pestaña '🔗 Vincular a Hábitos'\n"
+                "3. Conecta tus actividades con tus hábitos"
+            )
 
-        selected_activity_name = st.selectbox(
-            "¿Qué actividad realizaste?",
-            list(activity_names.keys()),
-            help="Selecciona la actividad que completaste"
-        )
+        with st.form("registrar_sesion_form"):
+            # Actividad
+            activity_names = dict(zip(activities["name"], activities["id"]))
 
-        selected_activity_id = activity_names[selected_activity_name]
+            selected_activity_name = st.selectbox(
+                "¿Qué actividad realizaste?",
+                list(activity_names.keys()),
+                help="Selecciona la actividad que completaste"
+            )
 
-        # Mostrar a qué hábitos contribuye
-        links = db.get_activity_links(selected_activity_id)
+            selected_activity_id = activity_names[selected_activity_name]
 
-        if not links.empty:
-            habit_names = []
-            for _, link in links.iterrows():
-                habit_info = link.get('habits', {})
-                habit_name = habit_info.get('name', 'Desconocido') if isinstance(habit_info, dict) else 'Desconocido'
-                weight = link.get('weight', 1.0)
-                habit_names.append(f"{habit_name} ({weight*100:.0f}%)")
+            # Mostrar a qué hábitos contribuye
+            links = links_by_activity.get(selected_activity_id, [])
 
-            st.info(
-                f"**Esta actividad contribuye a:**\n\n" +
-                "\n".join([f"• {name}" for name in habit_names])
-            )
+            if links:
+                habit_names = [
+                    f"{link['habit_name']} ({link['weight']*100:.0f}%)"
+                    for link in links
+                ]
 
-        st.markdown("---")
+                st.info(
+                    f"**Esta actividad contribuye a:**\n\n" +
+                    "\n".join([f"• {name}" for name in habit_names])
+                )
 
-        # Duración y fecha
-        col1, col2 = st.columns(2)
-
-        with col1:
-            duration = st.number_input(
-                "Duración (minutos)",
-                min_value=1,
-                max_value=480,
-                value=60,
-                step=5,
-                help="¿Cuántos minutos duraste en esta actividad?"
-            )
+            st.markdown("---")
 
-        with col2:
-            session_date = st.date_input(
-                "Fecha",
-                value=date.today(),
-                max_value=date.today(),
-                help="¿Cuándo realizaste esta actividad?"
-            )
+            # Duración y fecha
+            col1, col2 = st.columns(2)
 
-        # Hora de inicio (opcional)
-        start_time = st.time_input(
-            "Hora de inicio (opcional)",
-            value=None,
-            help="Si quieres registrar a qué hora empezaste"
-        )
+            with col1:
+                duration = st.number_input(
+                    "Duración (minutos)",
+                    min_value=1,
+                    max_value=480,
+                    value=60,
+                    step=5,
+                    help="¿Cuántos minutos duraste en esta actividad?"
+                )
 
-        st.markdown("---")
+            with col2:
+                session_date = st.date_input(
+                    "Fecha",
+                    value=date.today(),
+                    max_value=date.today(),
+                    help="¿Cuándo realizaste esta actividad?"
+                )
 
-        # Mood y Productividad
-        st.markdown("### Estado y Productividad")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("**¿Cómo te sentías?**")
-            mood = st.slider(
-                "Mood",
-                min_value=1,
-                max_value=5,
-                value=3,
-                format="%d",
-                help="1 = Mal | 2 = Regular | 3 = Bien | 4 = Muy bien | 5 = Excelente",
-                label_visibility="collapsed"
+            # Hora de inicio (opcional)
+            start_time = st.time_input(
+                "Hora de inicio (opcional)",
+                value=None,
+                help="Si quieres registrar a qué hora empezaste"
             )
 
-            mood_labels = {
-                1: "😢 Mal",
-                2: "😕 Regular",
-                3: "😐 Bien",
-                4: "😊 Muy bien",
-                5: "😄 Excelente"
-            }
-            st.write(mood_labels[mood])
+            st.markdown("---")
 
-        with col2:
-            st.markdown("**Nivel de productividad**")
-            productivity = st.slider(
-                "Productividad",
-                min_value=1,
-                max_value=5,
-                value=3,
-                format="%d",
-                help="1 = Muy bajo | 5 = Muy alto",
-                label_visibility="collapsed"
-            )
+            # Mood y Productividad
+            st.markdown("### Estado y Productividad")
 
-            st.write(get_productivity_bars(productivity))
+            col1, col2 = st.columns(2)
 
-        # Notas
-        notes = st.text_area(
-            "Notas (opcional)",
-            placeholder="Ej: Aprendí sobre Serverless en AWS. Muy productivo hoy.",
-            help="Escribe cualquier observación sobre la sesión"
-        )
+            with col1:
+                st.markdown("**¿Cómo te sentías?**")
+                mood = st.slider(
+                    "Mood",
+                    min_value=1,
+                    max_value=5,
+                    value=3,
+                    format="%d",
+                    help="1 = Mal | 2 = Regular | 3 = Bien | 4 = Muy bien | 5 = Excelente",
+                    label_visibility="collapsed"
+                )
 
-        st.markdown("---")
+                mood_labels = {
+                    1: "😢 Mal",
+                    2: "😕 Regular",
+                    3: "😐 Bien",
+                    4: "😊 Muy bien",
+                    5: "😄 Excelente"
+                }
+                st.write(mood_labels[mood])
+
+            with col2:
+                st.markdown("**Nivel de productividad**")
+                productivity = st.slider(
+                    "Productividad",
+                    min_value=1,
+                    max_value=5,
+                    value=3,
+                    format="%d",
+                    help="1 = Muy bajo | 5 = Muy alto",
+                    label_visibility="collapsed"
+                )
 
-        # Resumen antes de enviar
-        st.markdown("### Resumen de la Sesión")
+                st.write(get_productivity_bars(productivity))
 
-        col1, col2, col3 = st.columns(3)
+            # Notas
+            notes = st.text_area(
+                "Notas (opcional)",
+                placeholder="Ej: Aprendí sobre Serverless en AWS. Muy productivo hoy.",
+                help="Escribe cualquier observación sobre la sesión"
+            )
 
-        with col1:
-            st.metric("Actividad", selected_activity_name)
+            st.markdown("---")
 
-        with col2:
-            st.metric("Duración", format_duration(duration))
+            # Resumen antes de enviar
+            st.markdown("### Resumen de la Sesión")
 
-        with col3:
-            st.metric("Fecha", format_date_spanish(session_date))
+            col1, col2, col3 = st.columns(3)
 
-        # Botón de envío
-        submit = st.form_submit_button(
-            "✅ Registrar Sesión",
-            width='stretch',
-            type="primary"
-        )
+            with col1:
+                st.metric("Actividad", selected_activity_name)
 
-        if submit:
-            with st.spinner("Registrando sesión..."):
-                # Convertir start_time a string si existe
-                start_time_str = start_time.strftime("%H:%M:%S") if start_time else None
-
-                nueva_sesion = db.register_session(
-                    activity_id=selected_activity_id,
-                    duration_minutes=duration,
-                    session_date=session_date,
-                    start_time=start_time_str,
-                    notes=notes if notes else None,
-                    mood=mood,
-                    productivity_level=productivity
-                )
+            with col2:
+                st.metric("Duración", format_duration(duration))
 
-                if nueva_sesion:
-                    st.success(
-                        f"✅ **¡Sesión registrada!**\n\n"
-                        f"**{duration} minutos** en **{selected_activity_name}**"
+            with col3:
+                st.metric("Fecha", format_date_spanish(session_date))
+
+            # Botón de envío
+            submit = st.form_submit_button(
+                "✅ Registrar Sesión",
+                width='stretch',
+                type="primary"
+            )
+
+            if submit:
+                with st.spinner("Registrando sesión..."):
+                    # Convertir start_time a string si existe
+                    start_time_str = start_time.strftime("%H:%M:%S") if start_time else None
+
+                    nueva_sesion = session_queue.enqueue(
+                        db,
+                        user_id,
+                        activity_id=selected_activity_id,
+                        duration_minutes=duration,
+                        session_date=session_date,
+                        start_time=start_time_str,
+                        notes=notes if notes else None,
+                        mood=mood,
+                        productivity_level=productivity
                     )
 
-                    # Mostrar distribución
-                    if not links.empty:
-                        st.info(
-                            "📊 **Distribución automática:**\n\n" +
-                            "Tu sesión se ha distribuido automáticamente entre tus hábitos vinculados. "
-                            "Ve al **📈 Dashboard** para ver tu progreso actualizado."
+                    if nueva_sesion:
+                        st.success(
+                            f"✅ **¡Sesión registrada!**\n\n"
+                            f"**{duration} minutos** en **{selected_activity_name}**"
                         )
 
-                    st.balloons()
-                    time.sleep(2)
-                    st.rerun()
-                else:
-                    st.error("❌ Error registrando sesión. Intenta de nuevo.")
+                        # Mostrar distribución
+                        if links:
+                            st.info(
+                                "📊 **Distribución automática:**\n\n" +
+                                "Tu sesión se ha distribuido automáticamente entre tus hábitos vinculados. "
+                                "Ve al **📈 Dashboard** para ver tu progreso actualizado."
+                            )
+
+                        st.balloons()
+                        time.sleep(2)
+                        st.rerun()
+                    else:
+                        st.error("❌ Sesión inválida. Revisa los datos e intenta de nuevo.")
 
 # ============================================================================
 # TAB 2: SESIONES RECIENTES
@@ -270,13 +306,16 @@ with tab2:
                 max_value=end_date
             )
 
-    # Obtener sesiones
-    sessions = db.get_user_sessions(
-        user_id=user_id,
-        limit=100,
-        start_date=start_date,
-        end_date=end_date
+    # Obtener sesiones: las 100 más recientes para la tabla y las
+    # estadísticas sobre todo el período (consultas en paralelo)
+    data = db.fetch_many(
+        sessions=("get_user_sessions", user_id, 100, start_date, end_date),
+        period_stats=("get_user_session_stats", user_id, start_date, end_date)
     )
+    sessions = data["sessions"]
+    period_stats = data["period_stats"]
+
+    show_data_errors(db)
 
     if sessions.empty:
         st.info("📭 No hay sesiones en este período")
@@ -284,41 +323,44 @@ with tab2:
         # Estadísticas del período
         st.markdown("### Estadísticas del Período")
 
-        col1, col2, col3, col4 = st.columns(4)
+        if period_stats is None:
+            st.warning("⚠️ No se pudieron calcular las estadísticas del período")
+        else:
+            col1, col2, col3, col4 = st.columns(4)
 
-        with col1:
-            st.metric("Total Sesiones", len(sessions))
+            with col1:
+                st.metric("Total Sesiones", period_stats["total_sessions"])
 
-        with col2:
-            total_duration = sessions["duration_minutes"].sum()
-            total_display = format_duration(int(total_duration)) if pd.notna(total_duration) and total_duration > 0 else "0m"
-            st.metric("Tiempo Total", total_display)
+            with col2:
+                total_duration = period_stats["total_minutes"]
+                total_display = format_duration(int(total_duration)) if total_duration > 0 else "0m"
+                st.metric("Tiempo Total", total_display)
 
-        with col3:
-            avg_duration = sessions["duration_minutes"].mean()
-            avg_display = format_duration(int(avg_duration)) if pd.notna(avg_duration) and avg_duration > 0 else "0m"
-            st.metric("Promedio/Sesión", avg_display)
+            with col3:
+                avg_duration = period_stats["avg_minutes"]
+                avg_display = format_duration(int(avg_duration)) if avg_duration > 0 else "0m"
+                st.metric("Promedio/Sesión", avg_display)
 
-        with col4:
-            if "mood" in sessions.columns and sessions["mood"].notna().any():
-                avg_mood = sessions["mood"].mean()
-                st.metric("Mood Promedio", f"{avg_mood:.1f}/5")
+            with col4:
+                if period_stats["avg_mood"] is not None:
+                    st.metric("Mood Promedio", f"{period_stats['avg_mood']:.1f}/5")
 
         st.markdown("---")
 
         # Tabla de sesiones
         st.markdown("### Detalle de Sesiones")
 
+        if period_stats and period_stats["total_sessions"] > len(sessions):
+            st.caption(
+                f"Mostrando las {len(sessions)} sesiones más recientes "
+                f"de {period_stats['total_sessions']}"
+            )
+
         # Preparar datos para mostrar
         display_sessions = sessions.copy()
 
-        # Procesar columna de actividad
-        if "activities" in display_sessions.columns:
-            display_sessions["activity_name"] = display_sessions["activities"].apply(
-                lambda x: x.get("name", "N/A") if isinstance(x, dict) else "N/A"
-            )
-        else:
-            display_sessions["activity_name"] = "N/A"
+        # Fecha sin hora (session_date ya llega como datetime64)
+        display_sessions["session_date"] = display_sessions["session_date"].dt.date
 
         # Formatear duración
         display_sessions["duration_formatted"] = display_sessions["duration_minutes"].apply(
@@ -370,13 +412,108 @@ with tab2:
         # Exportar datos
         st.markdown("---")
 
-        if st.button("📥 Exportar a CSV"):
-            csv = display_df.to_csv(index=False)
-            st.download_button(
-                label="Descargar CSV",
-                data=csv,
-                file_name=f"sesiones_{start_date}_{end_date}.csv",
-                mime="text/csv"
+        # Exporta todas las sesiones del período (no solo las de la tabla),
+        # página a página a un archivo temporal
+        st.markdown("### Exportar Período Completo")
+
+        export_formats = ["csv", "parquet"] if parquet_available() else ["csv"]
+
+        col_format, col_export = st.columns([1, 1])
+
+        with col_format:
+            export_format = st.selectbox(
+                "Formato",
+                export_formats,
+                format_func=str.upper
+            )
+
+        with col_export:
+            st.write("")
+            prepare_export = st.button("📥 Preparar exportación", width='stretch')
+
+        if prepare_export:
+            with st.spinner("Exportando sesiones..."):
+                with tempfile.NamedTemporaryFile(suffix=f".{export_format}", delete=False) as tmp:
+                    export_path = tmp.name
+
+                try:
+                    exported = export_sessions(
+                        db,
+                        user_id,
+                        export_path,
+                        export_format,
+                        start_date=start_date,
+                        end_date=end_date
+                    )
+
+                    with open(export_path, "rb") as export_file:
+                        st.download_button(
+                            label=f"Descargar {export_format.upper()} ({exported} sesiones)",
+                            data=export_file,
+                            file_name=f"sesiones_{start_date}_{end_date}.{export_format}",
+                            mime=EXPORT_FORMATS[export_format]
+                        )
+                except Exception as e:
+                    st.error(f"❌ Error exportando sesiones: {e}")
+                finally:
+                    os.remove(export_path)
+
+# ============================================================================
+# TAB 3: IMPORTAR SESIONES
+# ============================================================================
+with tab3:
+    st.subheader("Importar Sesiones Históricas")
+
+    st.markdown(
+        "Sube un archivo **CSV** o **JSONL** con una fila por sesión. Columnas:\n\n"
+        "- `activity_name` (o `activity_id`) y `duration_minutes` — obligatorias\n"
+        "- `session_date` (AAAA-MM-DD, default: hoy), `start_time`, `notes`, "
+        "`mood` (1-5), `productivity_level` (1-5) — opcionales"
+    )
+
+    uploaded_file = st.file_uploader(
+        "Archivo de sesiones",
+        type=["csv", "jsonl", "ndjson"]
+    )
+
+    if uploaded_file is not None and st.button("📥 Importar sesiones", type="primary"):
+        progress_text = st.empty()
+
+        def show_progress(progress):
+            progress_text.caption(
+                f"{progress['rows']} filas leídas · {progress['inserted']} insertadas · "
+                f"{progress['rejected']} rechazadas"
+            )
+
+        with st.spinner("Importando sesiones..."):
+            summary = import_sessions(
+                db,
+                user_id,
+                uploaded_file,
+                detect_format(uploaded_file.name),
+                on_progress=show_progress
+            )
+
+        if summary["inserted"]:
+            st.success(
+                f"✅ {summary['inserted']} sesiones importadas · "
+                f"{summary['habits_recomputed']} hábitos actualizados"
+            )
+
+        if summary["duplicates"]:
+            st.info(f"ℹ️ {summary['duplicates']} sesiones ya existían y se omitieron")
+
+        if summary["failed"]:
+            st.error(f"❌ {summary['failed']} sesiones no se pudieron guardar. Intenta de nuevo.")
+
+        if summary["rejected"]:
+            st.warning(f"⚠️ {summary['rejected']} filas rechazadas")
+            st.dataframe(
+                summary["rejected_samples"][["row", "error"]].rename(
+                    columns={"row": "Fila", "error": "Motivo"}
+                ),
+                width='stretch',
+                hide_index=True
             )
 
 # Botón de volver
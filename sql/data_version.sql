@@ -0,0 +1,104 @@
+-- =============================================================================
+-- data_version - HABIT TRACKER
+-- =============================================================================
+-- Contador de versión por usuario que sube con cada cambio en sus hábitos,
+-- actividades, vínculos, sesiones, métricas o categorías (desde cualquier
+-- dispositivo). La app lo consulta con get_data_version() (una fila, un
+-- número) y solo vuelve a pedir las vistas pesadas cuando cambió.
+--
+-- Los triggers son por sentencia (tablas de transición): una importación de
+-- miles de sesiones sube la versión una vez por lote, no una vez por fila.
+--
+-- Uso desde Python: automático en la caché de SupabaseDB (cached_read)
+
+create table if not exists public.user_data_versions (
+    user_id uuid primary key references auth.users (id) on delete cascade,
+    version bigint not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+alter table public.user_data_versions enable row level security;
+
+drop policy if exists "Users read their own data version" on public.user_data_versions;
+create policy "Users read their own data version"
+    on public.user_data_versions for select
+    using (auth.uid() = user_id);
+
+-- Sube la versión de los usuarios dueños de las filas cambiadas
+create or replace function public.bump_data_version()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_table_name in ('habits', 'activities', 'user_categories') then
+        insert into user_data_versions (user_id, version)
+        select distinct c.user_id, 1 from changed c where c.user_id is not null
+        on conflict (user_id)
+        do update set version = user_data_versions.version + 1, updated_at = now();
+
+    elsif tg_table_name in ('sessions', 'habit_activities') then
+        insert into user_data_versions (user_id, version)
+        select distinct a.user_id, 1
+        from changed c
+        join activities a on a.id = c.activity_id
+        on conflict (user_id)
+        do update set version = user_data_versions.version + 1, updated_at = now();
+
+    elsif tg_table_name = 'habit_metrics' then
+        insert into user_data_versions (user_id, version)
+        select distinct h.user_id, 1
+        from changed c
+        join habits h on h.id = c.habit_id
+        on conflict (user_id)
+        do update set version = user_data_versions.version + 1, updated_at = now();
+    end if;
+
+    return null;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array[
+        'habits', 'activities', 'habit_activities', 'sessions', 'habit_metrics', 'user_categories'
+    ]
+    loop
+        execute format('drop trigger if exists %I on public.%I', t || '_version_insert', t);
+        execute format('drop trigger if exists %I on public.%I', t || '_version_update', t);
+        execute format('drop trigger if exists %I on public.%I', t || '_version_delete', t);
+
+        execute format(
+            'create trigger %I after insert on public.%I referencing new table as changed '
+            'for each statement execute function public.bump_data_version()',
+            t || '_version_insert', t
+        );
+        execute format(
+            'create trigger %I after update on public.%I referencing new table as changed '
+            'for each statement execute function public.bump_data_version()',
+            t || '_version_update', t
+        );
+        execute format(
+            'create trigger %I after delete on public.%I referencing old table as changed '
+            'for each statement execute function public.bump_data_version()',
+            t || '_version_delete', t
+        );
+    end loop;
+end;
+$$;
+
+-- Versión actual del usuario autenticado (0 si nunca cambió nada)
+create or replace function public.get_data_version()
+returns bigint
+language sql
+stable
+security invoker
+as $$
+    select coalesce(
+        (select version from public.user_data_versions where user_id = auth.uid()),
+        0
+    );
+$$;
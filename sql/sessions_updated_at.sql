@@ -0,0 +1,36 @@
+-- =============================================================================
+-- sessions_updated_at - HABIT TRACKER
+-- =============================================================================
+-- Columna updated_at en sessions, mantenida por un trigger en cada update.
+-- El espejo local (utils/mirror.py) sincroniza las sesiones por
+-- updated_at/created_at: sin esta columna las sesiones editadas después de
+-- descargarse nunca se vuelven a copiar.
+--
+-- Uso desde Python: automático en LocalMirror.sync_user
+
+alter table public.sessions
+    add column if not exists updated_at timestamptz not null default now();
+
+-- Las sesiones existentes parten de su fecha de creación
+update public.sessions
+set updated_at = created_at
+where created_at is not null
+  and updated_at > created_at;
+
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists sessions_touch_updated_at on public.sessions;
+create trigger sessions_touch_updated_at
+    before update on public.sessions
+    for each row execute function public.touch_updated_at();
+
+create index if not exists sessions_updated_at_idx
+    on public.sessions (updated_at);
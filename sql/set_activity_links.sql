@@ -0,0 +1,39 @@
+-- =============================================================================
+-- set_activity_links - HABIT TRACKER
+-- =============================================================================
+-- Reemplaza todos los vínculos de una actividad en una sola transacción.
+-- p_links es un objeto JSON {habit_id: weight}; los hábitos que no aparecen
+-- se desvinculan y el resto se inserta o actualiza (upsert).
+--
+-- Uso desde Python: SupabaseDB.set_activity_links(activity_id, {habit_id: weight})
+
+-- Necesario para el upsert por (habit_id, activity_id)
+create unique index if not exists habit_activities_habit_activity_key
+    on public.habit_activities (habit_id, activity_id);
+
+create or replace function public.set_activity_links(
+    p_activity_id uuid,
+    p_links jsonb
+)
+returns void
+language plpgsql
+security invoker
+as $$
+begin
+    -- Desvincular los hábitos que ya no están
+    delete from public.habit_activities ha
+    where ha.activity_id = p_activity_id
+      and not exists (
+          select 1
+          from jsonb_each(p_links) l
+          where l.key::uuid = ha.habit_id
+      );
+
+    -- Crear/actualizar los vínculos restantes
+    insert into public.habit_activities (habit_id, activity_id, weight)
+    select l.key::uuid, p_activity_id, (l.value #>> '{}')::numeric
+    from jsonb_each(p_links) l
+    on conflict (habit_id, activity_id)
+    do update set weight = excluded.weight, updated_at = now();
+end;
+$$;
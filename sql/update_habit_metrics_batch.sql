@@ -0,0 +1,100 @@
+-- =============================================================================
+-- update_habit_metrics_batch - HABIT TRACKER
+-- =============================================================================
+-- Recalcula las métricas de muchos hábitos en una sola sentencia (en lugar de
+-- llamar update_habit_metrics una vez por hábito). p_habit_ids = null
+-- recalcula todos los hábitos visibles para quien llama: los del usuario con
+-- su JWT, o todos con la service role (útil después de una migración):
+--
+--     select public.update_habit_metrics_batch(null);
+--
+-- Mismas reglas que utils/metrics.py: minutos = duración × peso, sesiones que
+-- contribuyen (peso > 0), rachas de días consecutivos (la actual termina hoy
+-- o ayer) y completion_percentage sobre total_hours_goal (máx. 100).
+--
+-- Uso desde Python: SupabaseDB.update_habit_metrics_batch([habit_id, ...])
+
+-- Necesario para el upsert por habit_id
+create unique index if not exists habit_metrics_habit_id_key
+    on public.habit_metrics (habit_id);
+
+create or replace function public.update_habit_metrics_batch(
+    p_habit_ids uuid[] default null
+)
+returns integer
+language plpgsql
+security invoker
+as $$
+declare
+    v_count integer;
+begin
+    with target as (
+        select h.id, h.total_hours_goal
+        from public.habits h
+        where p_habit_ids is null or h.id = any(p_habit_ids)
+    ),
+    contributions as (
+        select ha.habit_id, s.session_date, s.duration_minutes * ha.weight as minutes
+        from target t
+        join public.habit_activities ha on ha.habit_id = t.id and ha.weight > 0
+        join public.sessions s on s.activity_id = ha.activity_id
+    ),
+    totals as (
+        select habit_id, sum(minutes) as total_minutes, count(*) as total_sessions
+        from contributions
+        group by habit_id
+    ),
+    -- Islas de días consecutivos: fecha - número de fila es constante en cada racha
+    islands as (
+        select habit_id,
+               session_date,
+               session_date - (row_number() over (
+                   partition by habit_id order by session_date
+               ))::int as island
+        from (select distinct habit_id, session_date from contributions) d
+    ),
+    runs as (
+        select habit_id, count(*) as length, max(session_date) as last_day
+        from islands
+        group by habit_id, island
+    ),
+    streaks as (
+        select habit_id,
+               max(length) as longest_streak,
+               coalesce(max(length) filter (where last_day >= current_date - 1), 0) as current_streak
+        from runs
+        group by habit_id
+    )
+    insert into public.habit_metrics (
+        habit_id,
+        total_minutes_invested,
+        total_sessions,
+        current_streak,
+        longest_streak,
+        completion_percentage
+    )
+    select t.id,
+           coalesce(tt.total_minutes, 0),
+           coalesce(tt.total_sessions, 0),
+           coalesce(st.current_streak, 0),
+           coalesce(st.longest_streak, 0),
+           case
+               when t.total_hours_goal > 0 then
+                   least(100, round((coalesce(tt.total_minutes, 0) / (t.total_hours_goal * 60) * 100)::numeric, 2))
+               else 0
+           end
+    from target t
+    left join totals tt on tt.habit_id = t.id
+    left join streaks st on st.habit_id = t.id
+    on conflict (habit_id)
+    do update set
+        total_minutes_invested = excluded.total_minutes_invested,
+        total_sessions = excluded.total_sessions,
+        current_streak = excluded.current_streak,
+        longest_streak = excluded.longest_streak,
+        completion_percentage = excluded.completion_percentage;
+
+    get diagnostics v_count = row_count;
+    return v_count;
+end;
+$$;
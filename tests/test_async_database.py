@@ -0,0 +1,107 @@
+"""
+AsyncSupabaseDB (por su fachada síncrona) contra un transporte httpx simulado
+"""
+
+import asyncio
+import json
+
+import httpx
+import pandas as pd
+import pytest
+from supabase import AsyncClientOptions, acreate_client
+
+import utils.async_database as async_database
+from utils.resilience import DataQueryError
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+ACTIVITY_ID = "00000000-0000-0000-0000-0000000000b1"
+
+
+class FakeSupabase:
+    """Transporte que responde como PostgREST y guarda las peticiones"""
+
+    def __init__(self):
+        self.requests = []
+        self.responses = {}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path.removeprefix("/rest/v1/")
+
+        response = self.responses.get((request.method, path))
+        if response is not None:
+            return response
+
+        if request.method == "POST":
+            body = json.loads(request.content)
+            return httpx.Response(201, json=body if isinstance(body, list) else [body])
+        return httpx.Response(200, json=[])
+
+    def to(self, path: str):
+        """Peticiones recibidas para path"""
+        return [r for r in self.requests if r.url.path == f"/rest/v1/{path}"]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(async_database, "_rpc_available", {})
+    return FakeSupabase()
+
+
+@pytest.fixture
+def db(fake):
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(fake.handle))
+
+    async def create():
+        client = await acreate_client(
+            "https://example.supabase.co",
+            "anon-key",
+            options=AsyncClientOptions(httpx_client=http_client)
+        )
+        return async_database.AsyncSupabaseDB(client)
+
+    facade = async_database.SyncAsyncSupabaseDB(asyncio.run(create()))
+    facade.pop_errors()
+    yield facade.for_user("user-token", USER_ID)
+    facade.close()
+
+
+def test_facade_reads_carry_the_user_jwt(fake, db):
+    fake.responses[("GET", "habits")] = httpx.Response(200, json=[
+        {"id": "h1", "user_id": USER_ID, "name": "Leer", "is_active": True}
+    ])
+
+    habits = db.get_user_habits(USER_ID)
+
+    assert habits["name"].tolist() == ["Leer"]
+    assert fake.to("habits")[-1].headers["Authorization"] == "Bearer user-token"
+
+
+def test_bulk_insert_keeps_counts_when_the_link_lookup_fails(fake, db):
+    fake.responses[("GET", "habit_activities")] = httpx.Response(
+        400, json={"code": "42501", "message": "permission denied", "details": None, "hint": None}
+    )
+    sessions = pd.DataFrame({
+        "activity_id": [ACTIVITY_ID] * 3,
+        "duration_minutes": [30, 45, 60],
+        "session_date": ["2026-01-01", "2026-01-02", "2026-01-03"]
+    })
+
+    result = db.register_sessions_bulk(USER_ID, sessions, chunk_size=2)
+
+    assert result["inserted"] == 3
+    assert result["failed"] == 0
+    assert result["habits_recomputed"] == 0
+    assert [type(error) for error in db.pop_errors()] == [DataQueryError]
+
+
+def test_facade_iterates_session_pages(fake, db):
+    rows = [
+        {"id": f"s{i}", "activity_id": ACTIVITY_ID, "duration_minutes": 30, "session_date": "2026-01-01"}
+        for i in range(3)
+    ]
+    fake.responses[("GET", "sessions")] = httpx.Response(200, json=rows)
+
+    pages = list(db.iter_user_sessions(USER_ID, page_size=10, as_records=True))
+
+    assert pages == [rows]
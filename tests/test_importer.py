@@ -0,0 +1,71 @@
+"""
+Importación masiva de sesiones contra el backend en memoria
+"""
+
+import io
+from datetime import date
+
+import pytest
+
+import utils.database as database
+from utils.importer import import_sessions
+from utils.memory_db import MemoryDB
+
+CSV_HEADER = "activity_name,duration_minutes,session_date,start_time,notes\n"
+
+
+@pytest.fixture
+def user():
+    db = MemoryDB(latency_ms=0, jitter_ms=0)
+    user_id = db.create_account("importer@example.com", "secret")
+    user_db = db.for_user("token", user_id)
+    user_db.create_activity(user_id, "Leer")
+    return user_db, user_id
+
+
+def run_import(user, csv: str, chunk_size: int = 500):
+    db, user_id = user
+    return import_sessions(db, user_id, io.StringIO(CSV_HEADER + csv), "csv", chunk_size=chunk_size)
+
+
+def test_identical_sessions_in_one_file_are_all_imported(user):
+    summary = run_import(user, "Leer,30,2026-01-05,,\nLeer,30,2026-01-05,,\n")
+
+    assert summary["inserted"] == 2
+    assert summary["duplicates"] == 0
+
+
+def test_reimporting_a_file_inserts_nothing(user):
+    csv = "Leer,30,2026-01-05,,\nLeer,30,2026-01-05,,\nLeer,45,2026-01-06,08:00,libro\n"
+
+    run_import(user, csv)
+    summary = run_import(user, csv)
+
+    assert summary["inserted"] == 0
+    assert summary["duplicates"] == 3
+
+
+def test_identical_sessions_split_across_chunks_are_all_imported(user):
+    csv = "Leer,30,2026-01-05,,\nLeer,30,2026-01-05,,\nLeer,30,2026-01-05,,\n"
+
+    summary = run_import(user, csv, chunk_size=2)
+    again = run_import(user, csv, chunk_size=2)
+
+    assert summary["inserted"] == 3
+    assert again["inserted"] == 0
+
+
+def test_rows_without_date_keep_their_id_on_another_day(user, monkeypatch):
+    csv = "Leer,30,,,\n"
+    run_import(user, csv)
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date(2099, 1, 1)
+
+    monkeypatch.setattr(database, "date", Tomorrow)
+    summary = run_import(user, csv)
+
+    assert summary["inserted"] == 0
+    assert summary["duplicates"] == 1
@@ -0,0 +1,57 @@
+"""
+Paginación de sesiones del backend en memoria
+"""
+
+import uuid
+from datetime import date
+
+import pytest
+
+from utils.memory_db import MemoryDB
+
+
+@pytest.fixture
+def user():
+    db = MemoryDB(latency_ms=0, jitter_ms=0)
+    user_id = db.create_account("pages@example.com", "secret")
+    user_db = db.for_user("token", user_id)
+    activity = user_db.create_activity(user_id, "Leer")
+    return user_db, user_id, activity["id"]
+
+
+def insert_sessions(db, activity_id, *dates):
+    sessions = [
+        {
+            "id": str(uuid.uuid4()),
+            "activity_id": activity_id,
+            "duration_minutes": 30,
+            "session_date": session_date
+        }
+        for session_date in dates
+    ]
+    db.insert_sessions_batch(sessions)
+    return sessions
+
+
+def test_session_pages_follow_the_keyset_order(user):
+    db, user_id, activity_id = user
+    insert_sessions(db, activity_id, "2026-01-01", "2026-01-02", "2026-01-02", "2026-01-03", "2026-01-02")
+
+    pages = list(db.iter_user_sessions(user_id, page_size=2, as_records=True))
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    keys = [(row["session_date"], row["id"]) for page in pages for row in page]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_sessions_added_while_paging_do_not_repeat_rows(user):
+    db, user_id, activity_id = user
+    original = insert_sessions(db, activity_id, *["2026-01-01"] * 3, *["2026-01-02"] * 3)
+
+    seen = []
+    for page in db.iter_user_sessions(user_id, page_size=2, as_records=True):
+        seen.extend(row["id"] for row in page)
+        # Una sesión más reciente que todo lo ya leído
+        insert_sessions(db, activity_id, date.today().isoformat())
+
+    assert sorted(seen) == sorted(session["id"] for session in original)
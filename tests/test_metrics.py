@@ -0,0 +1,147 @@
+"""
+Pruebas de compute_habit_metrics (utils/metrics.py)
+"""
+
+from datetime import date, timedelta
+
+import pandas as pd
+
+from utils.metrics import compute_habit_metrics
+
+TODAY = date(2025, 1, 10)
+
+
+def _habits(*goals):
+    return pd.DataFrame({
+        "id": [f"h{index}" for index in range(len(goals))],
+        "total_hours_goal": list(goals)
+    })
+
+
+def _links(*links):
+    return pd.DataFrame(links, columns=["activity_id", "habit_id", "weight"])
+
+
+def _sessions(*sessions):
+    """Sesiones (activity_id, días antes de TODAY, minutos)"""
+    return pd.DataFrame([
+        {
+            "id": f"s{index}",
+            "activity_id": activity_id,
+            "session_date": (TODAY - timedelta(days=days_ago)).isoformat(),
+            "duration_minutes": minutes
+        }
+        for index, (activity_id, days_ago, minutes) in enumerate(sessions)
+    ])
+
+
+def _metrics(habits, links, sessions):
+    result = compute_habit_metrics(habits, links, sessions, today=TODAY)
+    return result.set_index("habit_id").to_dict("index")
+
+
+def test_weighted_minutes_and_sessions():
+    metrics = _metrics(
+        _habits(10, 10),
+        _links(("a1", "h0", 1.0), ("a1", "h1", 0.5), ("a2", "h1", 1.0)),
+        _sessions(("a1", 0, 60), ("a1", 1, 30), ("a2", 0, 20))
+    )
+
+    assert metrics["h0"]["total_minutes_invested"] == 90
+    assert metrics["h0"]["total_sessions"] == 2
+    assert metrics["h1"]["total_minutes_invested"] == 65
+    assert metrics["h1"]["total_sessions"] == 3
+
+
+def test_zero_weight_links_do_not_contribute():
+    metrics = _metrics(
+        _habits(10),
+        _links(("a1", "h0", 0.0)),
+        _sessions(("a1", 0, 60), ("a1", 1, 60))
+    )
+
+    assert metrics["h0"]["total_minutes_invested"] == 0
+    assert metrics["h0"]["total_sessions"] == 0
+    assert metrics["h0"]["current_streak"] == 0
+    assert metrics["h0"]["longest_streak"] == 0
+
+
+def test_streaks_with_gaps():
+    # Serie de 3 días, hueco, serie de 2 que termina hoy
+    metrics = _metrics(
+        _habits(10),
+        _links(("a1", "h0", 1.0)),
+        _sessions(("a1", 6, 30), ("a1", 5, 30), ("a1", 4, 30), ("a1", 1, 30), ("a1", 0, 30))
+    )
+
+    assert metrics["h0"]["current_streak"] == 2
+    assert metrics["h0"]["longest_streak"] == 3
+
+
+def test_current_streak_ending_yesterday_counts():
+    metrics = _metrics(
+        _habits(10),
+        _links(("a1", "h0", 1.0)),
+        _sessions(("a1", 2, 30), ("a1", 1, 30))
+    )
+
+    assert metrics["h0"]["current_streak"] == 2
+    assert metrics["h0"]["longest_streak"] == 2
+
+
+def test_current_streak_broken_before_yesterday():
+    metrics = _metrics(
+        _habits(10),
+        _links(("a1", "h0", 1.0)),
+        _sessions(("a1", 4, 30), ("a1", 3, 30), ("a1", 2, 30))
+    )
+
+    assert metrics["h0"]["current_streak"] == 0
+    assert metrics["h0"]["longest_streak"] == 3
+
+
+def test_several_sessions_on_one_day_count_once_for_streaks():
+    metrics = _metrics(
+        _habits(10),
+        _links(("a1", "h0", 1.0), ("a2", "h0", 1.0)),
+        _sessions(("a1", 0, 30), ("a2", 0, 30), ("a1", 0, 15))
+    )
+
+    assert metrics["h0"]["total_sessions"] == 3
+    assert metrics["h0"]["current_streak"] == 1
+    assert metrics["h0"]["longest_streak"] == 1
+
+
+def test_goal_of_zero_or_missing_gives_zero_completion():
+    metrics = _metrics(
+        _habits(0, None),
+        _links(("a1", "h0", 1.0), ("a1", "h1", 1.0)),
+        _sessions(("a1", 0, 120))
+    )
+
+    assert metrics["h0"]["completion_percentage"] == 0.0
+    assert metrics["h1"]["completion_percentage"] == 0.0
+    assert metrics["h0"]["total_minutes_invested"] == 120
+
+
+def test_completion_is_capped_at_100():
+    metrics = _metrics(
+        _habits(1, 4),
+        _links(("a1", "h0", 1.0), ("a1", "h1", 1.0)),
+        _sessions(("a1", 0, 90))
+    )
+
+    assert metrics["h0"]["completion_percentage"] == 100.0
+    assert metrics["h1"]["completion_percentage"] == 37.5
+
+
+def test_habits_without_links_or_sessions():
+    metrics = _metrics(_habits(10), pd.DataFrame(), pd.DataFrame())
+
+    assert metrics["h0"] == {
+        "total_minutes_invested": 0,
+        "total_sessions": 0,
+        "current_streak": 0,
+        "longest_streak": 0,
+        "completion_percentage": 0.0
+    }
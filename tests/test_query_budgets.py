@@ -0,0 +1,82 @@
+"""
+Presupuesto de round-trips por página
+
+Renderiza main.py y cada página de pages/ con AppTest contra el backend en
+memoria, con la caché de lecturas vacía, dentro de trace_queries, y falla
+si un rerun hace más consultas de las presupuestadas o repite alguna.
+"""
+
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import utils.database as database
+import utils.session_queue as session_queue
+from benchmarks.common import install_backend, login_state, seed_user
+from benchmarks.pages import page_scripts
+from utils.tracing import page_name, trace_queries
+
+# Round-trips permitidos en un rerun con la caché vacía
+QUERY_BUDGETS = {
+    "main": 4,
+    "01_Dashboard": 3,
+    "02_Mis_Habitos": 2,
+    "03_Actividades": 4,
+    "04_Registrar_Sesion": 4
+}
+
+SCRIPTS = {page_name(script): script for script in page_scripts()}
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    """MemoryDB con un usuario "small" instalado como base de datos de la app"""
+    patch = pytest.MonkeyPatch()
+    patch.setattr(database, "_shared_db", database._shared_db)
+    patch.setattr(database, "TRACE_QUERIES_ENABLED", database.TRACE_QUERIES_ENABLED)
+
+    # Las páginas leen la cola de sesiones: un journal temporal
+    journal = os.path.join(tmp_path_factory.mktemp("queue"), "journal.jsonl")
+    patch.setattr(session_queue, "_shared_queue", session_queue.SessionWriteQueue(journal))
+
+    db = install_backend()
+    user = seed_user(db, "small")
+
+    yield db, login_state(db, user["email"])
+
+    patch.undo()
+
+
+def test_every_page_has_a_budget():
+    assert set(SCRIPTS) == set(QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize("page", sorted(QUERY_BUDGETS))
+def test_page_query_budget(backend, page):
+    db, state = backend
+
+    app = AppTest.from_file(SCRIPTS[page], default_timeout=60)
+    for key, value in state.items():
+        app.session_state[key] = value
+
+    db.cache.clear()
+    with trace_queries(page) as trace:
+        app.run()
+
+    assert not app.exception, app.exception[0].value
+    assert trace.round_trips > 0, "la página no abrió la traza (get_user_db)"
+    trace.assert_budget(QUERY_BUDGETS[page])
+
+
+def test_same_request_from_two_methods_is_a_duplicate(backend):
+    db, _ = backend
+    user_id = "00000000-0000-0000-0000-000000000001"
+
+    with trace_queries("duplicates") as trace:
+        db._execute(lambda: [], "GET habits", user_id, True, None, op="get_user_habits")
+        db._execute(lambda: [], "GET habits", user_id, True, None, op="get_habit_names")
+        db._execute(lambda: [], "GET activities", user_id, None, op="get_user_activities")
+
+    assert trace.round_trips == 3
+    assert trace.duplicates == 1
@@ -0,0 +1,68 @@
+"""
+Cola de escritura de sesiones con un SupabaseDB simulado
+"""
+
+import pytest
+from postgrest.exceptions import APIError
+
+from utils.session_queue import SessionWriteQueue
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+ACTIVITY_ID = "00000000-0000-0000-0000-0000000000b1"
+
+
+class FakeDB:
+    """insert_sessions_batch que guarda las sesiones o lanza error"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = 0
+        self.inserted = []
+
+    def insert_sessions_batch(self, sessions):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        self.inserted.extend(sessions)
+        return sessions
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Sin hilo de fondo: las pruebas vacían la cola con flush()
+    monkeypatch.setattr(SessionWriteQueue, "_ensure_worker", lambda self: None)
+    return SessionWriteQueue(str(tmp_path / "journal.jsonl"))
+
+
+def enqueue(queue, db, count):
+    for minutes in range(1, count + 1):
+        queue.enqueue(db, USER_ID, ACTIVITY_ID, minutes * 10)
+
+
+def test_expired_jwt_keeps_sessions_pending_until_rebind(queue):
+    expired = FakeDB(APIError({"code": "PGRST301", "message": "JWT expired"}))
+    enqueue(queue, expired, 4)
+
+    assert queue.flush() == 0
+    assert expired.calls == 1
+    assert queue.stats(USER_ID) == {"pending": 4, "failed": 0}
+
+    # Sin token nuevo no se vuelve a intentar
+    assert queue.flush() == 0
+    assert expired.calls == 1
+
+    fresh = FakeDB()
+    queue.bind(fresh, USER_ID)
+
+    assert queue.flush() == 4
+    assert len(fresh.inserted) == 4
+    assert queue.stats(USER_ID) == {"pending": 0, "failed": 0}
+
+
+def test_rejected_batch_isolates_invalid_sessions(queue):
+    rejected = FakeDB(APIError({"code": "23514", "message": "check constraint"}))
+    enqueue(queue, rejected, 2)
+
+    assert queue.flush() == 0
+    assert rejected.calls == 3
+    assert queue.stats(USER_ID) == {"pending": 0, "failed": 2}
@@ -0,0 +1,187 @@
+"""
+SupabaseDB contra un transporte httpx simulado
+
+Las peticiones pasan por el cliente real de supabase/postgrest instalado,
+así que estas pruebas fallan si cambia dónde guarda el builder la petición.
+"""
+
+import json
+
+import httpx
+import pytest
+from supabase import ClientOptions, create_client
+
+import utils.database as database
+from utils.mirror import LocalMirror
+from utils.tracing import trace_queries
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+HABIT_ROW = {
+    "id": "00000000-0000-0000-0000-0000000000a1",
+    "user_id": USER_ID,
+    "name": "Leer",
+    "is_active": True,
+    "created_at": "2026-01-01T00:00:00+00:00"
+}
+
+
+class FakeSupabase:
+    """Transporte que responde como PostgREST y guarda las peticiones"""
+
+    def __init__(self):
+        self.requests = []
+        self.responses = {}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path.removeprefix("/rest/v1/")
+
+        response = self.responses.get((request.method, path))
+        if callable(response):
+            return response(request)
+        if response is not None:
+            return response
+
+        if path == "rpc/get_data_version":
+            return httpx.Response(200, json=1)
+        if request.method == "POST":
+            return httpx.Response(201, json=[json.loads(request.content)])
+        return httpx.Response(200, json=[])
+
+    def to(self, path: str):
+        """Peticiones recibidas para path"""
+        return [r for r in self.requests if r.url.path == f"/rest/v1/{path}"]
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", "https://example.supabase.co")
+    monkeypatch.setenv("SUPABASE_KEY", "anon-key")
+    monkeypatch.setattr(database, "_rpc_available", {})
+    return FakeSupabase()
+
+
+@pytest.fixture
+def db(fake):
+    http_client = httpx.Client(transport=httpx.MockTransport(fake.handle))
+    client = create_client(
+        "https://example.supabase.co",
+        "anon-key",
+        options=ClientOptions(httpx_client=http_client)
+    )
+    yield database.SupabaseDB(client=client)
+    http_client.close()
+
+
+def test_user_reads_carry_the_user_jwt(fake, db):
+    fake.responses[("GET", "habits")] = httpx.Response(200, json=[HABIT_ROW])
+
+    habits = db.for_user("user-token", USER_ID).get_user_habits(USER_ID)
+
+    assert habits["name"].tolist() == ["Leer"]
+    request = fake.to("habits")[-1]
+    assert request.headers["Authorization"] == "Bearer user-token"
+    assert request.url.params["user_id"] == f"eq.{USER_ID}"
+
+
+def test_user_writes_carry_the_user_jwt(fake, db):
+    activity = db.for_user("user-token", USER_ID).create_activity(USER_ID, "Correr")
+
+    assert activity["name"] == "Correr"
+    request = fake.to("activities")[-1]
+    assert request.method == "POST"
+    assert request.headers["Authorization"] == "Bearer user-token"
+
+
+def test_jwt_does_not_leak_into_the_shared_client(fake, db):
+    db.for_user("user-token", USER_ID).get_user_activities(USER_ID)
+    db.cache.clear()
+    db.get_user_activities(USER_ID)
+
+    first, second = fake.to("activities")
+    assert first.headers["Authorization"] == "Bearer user-token"
+    assert second.headers["Authorization"] != "Bearer user-token"
+
+
+def test_reads_are_retried_after_a_network_error(fake, db, monkeypatch):
+    monkeypatch.setattr(database, "RETRY_BASE_SECONDS", 0)
+    attempts = []
+
+    def flaky(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection reset", request=request)
+        return httpx.Response(200, json=[HABIT_ROW])
+
+    fake.responses[("GET", "habits")] = flaky
+
+    habits = db.get_user_habits(USER_ID)
+
+    assert len(attempts) == 2
+    assert habits["name"].tolist() == ["Leer"]
+
+
+def test_writes_are_not_retried(fake, db):
+    def failing(request):
+        raise httpx.ConnectError("connection reset", request=request)
+
+    fake.responses[("POST", "activities")] = failing
+
+    assert db.create_activity(USER_ID, "Correr") is None
+    assert len(fake.to("activities")) == 1
+
+
+def test_timeouts_are_typed_and_open_the_breaker(fake, db, monkeypatch):
+    monkeypatch.setattr(database, "RETRY_BASE_SECONDS", 0)
+    db.breaker.failure_threshold = database.READ_RETRIES + 1
+
+    def slow(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    fake.responses[("GET", "habits")] = slow
+    db.pop_errors()
+
+    db.get_user_habits(USER_ID)
+
+    assert [type(error) for error in db.pop_errors()] == [database.DataTimeoutError]
+    assert db.breaker.state == "open"
+
+
+def test_pool_timeouts_do_not_count_against_the_breaker(fake, db):
+    db.breaker.failure_threshold = 1
+
+    def saturated(request):
+        raise httpx.PoolTimeout("no free connection", request=request)
+
+    fake.responses[("POST", "activities")] = saturated
+
+    assert db.create_activity(USER_ID, "Correr") is None
+    assert db.breaker.state == "closed"
+
+
+def test_trace_flags_the_same_request_from_two_methods(fake, db):
+    def habits_query():
+        return db.supabase.table("habits").select("*").eq("user_id", USER_ID)
+
+    with trace_queries("duplicates") as trace:
+        db._execute(habits_query(), op="get_user_habits")
+        db._execute(habits_query(), op="get_habit_names")
+        db._execute(db.supabase.table("activities").select("*").eq("user_id", USER_ID))
+
+    assert trace.round_trips == 3
+    assert trace.duplicates == 1
+
+
+def test_mirror_pages_in_a_total_order(fake, db, tmp_path):
+    mirror = LocalMirror(str(tmp_path / "mirror.db"))
+
+    mirror.sync_user(db.for_user("user-token", USER_ID), USER_ID)
+
+    orders = {
+        request.url.path.removeprefix("/rest/v1/"): request.url.params.get("order")
+        for request in fake.requests if "offset" in request.url.params
+    }
+    assert orders["sessions"] == "created_at.asc,id.asc"
+    assert orders["habit_activities"] == "created_at.asc,habit_id.asc,activity_id.asc"
+    assert orders["habit_metrics"] == "habit_id.asc"
@@ -0,0 +1,1094 @@
+"""
+=============================================================================
+CLASE ASYNCSUPABASEDB - HABIT TRACKER
+=============================================================================
+Versión asíncrona de SupabaseDB (categorías, hábitos, actividades, vínculos,
+sesiones y métricas) sobre el cliente async de Supabase, con la misma
+validación (validate_session, validate_sessions_frame), tiempos máximos,
+reintentos, circuit breaker y métricas, y las mismas funciones SQL opcionales
+de sql/ con su alternativa cuando no están instaladas. No tiene caché ni
+espejo local: está pensada para servicios de fondo (ingesta de sesiones,
+recálculos de métricas por lotes).
+
+SyncAsyncSupabaseDB es una fachada síncrona para usarla desde código
+bloqueante como las páginas de Streamlit. La autenticación sigue en
+HabitRepository (get_db).
+
+    db = await AsyncSupabaseDB.create()
+    result = await db.for_user(access_token, user_id).register_sessions_bulk(user_id, frame)
+"""
+
+import asyncio
+import contextvars
+import copy
+import inspect
+import json
+import sys
+import threading
+import time
+from datetime import datetime, date
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+import httpx
+import pandas as pd
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+
+from utils.database import (
+    BREAKER_RESET_SECONDS,
+    BREAKER_THRESHOLD,
+    BULK_CHUNK_SIZE,
+    DEFAULT_POOL_SIZE,
+    MAX_RECENT_ERRORS,
+    MEASURE_PAYLOAD_BYTES,
+    METRICS_BATCH_SIZE,
+    PROMETHEUS_FILE,
+    PROMETHEUS_INTERVAL_SECONDS,
+    QUERY_SINKS,
+    READ_RETRIES,
+    REQUEST_TIMEOUT_SECONDS,
+    RETRY_BASE_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+    _log_error as _log_shared_error,
+    _pop_recent_errors,
+    _projection,
+    _recent_errors,
+    get_credentials,
+    validate_session,
+    validate_sessions_frame
+)
+from utils.instrumentation import QueryMetrics, build_sinks, payload_size
+from utils.resilience import (
+    CircuitBreaker,
+    DataLayerError,
+    DataTimeoutError,
+    DataUnavailableError,
+    as_data_error,
+    backoff_delay
+)
+from utils.schemas import to_frame
+from utils.tracing import request_config
+
+# Peticiones simultáneas por operación masiva
+ASYNC_CONCURRENCY = 4
+
+# Funciones SQL opcionales (carpeta sql/) detectadas como no instaladas
+_rpc_available: Dict[str, bool] = {}
+
+# Errores de la llamada en curso de SyncAsyncSupabaseDB (ver _log_error)
+_call_errors: contextvars.ContextVar[Optional[List[DataLayerError]]] = contextvars.ContextVar(
+    "habit_async_call_errors", default=None
+)
+
+
+def _log_error(message: str, error: Exception) -> None:
+    """
+    Registrar un error de la capa de datos (ver utils.database._log_error)
+
+    Además lo guarda en la llamada de la fachada síncrona que lo originó: en
+    el loop de fondo se mezclan las llamadas de varios hilos.
+    """
+    _log_shared_error(message, error)
+
+    errors = _call_errors.get()
+    if errors is not None:
+        errors.append(as_data_error(message, error))
+
+
+async def create_async_client(pool_size: int = None) -> AsyncClient:
+    """
+    Crear un cliente async de Supabase con un pool HTTP keep-alive propio
+
+    Args:
+        pool_size: Conexiones máximas del pool (default: SUPABASE_POOL_SIZE)
+
+    Returns:
+        Cliente async de Supabase
+    """
+    url, key = get_credentials()
+    pool_size = pool_size or DEFAULT_POOL_SIZE
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=60.0
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=min(REQUEST_TIMEOUT_SECONDS, 10.0))
+    )
+
+    try:
+        options = AsyncClientOptions(httpx_client=http_client)
+    except TypeError:
+        # Versiones de supabase sin inyección de httpx
+        options = None
+
+    if options is not None:
+        return await acreate_client(url, key, options=options)
+
+    return await acreate_client(url, key)
+
+
+class AsyncSupabaseDB:
+    """
+    Operaciones de datos de SupabaseDB en versión async
+
+    Crear con `await AsyncSupabaseDB.create()`; usar for_user() para que las
+    consultas viajen con el JWT de un usuario. Como en SupabaseDB, las
+    lecturas y escrituras capturan sus errores (ver _log_error) y devuelven
+    DataFrames vacíos, None o False.
+    """
+
+    def __init__(self, client: AsyncClient):
+        """
+        Args:
+            client: Cliente async ya creado (ver create_async_client)
+        """
+        self.supabase: AsyncClient = client
+        self._access_token: Optional[str] = None
+        self._user_id: Optional[str] = None
+
+        # Métricas y circuit breaker compartidos por las vistas for_user
+        self.metrics = QueryMetrics(
+            build_sinks(QUERY_SINKS, PROMETHEUS_FILE, PROMETHEUS_INTERVAL_SECONDS),
+            measure_bytes=MEASURE_PAYLOAD_BYTES
+        )
+        self.breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_SECONDS)
+
+    @classmethod
+    async def create(cls, pool_size: int = None) -> "AsyncSupabaseDB":
+        """Crear la instancia con un cliente async nuevo"""
+        return cls(await create_async_client(pool_size))
+
+    def for_user(self, access_token: str, user_id: str = None) -> "AsyncSupabaseDB":
+        """Obtener una vista ligada al JWT de un usuario (ver SupabaseDB.for_user)"""
+        user_db = copy.copy(self)
+        user_db._access_token = access_token
+        user_db._user_id = user_id
+        return user_db
+
+    def query_report(self) -> pd.DataFrame:
+        """Reporte de latencia y volumen por método (ver SupabaseDB.query_report)"""
+        return self.metrics.report()
+
+    def cache_stats(self, method: str = None) -> Dict[str, Any]:
+        """Sin caché de lecturas: siempre vacío"""
+        return {}
+
+    async def _execute(self, query, op: str = None, idempotent: bool = None):
+        """
+        Ejecutar una consulta con el JWT del contexto actual (si existe)
+
+        Igual que SupabaseDB._execute: tiempo máximo por intento, reintentos
+        con backoff ante timeouts y errores de red (por defecto solo lecturas
+        GET/HEAD), circuit breaker y registro en self.metrics.
+
+        Raises:
+            DataTimeoutError: Sin respuesta a tiempo en ningún intento
+            DataUnavailableError: Circuito abierto o error de red persistente
+        """
+        op = op or sys._getframe(1).f_code.co_name
+        request = request_config(query)
+
+        if idempotent is None:
+            idempotent = getattr(request, "http_method", "POST") in ("GET", "HEAD")
+        attempts = 1 + (READ_RETRIES if idempotent else 0)
+
+        if self._access_token:
+            # Solo en esta petición: el cliente y su transporte son compartidos
+            request.headers["Authorization"] = f"Bearer {self._access_token}"
+
+        started = time.perf_counter()
+        try:
+            response = await self._execute_attempts(query, op, attempts)
+        except Exception as e:
+            self.metrics.record(op, time.perf_counter() - started, 0, 0, e)
+            raise
+
+        rows, size = payload_size(response.data, self.metrics.measures_bytes)
+        self.metrics.record(op, time.perf_counter() - started, rows, size)
+        return response
+
+    async def _execute_attempts(self, query, op: str, attempts: int):
+        """Intentos de _execute con circuit breaker y backoff"""
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise DataUnavailableError(f"Circuito abierto ({op})")
+
+            try:
+                response = await asyncio.wait_for(query.execute(), REQUEST_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError) as e:
+                self.breaker.record_failure()
+
+                if attempt + 1 < attempts:
+                    await asyncio.sleep(backoff_delay(attempt, RETRY_BASE_SECONDS, RETRY_MAX_DELAY_SECONDS))
+                    continue
+
+                if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)):
+                    raise DataTimeoutError(op, e) from e
+                raise DataUnavailableError(op, e) from e
+            except Exception:
+                # Supabase respondió (con un error de la consulta): está disponible
+                self.breaker.record_success()
+                raise
+
+            self.breaker.record_success()
+            return response
+
+    async def gather(self, **calls) -> Dict[str, Any]:
+        """
+        Ejecutar varias lecturas en paralelo (equivalente a fetch_many)
+
+        Args:
+            **calls: nombre_resultado=(nombre_método, *args[, kwargs])
+
+        Returns:
+            Diccionario {nombre_resultado: resultado}, en el mismo orden
+        """
+        coroutines = []
+
+        for method, *args in calls.values():
+            kwargs = args.pop() if args and isinstance(args[-1], dict) else {}
+            coroutines.append(getattr(self, method)(*args, **kwargs))
+
+        return dict(zip(calls.keys(), await asyncio.gather(*coroutines)))
+
+    # =========================================================================
+    # CATEGORÍAS
+    # =========================================================================
+
+    async def _system_categories(self) -> List[Dict[str, Any]]:
+        """Categorías predefinidas (lanza la excepción si falla la lectura)"""
+        response = await self._execute(
+            self.supabase.table("categories").select(_projection("categories")),
+            op="get_system_categories"
+        )
+        return response.data or []
+
+    async def get_categories(self) -> pd.DataFrame:
+        """Obtener todas las categorías predefinidas"""
+        try:
+            return to_frame("categories", await self._system_categories())
+        except Exception as e:
+            _log_error("Error obteniendo categorías", e)
+            return pd.DataFrame()
+
+    async def create_user_category(
+        self,
+        user_id: str,
+        name: str,
+        color: str = "#3B82F6"
+    ) -> Optional[Dict[str, Any]]:
+        """Crear categoría personalizada del usuario"""
+        try:
+            response = await self._execute(self.supabase.table("user_categories").insert({
+                "user_id": user_id,
+                "name": name.strip(),
+                "color": color
+            }))
+            return response.data[0] if response.data else None
+        except Exception as e:
+            _log_error("Error creando categoría", e)
+            return None
+
+    async def get_user_categories(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Obtener las categorías personalizadas del usuario (None si hubo un error)"""
+        try:
+            response = await self._execute(self.supabase.table("user_categories").select(
+                _projection("user_categories")
+            ).eq("user_id", user_id))
+            return response.data or []
+        except Exception as e:
+            _log_error("Error obteniendo categorías del usuario", e)
+            return None
+
+    async def get_all_categories_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        """Obtener categorías predefinidas + personalizadas del usuario"""
+        async def system_categories() -> List[Dict[str, Any]]:
+            try:
+                return await self._system_categories()
+            except Exception as e:
+                _log_error("Error obteniendo categorías", e)
+                return []
+
+        predefined, personal = await asyncio.gather(
+            system_categories(),
+            self.get_user_categories(user_id)
+        )
+
+        result = []
+        for cat_type, rows in (("system", predefined), ("personal", personal or [])):
+            for cat in rows:
+                result.append({
+                    "id": cat["id"],
+                    "name": cat["name"],
+                    "type": cat_type,
+                    "color": cat.get("color", "#3B82F6")
+                })
+
+        return result
+
+    # =========================================================================
+    # HÁBITOS/METAS
+    # =========================================================================
+
+    async def create_habit(
+        self,
+        user_id: str,
+        name: str,
+        target_minutes_per_week: int = 420,
+        max_minutes_per_week: int = 900,
+        total_hours_goal: int = 100,
+        description: str = None,
+        category_id: int = None
+    ) -> Optional[Dict[str, Any]]:
+        """Crear nuevo hábito/meta personalizada (ver SupabaseDB.create_habit)"""
+        try:
+            if not name or not name.strip():
+                print("Error: El nombre del hábito no puede estar vacío")
+                return None
+
+            response = await self._execute(self.supabase.table("habits").insert({
+                "user_id": user_id,
+                "name": name.strip(),
+                "description": description.strip() if description else None,
+                "category_id": category_id,
+                "target_minutes_per_week": target_minutes_per_week,
+                "max_minutes_per_week": max_minutes_per_week,
+                "total_hours_goal": total_hours_goal,
+                "is_active": True
+            }))
+
+            if response.data:
+                await self._execute(self.supabase.table("habit_metrics").insert({
+                    "habit_id": response.data[0]["id"],
+                    "total_minutes_invested": 0,
+                    "total_sessions": 0,
+                    "current_streak": 0,
+                    "longest_streak": 0,
+                    "completion_percentage": 0.0
+                }))
+                return response.data[0]
+
+            return None
+        except Exception as e:
+            _log_error("Error creando hábito", e)
+            return None
+
+    async def get_user_habits(
+        self,
+        user_id: str,
+        active_only: bool = True,
+        columns: str = None
+    ) -> pd.DataFrame:
+        """Obtener hábitos del usuario"""
+        try:
+            query = self.supabase.table("habits").select(
+                _projection("habits", columns)
+            ).eq("user_id", user_id)
+
+            if active_only:
+                query = query.eq("is_active", True)
+
+            response = await self._execute(query.order("created_at", desc=True))
+            return to_frame("habits", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo hábitos", e)
+            return pd.DataFrame()
+
+    async def update_habit(self, habit_id: str, updates: Dict[str, Any]) -> bool:
+        """Actualizar un hábito"""
+        try:
+            updates["updated_at"] = datetime.now().isoformat()
+            response = await self._execute(
+                self.supabase.table("habits").update(updates).eq("id", habit_id)
+            )
+            return bool(response.data)
+        except Exception as e:
+            _log_error("Error actualizando hábito", e)
+            return False
+
+    async def delete_habit(self, habit_id: str) -> bool:
+        """Eliminar un hábito (soft delete - marca como inactivo)"""
+        return await self.update_habit(habit_id, {"is_active": False})
+
+    async def get_habit_progress(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Obtener progreso de todos los hábitos del usuario usando la vista"""
+        try:
+            response = await self._execute(self.supabase.table("habit_progress").select(
+                _projection("habit_progress", columns)
+            ).eq("user_id", user_id))
+            return to_frame("habit_progress", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo progreso", e)
+            return pd.DataFrame()
+
+    # =========================================================================
+    # ACTIVIDADES
+    # =========================================================================
+
+    async def create_activity(
+        self,
+        user_id: str,
+        name: str,
+        category_id: int = None,
+        description: str = None
+    ) -> Optional[Dict[str, Any]]:
+        """Crear nueva actividad"""
+        try:
+            if not name or not name.strip():
+                print("Error: El nombre de la actividad no puede estar vacío")
+                return None
+
+            response = await self._execute(self.supabase.table("activities").insert({
+                "user_id": user_id,
+                "name": name.strip(),
+                "category_id": category_id,
+                "description": description.strip() if description else None
+            }))
+            return response.data[0] if response.data else None
+        except Exception as e:
+            _log_error("Error creando actividad", e)
+            return None
+
+    async def get_user_activities(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Obtener actividades del usuario"""
+        try:
+            response = await self._execute(self.supabase.table("activities").select(
+                _projection("activities", columns)
+            ).eq("user_id", user_id).order("created_at", desc=True))
+            return to_frame("activities", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo actividades", e)
+            return pd.DataFrame()
+
+    async def update_activity(self, activity_id: str, updates: Dict[str, Any]) -> bool:
+        """Actualizar actividad"""
+        try:
+            updates["updated_at"] = datetime.now().isoformat()
+            response = await self._execute(
+                self.supabase.table("activities").update(updates).eq("id", activity_id)
+            )
+            return bool(response.data)
+        except Exception as e:
+            _log_error("Error actualizando actividad", e)
+            return False
+
+    async def delete_activity(self, activity_id: str) -> bool:
+        """Eliminar actividad"""
+        try:
+            await self._execute(self.supabase.table("activities").delete().eq("id", activity_id))
+            return True
+        except Exception as e:
+            _log_error("Error eliminando actividad", e)
+            return False
+
+    # =========================================================================
+    # VINCULACIÓN HÁBITOS-ACTIVIDADES
+    # =========================================================================
+
+    async def link_activity_to_habit(
+        self,
+        habit_id: str,
+        activity_id: str,
+        weight: float = 1.0
+    ) -> bool:
+        """Vincular actividad a hábito con peso (upsert)"""
+        try:
+            if weight < 0 or weight > 1:
+                print("Error: El peso debe estar entre 0 y 1")
+                return False
+
+            response = await self._execute(self.supabase.table("habit_activities").upsert({
+                "habit_id": habit_id,
+                "activity_id": activity_id,
+                "weight": weight,
+                "updated_at": datetime.now().isoformat()
+            }, on_conflict="habit_id,activity_id"))
+            return bool(response.data)
+        except Exception as e:
+            _log_error("Error vinculando actividad a hábito", e)
+            return False
+
+    async def set_activity_links(self, activity_id: str, links: Dict[str, float]) -> bool:
+        """
+        Reemplazar todos los vínculos de una actividad (ver
+        SupabaseDB.set_activity_links); sin la función SQL instalada aplica
+        un upsert más un delete
+        """
+        try:
+            if any(weight < 0 or weight > 1 for weight in links.values()):
+                print("Error: El peso debe estar entre 0 y 1")
+                return False
+
+            if _rpc_available.get("set_activity_links", True):
+                try:
+                    await self._execute(self.supabase.rpc("set_activity_links", {
+                        "p_activity_id": activity_id,
+                        "p_links": {habit_id: float(weight) for habit_id, weight in links.items()}
+                    }))
+                    return True
+                except Exception as e:
+                    # PGRST202: la función no existe en el esquema
+                    if getattr(e, "code", None) != "PGRST202":
+                        raise
+                    _rpc_available["set_activity_links"] = False
+
+            if links:
+                now = datetime.now().isoformat()
+                await self._execute(self.supabase.table("habit_activities").upsert(
+                    [
+                        {
+                            "habit_id": habit_id,
+                            "activity_id": activity_id,
+                            "weight": float(weight),
+                            "updated_at": now
+                        }
+                        for habit_id, weight in links.items()
+                    ],
+                    on_conflict="habit_id,activity_id"
+                ))
+
+            delete_query = self.supabase.table("habit_activities").delete().eq(
+                "activity_id", activity_id
+            )
+            if links:
+                delete_query = delete_query.not_.in_("habit_id", list(links.keys()))
+            await self._execute(delete_query)
+
+            return True
+        except Exception as e:
+            _log_error("Error guardando vínculos", e)
+            return False
+
+    async def unlink_activity_from_habit(self, habit_id: str, activity_id: str) -> bool:
+        """Desvincular actividad de hábito"""
+        try:
+            await self._execute(self.supabase.table("habit_activities").delete().eq(
+                "habit_id", habit_id
+            ).eq("activity_id", activity_id))
+            return True
+        except Exception as e:
+            _log_error("Error desvinculando", e)
+            return False
+
+    async def get_activity_links(self, activity_id: str) -> pd.DataFrame:
+        """Obtener todos los hábitos vinculados a una actividad"""
+        try:
+            response = await self._execute(self.supabase.table("habit_activities").select(
+                "habit_id, activity_id, weight, habits(id, name)"
+            ).eq("activity_id", activity_id))
+            return to_frame("habit_activities", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo vínculos", e)
+            return pd.DataFrame()
+
+    async def get_user_activity_links(self, user_id: str) -> pd.DataFrame:
+        """Obtener todos los vínculos actividad→hábito del usuario en una consulta"""
+        columns = ["activity_id", "habit_id", "habit_name", "weight"]
+        try:
+            response = await self._execute(self.supabase.table("habit_activities").select(
+                "activity_id, habit_id, weight, habits(name), activities!inner(user_id)"
+            ).eq("activities.user_id", user_id))
+
+            if not response.data:
+                return pd.DataFrame(columns=columns)
+
+            return to_frame("habit_activities", [
+                {
+                    "activity_id": link["activity_id"],
+                    "habit_id": link["habit_id"],
+                    "habit_name": (link.get("habits") or {}).get("name", "Desconocido"),
+                    "weight": link.get("weight", 1.0)
+                }
+                for link in response.data
+            ])
+        except Exception as e:
+            _log_error("Error obteniendo vínculos del usuario", e)
+            return pd.DataFrame(columns=columns)
+
+    async def get_habit_activities_matrix(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Obtener matriz de actividades por hábito usando la vista"""
+        try:
+            response = await self._execute(self.supabase.table("activity_habit_matrix").select(
+                _projection("activity_habit_matrix", columns)
+            ).eq("user_id", user_id))
+            return to_frame("activity_habit_matrix", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo matriz", e)
+            return pd.DataFrame()
+
+    # =========================================================================
+    # SESIONES
+    # =========================================================================
+
+    async def register_session(
+        self,
+        activity_id: str,
+        duration_minutes: int,
+        session_date: date = None,
+        start_time: str = None,
+        notes: str = None,
+        mood: int = None,
+        productivity_level: int = None
+    ) -> Optional[Dict[str, Any]]:
+        """Registrar sesión de actividad (el trigger distribuye el tiempo)"""
+        try:
+            error = validate_session(duration_minutes, mood, productivity_level)
+            if error:
+                print(f"Error: {error}")
+                return None
+
+            response = await self._execute(self.supabase.table("sessions").insert({
+                "activity_id": activity_id,
+                "duration_minutes": duration_minutes,
+                "session_date": (session_date or date.today()).isoformat(),
+                "start_time": start_time,
+                "notes": notes,
+                "mood": mood,
+                "productivity_level": productivity_level
+            }))
+            return response.data[0] if response.data else None
+        except Exception as e:
+            _log_error("Error registrando sesión", e)
+            return None
+
+    async def insert_sessions_batch(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insertar varias sesiones ya validadas en una sola petición
+
+        Las sesiones traen su propio "id": el insert ignora ids ya existentes,
+        así que reintentar un lote es seguro. Los errores se propagan.
+
+        Returns:
+            Filas insertadas (las duplicadas no se devuelven)
+        """
+        if not sessions:
+            return []
+
+        response = await self._execute(
+            self.supabase.table("sessions").upsert(
+                sessions,
+                on_conflict="id",
+                ignore_duplicates=True
+            ),
+            idempotent=True
+        )
+        return response.data or []
+
+    async def register_sessions_bulk(
+        self,
+        user_id: str,
+        sessions: pd.DataFrame,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        concurrency: int = ASYNC_CONCURRENCY,
+        recompute_metrics: bool = True,
+        seen: Dict[tuple, int] = None
+    ) -> Dict[str, Any]:
+        """
+        Registrar muchas sesiones (ver HabitRepository.register_sessions_bulk),
+        con hasta concurrency lotes en vuelo
+
+        Returns:
+            Diccionario con inserted, duplicates, rejected (DataFrame),
+            failed (filas de lotes que fallaron), activity_ids afectadas y
+            habits_recomputed
+        """
+        valid, rejected = validate_sessions_frame(sessions, user_id, seen)
+
+        result = {
+            "inserted": 0,
+            "duplicates": 0,
+            "rejected": rejected,
+            "failed": 0,
+            "activity_ids": set(),
+            "habits_recomputed": 0
+        }
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def insert_chunk(start: int) -> None:
+            # to_json convierte NaN/NA en null y los enteros de numpy en int
+            records = json.loads(valid.iloc[start:start + chunk_size].to_json(orient="records"))
+
+            async with semaphore:
+                try:
+                    inserted = await self.insert_sessions_batch(records)
+                except Exception as e:
+                    _log_error("Error insertando lote de sesiones", e)
+                    result["failed"] += len(records)
+                    return
+
+            result["inserted"] += len(inserted)
+            result["duplicates"] += len(records) - len(inserted)
+            result["activity_ids"].update(row["activity_id"] for row in inserted)
+
+        await asyncio.gather(*[insert_chunk(start) for start in range(0, len(valid), chunk_size)])
+
+        if recompute_metrics:
+            result["habits_recomputed"] = await self.refresh_metrics_for_activities(
+                user_id, result["activity_ids"]
+            )
+
+        return result
+
+    async def get_user_sessions(
+        self,
+        user_id: str,
+        limit: int = 100,
+        start_date: date = None,
+        end_date: date = None,
+        columns: str = None
+    ) -> pd.DataFrame:
+        """Obtener sesiones del usuario, de la más reciente a la más antigua"""
+        try:
+            query = self.supabase.table("sessions").select(
+                _projection("sessions", columns)
+            ).eq("activities.user_id", user_id)
+
+            if start_date:
+                query = query.gte("session_date", start_date.isoformat())
+
+            if end_date:
+                query = query.lte("session_date", end_date.isoformat())
+
+            response = await self._execute(query.order("session_date", desc=True).limit(limit))
+            return to_frame("sessions", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo sesiones", e)
+            return pd.DataFrame()
+
+    async def iter_user_sessions(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None,
+        page_size: int = 1000,
+        as_records: bool = False,
+        columns: str = None
+    ) -> AsyncIterator[Any]:
+        """
+        Recorrer todas las sesiones del usuario por páginas (keyset, ver
+        SupabaseDB.iter_user_sessions)
+
+        Raises:
+            Exception: Si una página falla, para no truncar el resultado en silencio
+        """
+        cursor = None
+
+        while True:
+            query = self.supabase.table("sessions").select(
+                _projection("sessions", columns)
+            ).eq("activities.user_id", user_id)
+
+            if start_date:
+                query = query.gte("session_date", start_date.isoformat())
+
+            if end_date:
+                query = query.lte("session_date", end_date.isoformat())
+
+            if cursor is not None:
+                last_date, last_id = cursor
+                query = query.or_(
+                    f"session_date.lt.{last_date},"
+                    f"and(session_date.eq.{last_date},id.lt.{last_id})"
+                )
+
+            try:
+                response = await self._execute(
+                    query.order("session_date", desc=True)
+                    .order("id", desc=True)
+                    .limit(page_size)
+                )
+            except Exception as e:
+                _log_error("Error obteniendo página de sesiones", e)
+                raise
+
+            rows = response.data or []
+            if not rows:
+                return
+
+            yield rows if as_records else to_frame("sessions", rows)
+
+            if len(rows) < page_size:
+                return
+
+            cursor = (rows[-1]["session_date"], rows[-1]["id"])
+
+    async def get_user_session_stats(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None
+    ) -> Optional[Dict[str, Any]]:
+        """Estadísticas de TODAS las sesiones de un período (ver HabitRepository.get_user_session_stats)"""
+        try:
+            total_sessions = 0
+            total_minutes = 0
+            mood_sum = 0
+            mood_count = 0
+
+            async for rows in self.iter_user_sessions(
+                user_id, start_date, end_date, as_records=True, columns="summary"
+            ):
+                total_sessions += len(rows)
+                for row in rows:
+                    total_minutes += row.get("duration_minutes") or 0
+                    if row.get("mood") is not None:
+                        mood_sum += row["mood"]
+                        mood_count += 1
+
+            return {
+                "total_sessions": total_sessions,
+                "total_minutes": total_minutes,
+                "avg_minutes": total_minutes / total_sessions if total_sessions else 0,
+                "avg_mood": mood_sum / mood_count if mood_count else None
+            }
+        except Exception as e:
+            _log_error("Error calculando estadísticas de sesiones", e)
+            return None
+
+    async def get_activity_contribution(self, user_id: str) -> pd.DataFrame:
+        """Obtener contribución de actividades a hábitos usando la vista"""
+        try:
+            response = await self._execute(self.supabase.table("activity_habit_contribution").select(
+                "*, activities!inner(user_id)"
+            ).eq("activities.user_id", user_id))
+            return to_frame("activity_habit_contribution", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo contribuciones", e)
+            return pd.DataFrame()
+
+    # =========================================================================
+    # MÉTRICAS Y ESTADÍSTICAS
+    # =========================================================================
+
+    async def get_weekly_summary(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Obtener resumen semanal de progreso usando la vista"""
+        try:
+            response = await self._execute(self.supabase.table("weekly_summary").select(
+                _projection("weekly_summary", columns)
+            ).eq("user_id", user_id))
+            return to_frame("weekly_summary", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo resumen semanal", e)
+            return pd.DataFrame()
+
+    async def get_habit_metrics(self, habit_id: str) -> Optional[Dict[str, Any]]:
+        """Obtener métricas de un hábito específico"""
+        try:
+            response = await self._execute(self.supabase.table("habit_metrics").select(
+                _projection("habit_metrics")
+            ).eq("habit_id", habit_id))
+            return response.data[0] if response.data else None
+        except Exception as e:
+            _log_error("Error obteniendo métricas", e)
+            return None
+
+    async def get_user_habit_metrics(self, user_id: str) -> pd.DataFrame:
+        """Obtener las métricas guardadas de todos los hábitos del usuario"""
+        try:
+            response = await self._execute(self.supabase.table("habit_metrics").select(
+                f"{_projection('habit_metrics')}, habits!inner(user_id)"
+            ).eq("habits.user_id", user_id))
+            return to_frame("habit_metrics", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo métricas del usuario", e)
+            return pd.DataFrame()
+
+    async def upsert_habit_metrics(self, metrics: List[Dict[str, Any]]) -> bool:
+        """Guardar métricas calculadas fuera de Supabase (ver utils/metrics.py)"""
+        if not metrics:
+            return True
+
+        try:
+            await self._execute(
+                self.supabase.table("habit_metrics").upsert(metrics, on_conflict="habit_id"),
+                idempotent=True
+            )
+            return True
+        except Exception as e:
+            _log_error("Error guardando métricas", e)
+            return False
+
+    async def update_habit_metrics(self, habit_id: str) -> bool:
+        """Forzar actualización de métricas de un hábito"""
+        try:
+            await self._execute(
+                self.supabase.rpc("update_habit_metrics", {"p_habit_id": habit_id}),
+                idempotent=True
+            )
+            return True
+        except Exception as e:
+            _log_error("Error actualizando métricas", e)
+            return False
+
+    async def update_habit_metrics_batch(
+        self,
+        habit_ids: List[str],
+        chunk_size: int = METRICS_BATCH_SIZE,
+        concurrency: int = ASYNC_CONCURRENCY
+    ) -> int:
+        """
+        Recalcular las métricas de muchos hábitos
+
+        Usa update_habit_metrics_batch (sql/update_habit_metrics_batch.sql)
+        con hasta chunk_size hábitos por llamada; si no está instalada, llama
+        update_habit_metrics por hábito, con hasta concurrency en vuelo.
+
+        Returns:
+            Número de hábitos recalculados
+        """
+        habit_ids = list(dict.fromkeys(habit_ids))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def update_one(habit_id: str) -> bool:
+            async with semaphore:
+                return await self.update_habit_metrics(habit_id)
+
+        async def update_chunk(chunk: List[str]) -> int:
+            if _rpc_available.get("update_habit_metrics_batch", True):
+                try:
+                    async with semaphore:
+                        response = await self._execute(
+                            self.supabase.rpc("update_habit_metrics_batch", {"p_habit_ids": chunk}),
+                            idempotent=True
+                        )
+                    return response.data if isinstance(response.data, int) else len(chunk)
+                except Exception as e:
+                    # PGRST202: la función no existe en el esquema
+                    if getattr(e, "code", None) != "PGRST202":
+                        _log_error("Error actualizando métricas en lote", e)
+                        return 0
+                    _rpc_available["update_habit_metrics_batch"] = False
+
+            results = await asyncio.gather(*[update_one(habit_id) for habit_id in chunk])
+            return sum(results)
+
+        counts = await asyncio.gather(*[
+            update_chunk(habit_ids[start:start + chunk_size])
+            for start in range(0, len(habit_ids), chunk_size)
+        ])
+        return sum(counts)
+
+    async def refresh_metrics_for_activities(self, user_id: str, activity_ids: Iterable[str]) -> int:
+        """
+        Recalcular una vez las métricas de cada hábito vinculado a las
+        actividades indicadas
+
+        Si no se pueden leer los vínculos, el error queda registrado y
+        devuelve 0 (las sesiones ya insertadas no se pierden).
+
+        Returns:
+            Número de hábitos recalculados
+        """
+        activity_ids = set(activity_ids)
+        if not activity_ids:
+            return 0
+
+        links = await self.get_user_activity_links(user_id)
+        if links.empty:
+            return 0
+
+        habit_ids = links.loc[links["activity_id"].isin(activity_ids), "habit_id"].unique()
+
+        return await self.update_habit_metrics_batch(list(habit_ids))
+
+
+class SyncAsyncSupabaseDB:
+    """
+    Fachada síncrona sobre AsyncSupabaseDB
+
+    Mantiene un event loop en un hilo de fondo y expone los mismos métodos
+    como llamadas bloqueantes (iter_user_sessions como generador normal),
+    más fetch_many y pop_errors como HabitRepository, para usarla desde las
+    páginas existentes.
+    """
+
+    def __init__(self, async_db: AsyncSupabaseDB = None, pool_size: int = None):
+        """
+        Args:
+            async_db: Instancia async ya creada (opcional)
+            pool_size: Tamaño del pool HTTP si se crea una nueva
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="async-supabase-loop",
+            daemon=True
+        )
+        self._thread.start()
+
+        self.async_db = async_db or self._run(AsyncSupabaseDB.create(pool_size))
+
+    def _run(self, coroutine):
+        """
+        Ejecutar una corrutina en el loop de fondo y esperar el resultado
+
+        Los errores que registre pasan al hilo que llama (ver pop_errors).
+        """
+        errors: List[DataLayerError] = []
+
+        async def collecting():
+            _call_errors.set(errors)
+            return await coroutine
+
+        try:
+            return asyncio.run_coroutine_threadsafe(collecting(), self._loop).result()
+        finally:
+            if errors:
+                recent = _recent_errors()
+                recent.extend(errors)
+                del recent[:-MAX_RECENT_ERRORS]
+
+    def _iterate(self, generator):
+        """Recorrer un generador async desde el hilo que llama"""
+        try:
+            while True:
+                try:
+                    yield self._run(generator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._run(generator.aclose())
+
+    def for_user(self, access_token: str, user_id: str = None) -> "SyncAsyncSupabaseDB":
+        """Obtener una fachada ligada al JWT de un usuario (mismo loop)"""
+        facade = copy.copy(self)
+        facade.async_db = self.async_db.for_user(access_token, user_id)
+        return facade
+
+    def fetch_many(self, **calls) -> Dict[str, Any]:
+        """Ejecutar varias lecturas en paralelo en el loop de fondo (ver HabitRepository.fetch_many)"""
+        return self._run(self.async_db.gather(**calls))
+
+    def pop_errors(self) -> List[DataLayerError]:
+        """Sacar los errores de la capa de datos del hilo actual"""
+        return _pop_recent_errors()
+
+    def close(self) -> None:
+        """Detener el loop de fondo"""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __getattr__(self, name: str):
+        # Atributos privados/internos no se delegan (evita recursión en copy)
+        if name.startswith("_") or name == "async_db":
+            raise AttributeError(name)
+
+        attribute = getattr(self.async_db, name)
+
+        if inspect.isasyncgenfunction(attribute):
+            def generator(*args, **kwargs):
+                return self._iterate(attribute(*args, **kwargs))
+
+            generator.__name__ = name
+            generator.__doc__ = attribute.__doc__
+            return generator
+
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        def method(*args, **kwargs):
+            return self._run(attribute(*args, **kwargs))
+
+        method.__name__ = name
+        method.__doc__ = attribute.__doc__
+        return method
@@ -0,0 +1,159 @@
+"""
+=============================================================================
+CACHÉ DE LECTURAS - HABIT TRACKER
+=============================================================================
+Caché LRU con TTL para las lecturas de SupabaseDB, indexada por usuario
+para poder invalidar con precisión después de cada escritura
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+
+class ReadCache:
+    """
+    Caché en memoria (thread-safe) con expiración por TTL y desalojo LRU
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 512):
+        """
+        Args:
+            ttl_seconds: Segundos que una entrada se considera fresca
+            max_entries: Número máximo de entradas antes de desalojar (LRU)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, str]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[Hashable]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self._method_stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, method: str, field: str) -> None:
+        stats = self._method_stats.setdefault(method, {"hits": 0, "misses": 0})
+        stats[field] += 1
+
+    def get(self, key: Tuple, ttl_seconds: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        Buscar una entrada fresca
+
+        Args:
+            key: Tupla (método, ...) que identifica la lectura
+            ttl_seconds: Antigüedad máxima para esta búsqueda (default: la
+                de la caché)
+
+        Returns:
+            Tupla (encontrado, valor)
+        """
+        method = key[0]
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and time.monotonic() - entry[0] <= ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._count(method, "hits")
+                return True, entry[1]
+
+            # Las entradas vencidas se conservan (hasta que el LRU las
+            # desaloje) como último dato bueno para get_stale
+            self.misses += 1
+            self._count(method, "misses")
+            return False, None
+
+    def get_stale(self, key: Tuple) -> Tuple[bool, Any]:
+        """
+        Buscar una entrada sin importar su antigüedad (no cuenta en las
+        estadísticas)
+
+        Returns:
+            Tupla (encontrado, valor)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return False, None
+
+            return True, entry[1]
+
+    def set(self, key: Tuple, value: Any, user_id: str) -> None:
+        """
+        Guardar una entrada asociada a un usuario
+
+        Args:
+            key: Tupla (método, ...) que identifica la lectura
+            value: Resultado a guardar
+            user_id: Usuario dueño de los datos (para invalidar)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic(), value, user_id)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key: Hashable) -> None:
+        """Eliminar una entrada (requiere tener el lock)"""
+        _, _, user_id = self._entries.pop(key)
+        keys = self._keys_by_user.get(user_id)
+
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def invalidate_user(self, user_id: str) -> int:
+        """
+        Eliminar todas las entradas de un usuario
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = list(self._keys_by_user.get(user_id, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Vaciar la caché completa"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self, method: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Obtener contadores de aciertos/fallos
+
+        Args:
+            method: Nombre del método (opcional, default: totales)
+
+        Returns:
+            Diccionario con hits, misses, hit_rate y entradas actuales
+        """
+        with self._lock:
+            if method is not None:
+                counts = dict(self._method_stats.get(method, {"hits": 0, "misses": 0}))
+            else:
+                counts = {"hits": self.hits, "misses": self.misses}
+                counts["by_method"] = {
+                    name: dict(values) for name, values in self._method_stats.items()
+                }
+
+            total = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / total, 3) if total else 0.0
+            counts["entries"] = len(self._entries)
+
+            return counts
@@ -6,33 +6,1476 @@ Maneja todas las operaciones con la base de datos Supabase
 """
 
 import os
-from typing import Optional, List, Dict, Any
+import sys
+import copy
+import json
+import time
+import functools
+import threading
+import uuid
+import contextvars
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from datetime import datetime, date
+import httpx
 import pandas as pd
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 
+try:
+    from supabase_auth import SyncGoTrueClient
+except ImportError:  # supabase < 2.8
+    from gotrue import SyncGoTrueClient
+
+from utils.cache import ReadCache
+from utils.instrumentation import QueryMetrics, build_sinks, payload_size
+from utils.mirror import LocalMirror
+from utils.resilience import (
+    CircuitBreaker,
+    DataLayerError,
+    DataTimeoutError,
+    DataUnavailableError,
+    as_data_error,
+    backoff_delay
+)
+from utils.schemas import to_frame
+from utils.tracing import (
+    begin_rerun,
+    caller_site,
+    current_trace,
+    page_name,
+    query_signature,
+    request_config,
+    run_at_site
+)
+
 # Cargar variables de entorno
 load_dotenv()
 
+# Tamaño del pool de conexiones HTTP keep-alive compartido por el proceso
+DEFAULT_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+
+# Hilos para lecturas concurrentes (fetch_many)
+FETCH_WORKERS = int(os.getenv("HABIT_FETCH_WORKERS", "8"))
+
+# Tiempo máximo por petición y reintentos de las lecturas (backoff con jitter)
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("HABIT_REQUEST_TIMEOUT", "10"))
+READ_RETRIES = int(os.getenv("HABIT_READ_RETRIES", "2"))
+RETRY_BASE_SECONDS = 0.2
+RETRY_MAX_DELAY_SECONDS = 2.0
+
+# Instrumentación de consultas: sinks extra ("log", "prometheus") y archivo
+# del sink de Prometheus (ver utils/instrumentation.py)
+QUERY_SINKS = os.getenv("HABIT_QUERY_SINKS", "")
+PROMETHEUS_FILE = os.getenv("HABIT_PROMETHEUS_FILE", ".habit_tracker/metrics.prom")
+PROMETHEUS_INTERVAL_SECONDS = float(os.getenv("HABIT_PROMETHEUS_INTERVAL", "15"))
+
+# Mostrar el panel de consultas en la barra lateral de la app
+QUERY_PANEL_ENABLED = os.getenv("HABIT_QUERY_PANEL", "0") == "1"
+
+# Medir los bytes de cada respuesta (payload_report) aunque no haya sinks;
+# cuesta serializar cada respuesta a JSON
+MEASURE_PAYLOAD_BYTES = os.getenv("HABIT_MEASURE_PAYLOAD", "0") == "1"
+
+# Trazar los round-trips de cada rerun por página (ver utils/tracing.py)
+TRACE_QUERIES_ENABLED = os.getenv("HABIT_TRACE_QUERIES", "0") == "1"
+
+# Circuit breaker: fallos seguidos para abrirlo y segundos antes de reintentar
+BREAKER_THRESHOLD = int(os.getenv("HABIT_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("HABIT_BREAKER_RESET", "30"))
+
+# Backend de datos: "supabase" o "memory" (MemoryDB, sin red; ver
+# utils/memory_db.py para la latencia simulada)
+DB_BACKEND = os.getenv("HABIT_DB_BACKEND", "supabase").strip().lower()
+
+# Caché de lecturas por usuario
+CACHE_TTL_SECONDS = float(os.getenv("HABIT_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("HABIT_CACHE_MAX_ENTRIES", "512"))
+
+# Versión de datos por usuario (sql/data_version.sql): cada cuánto se
+# consulta y cuánto viven las lecturas mientras la versión no cambie
+VERSION_CHECK_INTERVAL_SECONDS = float(os.getenv("HABIT_VERSION_CHECK_INTERVAL", "5"))
+VERSIONED_CACHE_TTL_SECONDS = float(os.getenv("HABIT_VERSIONED_CACHE_TTL", "600"))
+
+# Categorías del sistema: iguales para todos los usuarios y casi inmutables
+CATEGORIES_TTL_SECONDS = float(os.getenv("HABIT_CATEGORIES_TTL", "86400"))
+
+# Espejo SQLite local (opcional): ruta del archivo y antigüedad máxima
+MIRROR_PATH = os.getenv("HABIT_MIRROR_PATH")
+MIRROR_MAX_AGE_SECONDS = float(os.getenv("HABIT_MIRROR_MAX_AGE", "30"))
+
+# Filas por petición en las inserciones masivas de sesiones
+BULK_CHUNK_SIZE = int(os.getenv("HABIT_BULK_CHUNK_SIZE", "500"))
+
+# Hábitos por llamada a update_habit_metrics_batch
+METRICS_BATCH_SIZE = int(os.getenv("HABIT_METRICS_BATCH_SIZE", "200"))
+
+# Errores por hilo: el contador permite saber si una lectura falló aunque
+# el método devuelva un DataFrame vacío (y así no guardarla en caché); recent
+# guarda los errores tipados para mostrarlos en la página (pop_errors)
+_errors = threading.local()
+
+# Máximo de errores recientes guardados por hilo
+MAX_RECENT_ERRORS = 20
+
+# Funciones SQL opcionales (carpeta sql/) detectadas como no instaladas
+_rpc_available: Dict[str, bool] = {}
+
+
+def validate_session(
+    duration_minutes: int,
+    mood: int = None,
+    productivity_level: int = None
+) -> Optional[str]:
+    """
+    Validar los campos de una sesión
+
+    Returns:
+        Mensaje de error, o None si la sesión es válida
+    """
+    if duration_minutes <= 0:
+        return "La duración debe ser mayor a 0"
+
+    if mood and (mood < 1 or mood > 5):
+        return "Mood debe estar entre 1 y 5"
+
+    if productivity_level and (productivity_level < 1 or productivity_level > 5):
+        return "Productivity debe estar entre 1 y 5"
+
+    return None
+
+
+SESSION_COLUMNS = [
+    "id", "activity_id", "duration_minutes", "session_date",
+    "start_time", "notes", "mood", "productivity_level"
+]
+
+# Espacio de nombres de los ids deterministas de sesiones importadas
+SESSION_ID_NAMESPACE = uuid.UUID("8c6f1b52-4d1e-4c7a-9a0e-3f5b2d7c9e41")
+
+# Campos que identifican una sesión sin id (ver session_ids)
+SESSION_KEY_COLUMNS = ["activity_id", "session_date", "start_time", "duration_minutes", "notes"]
+
+
+def session_ids(
+    sessions: pd.DataFrame,
+    user_id: str = None,
+    seen: Dict[tuple, int] = None
+) -> List[str]:
+    """
+    Ids deterministas (uuid5) para sesiones que no traen el suyo
+
+    Se derivan de (user_id, activity_id, session_date, start_time,
+    duration_minutes, notes) más el número de aparición de esa combinación
+    en el archivo: importar dos veces el mismo archivo produce los mismos ids
+    y el insert omite las repetidas, pero dos sesiones iguales del mismo
+    archivo (dos de 30 minutos el mismo día, sin hora ni notas) son dos.
+
+    Args:
+        sessions: Sesiones ya normalizadas (session_date como YYYY-MM-DD, o
+            vacía si el archivo no la trae)
+        user_id: Dueño de las sesiones
+        seen: Apariciones de cada combinación en bloques anteriores del mismo
+            archivo; se actualiza (opcional)
+
+    Returns:
+        Lista de ids, en el orden de las filas
+    """
+    keys = sessions[SESSION_KEY_COLUMNS].astype(object).where(sessions[SESSION_KEY_COLUMNS].notna(), "")
+    keys = keys.astype(str)
+    key_tuples = list(keys.itertuples(index=False, name=None))
+
+    occurrence = keys.groupby(SESSION_KEY_COLUMNS, sort=False).cumcount().tolist()
+
+    if seen is not None:
+        occurrence = [count + seen.get(key, 0) for key, count in zip(key_tuples, occurrence)]
+        for key, count in zip(key_tuples, occurrence):
+            seen[key] = count + 1
+
+    return [
+        str(uuid.uuid5(SESSION_ID_NAMESPACE, "|".join([user_id or "", *key, str(count)])))
+        for key, count in zip(key_tuples, occurrence)
+    ]
+
+
+def validate_sessions_frame(
+    sessions: pd.DataFrame,
+    user_id: str = None,
+    seen: Dict[tuple, int] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Validar muchas sesiones a la vez (mismas reglas que validate_session)
+
+    Args:
+        sessions: DataFrame con activity_id y duration_minutes; session_date,
+            start_time, notes, mood, productivity_level e id son opcionales
+        user_id: Dueño de las sesiones (para los ids de las que no traen id)
+        seen: Apariciones por bloque anterior del mismo archivo (ver
+            session_ids; opcional)
+
+    Returns:
+        Tupla (válidas, rechazadas). Las válidas quedan normalizadas con las
+        columnas de SESSION_COLUMNS; las rechazadas conservan sus columnas
+        originales más "error"
+    """
+    sessions = sessions.reset_index(drop=True)
+    rows = pd.DataFrame(index=sessions.index)
+
+    for column in SESSION_COLUMNS:
+        rows[column] = sessions[column] if column in sessions.columns else None
+
+    rows["duration_minutes"] = pd.to_numeric(rows["duration_minutes"], errors="coerce")
+    rows["mood"] = pd.to_numeric(rows["mood"], errors="coerce")
+    rows["productivity_level"] = pd.to_numeric(rows["productivity_level"], errors="coerce")
+
+    parsed_dates = pd.to_datetime(rows["session_date"], errors="coerce", format="mixed")
+    missing_dates = rows["session_date"].isna()
+    parsed_dates = parsed_dates.where(~missing_dates, pd.Timestamp(date.today()))
+
+    # La primera regla que falla define el mensaje de la fila
+    error = pd.Series(None, index=rows.index, dtype=object)
+    checks = [
+        (rows["activity_id"].isna(), "Actividad desconocida"),
+        (~(rows["duration_minutes"] > 0), "La duración debe ser mayor a 0"),
+        (parsed_dates.isna(), "Fecha inválida"),
+        (rows["mood"].notna() & ~rows["mood"].between(1, 5), "Mood debe estar entre 1 y 5"),
+        (
+            rows["productivity_level"].notna() & ~rows["productivity_level"].between(1, 5),
+            "Productivity debe estar entre 1 y 5"
+        )
+    ]
+    for failed, message in reversed(checks):
+        error = error.mask(failed, message)
+
+    invalid = error.notna()
+
+    rejected = sessions[invalid].copy()
+    rejected["error"] = error[invalid]
+
+    valid = rows[~invalid].copy()
+    valid["session_date"] = parsed_dates[~invalid].dt.strftime("%Y-%m-%d")
+    for column in ["duration_minutes", "mood", "productivity_level"]:
+        valid[column] = valid[column].round().astype("Int64")
+
+    # Ids deterministas: reintentar un lote o reimportar el archivo no
+    # duplica sesiones. Las filas sin fecha usan la vacía, no la de hoy, para
+    # que el id no cambie según el día de la importación
+    missing_ids = valid["id"].isna()
+    if missing_ids.any():
+        keys = valid.loc[missing_ids, SESSION_KEY_COLUMNS].copy()
+        keys.loc[missing_dates[~invalid][missing_ids], "session_date"] = None
+        valid.loc[missing_ids, "id"] = session_ids(keys, user_id, seen)
+
+    return valid, rejected
+
+
+def mirrored(user_scoped: bool = True):
+    """
+    Decorador que sirve la lectura desde el espejo local si está activo
+
+    Si no hay espejo, o el usuario aún no se pudo sincronizar nunca, se
+    ejecuta el método original contra Supabase.
+
+    Args:
+        user_scoped: Si el método recibe user_id como primer argumento
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.mirror is None:
+                return method(self, *args, **kwargs)
+
+            if user_scoped:
+                owner = args[0] if args else kwargs.get("user_id")
+            else:
+                owner = self._user_id
+
+            if owner is None:
+                return method(self, *args, **kwargs)
+
+            # Un cambio desde otro dispositivo marca el espejo para re-sincronizar
+            self._check_data_version(owner)
+
+            if not self.mirror.is_ready(self, owner):
+                return method(self, *args, **kwargs)
+
+            handler = getattr(self.mirror, method.__name__)
+            if user_scoped:
+                return handler(*args, **kwargs)
+            return handler(*args, user_id=owner, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# =============================================================================
+# PROYECCIONES DE COLUMNAS
+# =============================================================================
+# Columnas que pide cada lectura en lugar de select("*"). "default" es lo que
+# usa el método si no se indica otra cosa; las páginas pueden pedir otra
+# proyección por nombre (columns="list") o una lista de columnas propia.
+
+PROJECTIONS: Dict[str, Dict[str, str]] = {
+    "categories": {
+        "default": "id, name, color"
+    },
+    "user_categories": {
+        "default": "id, name, color"
+    },
+    "habits": {
+        "default": (
+            "id, name, description, category_id, target_minutes_per_week, "
+            "max_minutes_per_week, total_hours_goal, is_active, created_at"
+        ),
+        "list": "id, name, is_active",
+        # Lo que necesita el motor de métricas local (utils/metrics.py)
+        "goals": "id, total_hours_goal"
+    },
+    "habit_progress": {
+        "default": (
+            "name, total_minutes_invested, total_hours_goal, completion_percentage, "
+            "target_minutes_per_week, max_minutes_per_week, is_active"
+        )
+    },
+    "activities": {
+        "default": "id, name, description, category_id, created_at",
+        "list": "id, name"
+    },
+    "activity_habit_matrix": {
+        "default": (
+            "id, activity_name, number_of_habits, total_sessions, "
+            "total_minutes, benefited_habits"
+        )
+    },
+    "sessions": {
+        "default": (
+            "id, activity_id, session_date, start_time, duration_minutes, mood, "
+            "productivity_level, notes, activities!inner(user_id, name)"
+        ),
+        # Sin notas (texto libre): para conteos y estadísticas
+        "summary": (
+            "id, session_date, duration_minutes, mood, "
+            "activities!inner(user_id)"
+        ),
+        "metrics": (
+            "id, activity_id, session_date, duration_minutes, "
+            "activities!inner(user_id)"
+        )
+    },
+    "weekly_summary": {
+        "default": "name, minutes_this_week, target_minutes_per_week"
+    },
+    "habit_metrics": {
+        "default": (
+            "habit_id, total_minutes_invested, total_sessions, current_streak, "
+            "longest_streak, completion_percentage"
+        )
+    }
+}
+
+
+def _projection(table: str, columns: str = None) -> str:
+    """
+    Resolver las columnas a pedir para una tabla/vista
+
+    Args:
+        table: Nombre de la tabla o vista
+        columns: Nombre de proyección en PROJECTIONS, columnas explícitas o
+            None para la proyección "default"
+
+    Returns:
+        String para select()
+    """
+    table_projections = PROJECTIONS.get(table, {})
+    columns = columns or "default"
+    return table_projections.get(columns, columns if columns != "default" else "*")
+
+
+def _log_error(message: str, error: Exception) -> None:
+    """Registrar un error de la capa de datos"""
+    _errors.count = getattr(_errors, "count", 0) + 1
+
+    recent = _recent_errors()
+    recent.append(as_data_error(message, error))
+    del recent[:-MAX_RECENT_ERRORS]
+
+    print(f"{message}: {error}")
+
+
+def _recent_errors() -> List[DataLayerError]:
+    """Errores tipados del hilo actual aún no mostrados"""
+    recent = getattr(_errors, "recent", None)
+    if recent is None:
+        recent = _errors.recent = []
+    return recent
+
+
+def _pop_recent_errors() -> List[DataLayerError]:
+    """Sacar los errores tipados del hilo actual"""
+    recent = _recent_errors()
+    popped = list(recent)
+    recent.clear()
+    return popped
+
+
+def _call_collecting_errors(func, *args, **kwargs) -> Tuple[Any, List[DataLayerError]]:
+    """Ejecutar func en un hilo del pool y devolver también sus errores"""
+    _pop_recent_errors()
+    value = func(*args, **kwargs)
+    return value, _pop_recent_errors()
+
+
+def _copy_result(value: Any) -> Any:
+    """Copiar un resultado para que las páginas no muten la caché"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def cached_read(user_scoped: bool = True):
+    """
+    Decorador read-through para lecturas de SupabaseDB
+
+    La clave es (método, usuario del contexto, argumentos). Si user_scoped es
+    True el primer argumento del método es el user_id dueño de los datos; si
+    no, se usa el usuario del contexto (for_user) y sin contexto no se cachea.
+    Antes de buscar se comprueba la versión de datos del usuario
+    (SupabaseDB._check_data_version). Si la lectura falla y hay un valor
+    vencido en la caché, se devuelve ese (último dato bueno) y el error queda
+    marcado como served_stale.
+
+    Args:
+        user_scoped: Si el método recibe user_id como primer argumento
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if user_scoped:
+                owner = args[0] if args else kwargs.get("user_id")
+            else:
+                owner = self._user_id
+
+            if owner is None or self.cache is None:
+                return method(self, *args, **kwargs)
+
+            # Si la versión de datos del usuario no cambió, lo cacheado sigue
+            # siendo válido más allá del TTL normal
+            ttl = VERSIONED_CACHE_TTL_SECONDS if self._check_data_version(owner) else None
+
+            key = (method.__name__, self._user_id, args, tuple(sorted(kwargs.items())))
+            hit, value = self.cache.get(key, ttl)
+
+            if hit:
+                return _copy_result(value)
+
+            errors_before = getattr(_errors, "count", 0)
+            value = method(self, *args, **kwargs)
+            failed = getattr(_errors, "count", 0) - errors_before
+
+            if not failed:
+                self.cache.set(key, value, owner)
+                return _copy_result(value)
+
+            stale_hit, stale = self.cache.get_stale(key)
+            if stale_hit:
+                for error in _recent_errors()[-failed:]:
+                    error.served_stale = True
+                value = stale
+
+            return _copy_result(value)
+
+        return wrapper
+
+    return decorator
+
+
+# =============================================================================
+# REGISTRO DE CLIENTES (UNO POR PROCESO)
+# =============================================================================
+
+_registry_lock = threading.RLock()
+_clients: Dict[tuple, Client] = {}
+_http_clients: Dict[tuple, httpx.Client] = {}
+_shared_db: Optional["HabitRepository"] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Catálogos globales (categorías del sistema), compartidos por todos los
+# usuarios del proceso; no se vacían con las escrituras de un usuario
+_catalog_cache = ReadCache(ttl_seconds=CATEGORIES_TTL_SECONDS, max_entries=16)
+
+
+def get_credentials() -> tuple:
+    """Leer SUPABASE_URL y SUPABASE_KEY del entorno"""
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+
+    if not url or not key:
+        raise ValueError(
+            "Faltan credenciales de Supabase. "
+            "Asegúrate de tener un archivo .env con SUPABASE_URL y SUPABASE_KEY"
+        )
+
+    return url, key
+
+
+def get_http_client(pool_size: int = None) -> httpx.Client:
+    """
+    Obtener el transporte HTTP keep-alive compartido del proceso
+
+    Args:
+        pool_size: Conexiones máximas del pool (default: SUPABASE_POOL_SIZE)
+
+    Returns:
+        Cliente httpx reutilizado por todas las páginas
+    """
+    pool_size = pool_size or DEFAULT_POOL_SIZE
+
+    with _registry_lock:
+        http_client = _http_clients.get((pool_size,))
+
+        if http_client is None or http_client.is_closed:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=60.0
+                ),
+                # Tiempo máximo de cada petición (HABIT_REQUEST_TIMEOUT): lo
+                # aplica httpx en el hilo que llama; esperar una conexión
+                # libre del pool tiene su propio límite (PoolTimeout)
+                timeout=httpx.Timeout(
+                    REQUEST_TIMEOUT_SECONDS,
+                    connect=min(10.0, REQUEST_TIMEOUT_SECONDS)
+                )
+            )
+            _http_clients[(pool_size,)] = http_client
+
+        return http_client
+
+
+def get_supabase_client(pool_size: int = None) -> Client:
+    """
+    Obtener el cliente Supabase compartido del proceso
+
+    Se crea una sola vez por combinación (url, key, pool_size), de modo que
+    los reruns de Streamlit no repiten create_client ni el handshake TLS.
+
+    Args:
+        pool_size: Conexiones máximas del pool (default: SUPABASE_POOL_SIZE)
+
+    Returns:
+        Cliente de Supabase reutilizable
+    """
+    url, key = get_credentials()
+    pool_size = pool_size or DEFAULT_POOL_SIZE
+    registry_key = (url, key, pool_size)
+
+    client = _clients.get(registry_key)
+    if client is not None:
+        return client
+
+    http_client = get_http_client(pool_size)
+
+    with _registry_lock:
+        client = _clients.get(registry_key)
+
+        if client is None:
+            try:
+                options = ClientOptions(httpx_client=http_client)
+            except TypeError:
+                # Versiones de supabase sin inyección de httpx: el cliente
+                # igual mantiene su propia sesión keep-alive al reutilizarse
+                options = None
+
+            if options is not None:
+                client = create_client(url, key, options=options)
+            else:
+                client = create_client(url, key)
+
+            _clients[registry_key] = client
+
+        return client
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Obtener el pool de hilos compartido para lecturas concurrentes"""
+    global _executor
+
+    if _executor is None:
+        with _registry_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=FETCH_WORKERS,
+                    thread_name_prefix="supabase-fetch"
+                )
+
+    return _executor
+
+
+def get_db() -> "HabitRepository":
+    """
+    Obtener la instancia de la base de datos compartida por todas las páginas
+
+    Con HABIT_DB_BACKEND=memory es un MemoryDB (sin red, para pruebas y
+    benchmarks); si no, SupabaseDB construido sobre el cliente del registro.
+
+    Returns:
+        Backend compartido
+    """
+    global _shared_db
+
+    if _shared_db is None:
+        with _registry_lock:
+            if _shared_db is None:
+                if DB_BACKEND == "memory":
+                    from utils.memory_db import MemoryDB
+                    _shared_db = MemoryDB()
+                else:
+                    _shared_db = SupabaseDB()
+
+    return _shared_db
+
+
+def get_user_db(session_state) -> "HabitRepository":
+    """
+    Obtener la vista de la base de datos para el usuario de la sesión de Streamlit
+
+    Renueva el JWT si está por expirar y actualiza session_state. Descarta
+    los errores pendientes del hilo (de un rerun anterior) y, con
+    HABIT_TRACE_QUERIES=1, abre la traza de round-trips del rerun.
+
+    Args:
+        session_state: st.session_state (o cualquier mapping equivalente)
+
+    Returns:
+        Backend ligado al JWT del usuario
+    """
+    db = get_db()
+    _pop_recent_errors()
+
+    if TRACE_QUERIES_ENABLED:
+        begin_rerun(page_name(sys._getframe(1).f_code.co_filename))
+
+    expires_at = session_state.get("expires_at")
+    refresh_token = session_state.get("refresh_token")
+
+    if refresh_token and expires_at and expires_at - time.time() < 60:
+        result = db.refresh_session(refresh_token)
+        if result.get("success"):
+            store_session(session_state, result["session"])
+
+    return db.for_user(
+        session_state.get("access_token"),
+        session_state.get("user_id")
+    )
+
+
+def store_session(session_state, session) -> None:
+    """
+    Guardar los tokens de una sesión de Supabase Auth en session_state
+
+    Args:
+        session_state: st.session_state (o cualquier mapping equivalente)
+        session: Objeto Session devuelto por sign_in/refresh_session
+    """
+    if session is None:
+        return
+
+    session_state["access_token"] = session.access_token
+    session_state["refresh_token"] = session.refresh_token
+    session_state["expires_at"] = session.expires_at
+
+
+def sign_in_user_db(email: str, password: str) -> Dict[str, Any]:
+    """
+    Iniciar sesión fuera de Streamlit (scripts de importación/exportación)
+
+    Args:
+        email: Email del usuario
+        password: Contraseña
+
+    Returns:
+        Diccionario con success, db (backend ligado al usuario) y
+        user_id, o success y message si falla
+    """
+    auth = get_db().sign_in(email, password)
+
+    if not auth["success"]:
+        return auth
+
+    session_state = {"user_id": auth["user"].id}
+    store_session(session_state, auth["session"])
+
+    return {
+        "success": True,
+        "db": get_user_db(session_state),
+        "user_id": session_state["user_id"]
+    }
+
+
+class HabitRepository(ABC):
+    """
+    Interfaz de la capa de datos que usan las páginas y los scripts
+
+    Los backends (SupabaseDB, MemoryDB en utils/memory_db.py) implementan las
+    operaciones primitivas; aquí vive la lógica que no depende del backend
+    (lecturas en paralelo, cargas masivas, reportes, errores). Ambos deben
+    definir metrics (QueryMetrics), cache (ReadCache o None), mirror,
+    _access_token y _user_id.
+    """
+
+    def for_user(self, access_token: str, user_id: str = None) -> "HabitRepository":
+        """
+        Obtener una vista de la base de datos ligada a un usuario
+
+        La vista comparte el backend (transporte HTTP, caché, métricas), pero
+        cada consulta viaja con el JWT del usuario, de modo que RLS se evalúa
+        por sesión y no hay estado de autenticación compartido entre usuarios.
+
+        Args:
+            access_token: JWT de la sesión del usuario
+            user_id: ID del usuario (opcional)
+
+        Returns:
+            Nueva instancia del mismo backend que usa ese contexto
+        """
+        user_db = copy.copy(self)
+        user_db._access_token = access_token
+        user_db._user_id = user_id
+        return user_db
+
+    def _check_data_version(self, user_id: str) -> bool:
+        """
+        Confirmar que los datos cacheados del usuario siguen vigentes
+
+        Returns:
+            True si la caché puede usar el TTL largo (default: no se sabe)
+        """
+        return False
+
+    @abstractmethod
+    def _invalidate(self, user_id: str = None) -> None:
+        """Invalidar la caché del usuario afectado por una escritura"""
+
+    def query_report(self) -> pd.DataFrame:
+        """
+        Reporte de latencia y volumen por método
+
+        Returns:
+            DataFrame con method, calls, errors, rows, bytes, bytes_per_call,
+            p50_ms, p95_ms, p99_ms, max_ms y total_s, ordenado por tiempo total
+        """
+        return self.metrics.report()
+
+    def payload_report(self) -> pd.DataFrame:
+        """
+        Reporte de tamaño de respuesta por método
+
+        Los bytes solo se miden con HABIT_MEASURE_PAYLOAD=1 o con sinks
+        configurados (HABIT_QUERY_SINKS); si no, son 0.
+
+        Returns:
+            DataFrame con method, calls, rows, bytes y bytes_per_call,
+            ordenado de mayor a menor volumen
+        """
+        report = self.metrics.report()[["method", "calls", "rows", "bytes", "bytes_per_call"]]
+        return report.sort_values("bytes", ascending=False).reset_index(drop=True)
+
+    def pop_errors(self) -> List[DataLayerError]:
+        """
+        Sacar los errores de la capa de datos del hilo actual
+
+        Las lecturas devuelven DataFrames vacíos (o el último dato bueno) en
+        lugar de lanzar excepciones; las páginas usan esto para avisar.
+
+        Returns:
+            Lista de DataLayerError (DataTimeoutError, DataUnavailableError
+            o DataQueryError), del más antiguo al más reciente
+        """
+        return _pop_recent_errors()
+
+    def cache_stats(self, method: str = None) -> Dict[str, Any]:
+        """Contadores de aciertos/fallos de la caché de lecturas"""
+        return self.cache.stats(method) if self.cache is not None else {}
+
+    def fetch_many(self, **calls) -> Dict[str, Any]:
+        """
+        Ejecutar varias lecturas independientes en paralelo
+
+        Ejemplo:
+            data = db.fetch_many(
+                progress=("get_habit_progress", user_id),
+                habits=("get_user_habits", user_id, {"columns": "list"})
+            )
+
+        Args:
+            **calls: nombre_resultado=(nombre_método, *args[, kwargs])
+
+        Returns:
+            Diccionario {nombre_resultado: resultado}, en el mismo orden.
+            Los errores de los hilos pasan al hilo que llama (pop_errors)
+        """
+        executor = get_executor()
+        futures = {}
+
+        # Los hilos del pool heredan la traza del rerun y la línea de la página
+        site = caller_site() if current_trace() is not None else None
+
+        for name, (method, *args) in calls.items():
+            kwargs = args.pop() if args and isinstance(args[-1], dict) else {}
+            futures[name] = executor.submit(
+                contextvars.copy_context().run,
+                run_at_site,
+                site,
+                _call_collecting_errors,
+                getattr(self, method),
+                *args,
+                **kwargs
+            )
+
+        results = {}
+        for name, future in futures.items():
+            results[name], errors = future.result()
+            if errors:
+                _errors.count = getattr(_errors, "count", 0) + len(errors)
+                _recent_errors().extend(errors)
+
+        return results
+
+    # =========================================================================
+    # AUTENTICACIÓN
+    # =========================================================================
+
+    @abstractmethod
+    def sign_up(self, email: str, password: str, full_name: str = None) -> Dict[str, Any]:
+        """Registrar nuevo usuario"""
+
+    @abstractmethod
+    def sign_in(self, email: str, password: str) -> Dict[str, Any]:
+        """Iniciar sesión (user y session con access_token, refresh_token, expires_at)"""
+
+    @abstractmethod
+    def refresh_session(self, refresh_token: str) -> Dict[str, Any]:
+        """Renovar el JWT de un usuario"""
+
+    @abstractmethod
+    def sign_out(self, access_token: str = None) -> Dict[str, Any]:
+        """Cerrar sesión"""
+
+    @abstractmethod
+    def get_current_user(self) -> Optional[Any]:
+        """Obtener usuario del contexto actual"""
+
+    # =========================================================================
+    # CATEGORÍAS
+    # =========================================================================
+
+    @abstractmethod
+    def _system_categories(self) -> List[Dict[str, Any]]:
+        """Categorías predefinidas (lanza la excepción si falla la lectura)"""
+
+    @abstractmethod
+    def get_categories(self) -> pd.DataFrame:
+        """Obtener todas las categorías predefinidas"""
+
+    @abstractmethod
+    def create_user_category(self, user_id: str, name: str, color: str = "#3B82F6") -> Optional[Dict[str, Any]]:
+        """Crear categoría personalizada del usuario"""
+
+    @abstractmethod
+    def get_user_categories(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Obtener las categorías personalizadas del usuario (None si hubo un error)"""
+
+    def get_all_categories_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Obtener categorías predefinidas + personalizadas del usuario
+
+        Las predefinidas se leen una vez por proceso y las del usuario salen
+        de la caché por usuario (se invalida al crear una), así que en
+        régimen estable no hace ninguna consulta.
+
+        Returns:
+            Lista con categorías tipo 'system' y 'personal'
+        """
+        try:
+            system_categories = self._system_categories()
+        except Exception as e:
+            _log_error("Error obteniendo categorías", e)
+            system_categories = []
+
+        result = [
+            {
+                "id": cat["id"],
+                "name": cat["name"],
+                "type": "system",
+                "color": cat.get("color", "#3B82F6")
+            }
+            for cat in system_categories
+        ]
+
+        result.extend(
+            {
+                "id": cat["id"],
+                "name": cat["name"],
+                "type": "personal",
+                "color": cat.get("color", "#3B82F6")
+            }
+            for cat in self.get_user_categories(user_id) or []
+        )
+
+        return result
+
+    # =========================================================================
+    # HÁBITOS/METAS
+    # =========================================================================
+
+    @abstractmethod
+    def create_habit(
+        self,
+        user_id: str,
+        name: str,
+        target_minutes_per_week: int = 420,
+        max_minutes_per_week: int = 900,
+        total_hours_goal: int = 100,
+        description: str = None,
+        category_id: int = None
+    ) -> Optional[Dict[str, Any]]:
+        """Crear nuevo hábito/meta (con su fila de habit_metrics en cero)"""
+
+    @abstractmethod
+    def get_user_habits(self, user_id: str, active_only: bool = True, columns: str = None) -> pd.DataFrame:
+        """Obtener hábitos del usuario"""
+
+    @abstractmethod
+    def update_habit(self, habit_id: str, updates: Dict[str, Any]) -> bool:
+        """Actualizar un hábito"""
+
+    def delete_habit(self, habit_id: str) -> bool:
+        """
+        Eliminar un hábito (soft delete - marca como inactivo)
+
+        Args:
+            habit_id: ID del hábito
+
+        Returns:
+            True si se eliminó correctamente
+        """
+        try:
+            return self.update_habit(habit_id, {"is_active": False})
+        except Exception as e:
+            _log_error("Error eliminando hábito", e)
+            return False
+
+    @abstractmethod
+    def get_habit_progress(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Vista habit_progress del usuario"""
+
+    # =========================================================================
+    # ACTIVIDADES
+    # =========================================================================
+
+    @abstractmethod
+    def create_activity(
+        self,
+        user_id: str,
+        name: str,
+        category_id: int = None,
+        description: str = None
+    ) -> Optional[Dict[str, Any]]:
+        """Crear nueva actividad"""
+
+    @abstractmethod
+    def get_user_activities(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Obtener actividades del usuario"""
+
+    @abstractmethod
+    def update_activity(self, activity_id: str, updates: Dict[str, Any]) -> bool:
+        """Actualizar actividad"""
+
+    @abstractmethod
+    def delete_activity(self, activity_id: str) -> bool:
+        """Eliminar actividad (con sus vínculos y sesiones)"""
+
+    # =========================================================================
+    # VINCULACIÓN HÁBITOS-ACTIVIDADES
+    # =========================================================================
+
+    @abstractmethod
+    def link_activity_to_habit(self, habit_id: str, activity_id: str, weight: float = 1.0) -> bool:
+        """Vincular actividad a hábito con peso (0.0 a 1.0)"""
+
+    @abstractmethod
+    def set_activity_links(self, activity_id: str, links: Dict[str, float]) -> bool:
+        """Reemplazar todos los vínculos de una actividad"""
+
+    @abstractmethod
+    def unlink_activity_from_habit(self, habit_id: str, activity_id: str) -> bool:
+        """Desvincular actividad de hábito"""
+
+    @abstractmethod
+    def get_activity_links(self, activity_id: str) -> pd.DataFrame:
+        """Hábitos vinculados a una actividad (habit_id, habit_name, weight)"""
+
+    @abstractmethod
+    def get_user_activity_links(self, user_id: str) -> pd.DataFrame:
+        """Todos los vínculos del usuario (activity_id, habit_id, habit_name, weight)"""
+
+    @abstractmethod
+    def get_habit_activities_matrix(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Vista activity_habit_matrix del usuario"""
+
+    # =========================================================================
+    # SESIONES
+    # =========================================================================
+
+    @abstractmethod
+    def register_session(
+        self,
+        activity_id: str,
+        duration_minutes: int,
+        session_date: date = None,
+        start_time: str = None,
+        notes: str = None,
+        mood: int = None,
+        productivity_level: int = None
+    ) -> Optional[Dict[str, Any]]:
+        """Registrar sesión (las métricas de los hábitos vinculados se actualizan solas)"""
+
+    @abstractmethod
+    def insert_sessions_batch(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insertar sesiones validadas con id propio; ignora ids existentes y propaga errores"""
+
+    def register_sessions_bulk(
+        self,
+        user_id: str,
+        sessions: pd.DataFrame,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        recompute_metrics: bool = True,
+        seen: Dict[tuple, int] = None
+    ) -> Dict[str, Any]:
+        """
+        Registrar muchas sesiones: validación vectorizada e inserción por lotes
+
+        Args:
+            user_id: ID del usuario (dueño de las actividades)
+            sessions: DataFrame con las columnas de register_session
+                (activity_id ya resuelto)
+            chunk_size: Filas por petición
+            recompute_metrics: Recalcular al final las métricas de los hábitos
+                afectados (una vez por hábito). Pasar False si quien llama
+                inserta en varias tandas y recalcula al terminar
+            seen: Si las sesiones son un bloque de un archivo más grande, el
+                mismo diccionario en cada bloque (ver session_ids)
+
+        Returns:
+            Diccionario con inserted, duplicates, rejected (DataFrame),
+            failed (filas de lotes que fallaron), activity_ids afectadas y
+            habits_recomputed
+        """
+        valid, rejected = validate_sessions_frame(sessions, user_id, seen)
+
+        result = {
+            "inserted": 0,
+            "duplicates": 0,
+            "rejected": rejected,
+            "failed": 0,
+            "activity_ids": set(),
+            "habits_recomputed": 0
+        }
+
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid.iloc[start:start + chunk_size]
+            # to_json convierte NaN/NA en null y los enteros de numpy en int
+            records = json.loads(chunk.to_json(orient="records"))
+
+            try:
+                inserted = self.insert_sessions_batch(records)
+            except Exception as e:
+                _log_error("Error insertando lote de sesiones", e)
+                result["failed"] += len(records)
+                continue
+
+            result["inserted"] += len(inserted)
+            result["duplicates"] += len(records) - len(inserted)
+            result["activity_ids"].update(row["activity_id"] for row in inserted)
+
+        if recompute_metrics:
+            result["habits_recomputed"] = self.refresh_metrics_for_activities(
+                user_id, result["activity_ids"]
+            )
+
+        return result
+
+    @abstractmethod
+    def get_user_sessions(
+        self,
+        user_id: str,
+        limit: int = 100,
+        start_date: date = None,
+        end_date: date = None,
+        columns: str = None
+    ) -> pd.DataFrame:
+        """Sesiones del usuario, de la más reciente a la más antigua"""
+
+    @abstractmethod
+    def iter_user_sessions(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None,
+        page_size: int = 1000,
+        as_records: bool = False,
+        columns: str = None
+    ) -> Iterator[Any]:
+        """Recorrer todas las sesiones del usuario por páginas (lanza si una página falla)"""
+
+    @mirrored()
+    @cached_read()
+    def get_user_session_stats(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Calcular estadísticas de TODAS las sesiones de un período
+
+        Recorre las sesiones con iter_user_sessions, por lo que no se trunca
+        en 100 filas como get_user_sessions.
+
+        Args:
+            user_id: ID del usuario
+            start_date: Fecha de inicio (opcional)
+            end_date: Fecha de fin (opcional)
+
+        Returns:
+            Diccionario con total_sessions, total_minutes, avg_minutes y
+            avg_mood (None si no hay mood), o None si hubo un error
+        """
+        try:
+            total_sessions = 0
+            total_minutes = 0
+            mood_sum = 0
+            mood_count = 0
+
+            for rows in self.iter_user_sessions(
+                user_id, start_date, end_date, as_records=True, columns="summary"
+            ):
+                total_sessions += len(rows)
+                for row in rows:
+                    total_minutes += row.get("duration_minutes") or 0
+                    if row.get("mood") is not None:
+                        mood_sum += row["mood"]
+                        mood_count += 1
+
+            return {
+                "total_sessions": total_sessions,
+                "total_minutes": total_minutes,
+                "avg_minutes": total_minutes / total_sessions if total_sessions else 0,
+                "avg_mood": mood_sum / mood_count if mood_count else None
+            }
+        except Exception as e:
+            _log_error("Error calculando estadísticas de sesiones", e)
+            return None
+
+    @abstractmethod
+    def get_activity_contribution(self, user_id: str) -> pd.DataFrame:
+        """Vista activity_habit_contribution del usuario"""
+
+    # =========================================================================
+    # MÉTRICAS Y ESTADÍSTICAS
+    # =========================================================================
+
+    @abstractmethod
+    def get_weekly_summary(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """Vista weekly_summary del usuario"""
+
+    @abstractmethod
+    def get_habit_metrics(self, habit_id: str) -> Optional[Dict[str, Any]]:
+        """Métricas de un hábito"""
+
+    @abstractmethod
+    def get_user_habit_metrics(self, user_id: str) -> pd.DataFrame:
+        """Métricas guardadas de todos los hábitos del usuario"""
+
+    @abstractmethod
+    def upsert_habit_metrics(self, metrics: List[Dict[str, Any]]) -> bool:
+        """Guardar métricas calculadas fuera del backend"""
+
+    @abstractmethod
+    def update_habit_metrics(self, habit_id: str) -> bool:
+        """Recalcular las métricas de un hábito"""
+
+    @abstractmethod
+    def update_habit_metrics_batch(self, habit_ids: List[str], chunk_size: int = METRICS_BATCH_SIZE) -> int:
+        """Recalcular las métricas de muchos hábitos; devuelve cuántos"""
+
+    def refresh_metrics_for_activities(self, user_id: str, activity_ids) -> int:
+        """
+        Recalcular una vez las métricas de cada hábito vinculado a las
+        actividades indicadas (después de una carga masiva)
+
+        Args:
+            user_id: ID del usuario
+            activity_ids: IDs de actividades con sesiones nuevas
+
+        Returns:
+            Número de hábitos recalculados
+        """
+        activity_ids = set(activity_ids)
+        if not activity_ids:
+            return 0
+
+        links = self.get_user_activity_links(user_id)
+        if links.empty:
+            return 0
 
-class SupabaseDB:
+        habit_ids = links.loc[links["activity_id"].isin(activity_ids), "habit_id"].unique()
+
+        return self.update_habit_metrics_batch(list(habit_ids))
+
+
+class SupabaseDB(HabitRepository):
     """
     Clase para manejar todas las operaciones con Supabase
     """
 
-    def __init__(self):
-        """Inicializar conexión con Supabase"""
-        self.url = os.getenv("SUPABASE_URL")
-        self.key = os.getenv("SUPABASE_KEY")
+    def __init__(self, client: Client = None, pool_size: int = None):
+        """
+        Inicializar conexión con Supabase
+
+        Args:
+            client: Cliente ya creado (opcional, por defecto el del registro)
+            pool_size: Tamaño del pool HTTP si se usa el registro
+        """
+        self.url, self.key = get_credentials()
+        self.supabase: Client = client or get_supabase_client(pool_size)
+
+        # Contexto de usuario (ver for_user); vacío = clave anónima
+        self._access_token: Optional[str] = None
+        self._user_id: Optional[str] = None
+
+        # Tiempo, filas, bytes y errores por método (ver query_report)
+        self.metrics = QueryMetrics(
+            build_sinks(QUERY_SINKS, PROMETHEUS_FILE, PROMETHEUS_INTERVAL_SECONDS),
+            measure_bytes=MEASURE_PAYLOAD_BYTES
+        )
+
+        # Circuit breaker compartido por todas las vistas for_user
+        self.breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_SECONDS)
+
+        # Caché de lecturas compartida por todas las vistas for_user
+        self.cache: Optional[ReadCache] = ReadCache(CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES)
+
+        # Última versión de datos vista por usuario: {user_id: (versión, cuándo)}
+        self._version_lock = threading.Lock()
+        self._data_versions: Dict[str, tuple] = {}
+
+        # Espejo SQLite local (solo si HABIT_MIRROR_PATH está configurado)
+        self.mirror: Optional[LocalMirror] = (
+            LocalMirror(MIRROR_PATH, MIRROR_MAX_AGE_SECONDS) if MIRROR_PATH else None
+        )
+
+    def _execute(
+        self,
+        query,
+        op: str = None,
+        idempotent: bool = None
+    ):
+        """
+        Ejecutar una consulta con el JWT del contexto actual (si existe)
+
+        El tiempo total (con reintentos), las filas, los bytes y los errores
+        quedan registrados en self.metrics bajo op.
+
+        Cada intento tiene el tiempo máximo del cliente httpx compartido
+        (HABIT_REQUEST_TIMEOUT). Las consultas idempotentes se reintentan ante
+        timeouts y errores de red con backoff exponencial con jitter. Si
+        Supabase acumula fallos, el circuit breaker rechaza las llamadas al
+        instante hasta que pase HABIT_BREAKER_RESET.
+
+        Args:
+            query: Request builder de postgrest listo para execute()
+            op: Nombre de la operación para las estadísticas (default: el
+                método de SupabaseDB que llama)
+            idempotent: Si se puede reintentar (default: solo lecturas GET/HEAD)
+
+        Raises:
+            DataTimeoutError: Sin respuesta a tiempo en ningún intento
+            DataUnavailableError: Circuito abierto o error de red persistente
+        """
+        op = op or sys._getframe(1).f_code.co_name
+        request = request_config(query)
+
+        if idempotent is None:
+            idempotent = getattr(request, "http_method", "POST") in ("GET", "HEAD")
+        attempts = 1 + (READ_RETRIES if idempotent else 0)
+
+        if self._access_token:
+            # Solo en esta petición: el cliente y su transporte son compartidos
+            request.headers["Authorization"] = f"Bearer {self._access_token}"
+
+        started = time.perf_counter()
+        try:
+            response = self._execute_attempts(query, op, attempts)
+        except Exception as e:
+            self._record_call(query, op, time.perf_counter() - started, 0, 0, e)
+            raise
+
+        rows, size = payload_size(response.data, self.metrics.measures_bytes)
+        self._record_call(query, op, time.perf_counter() - started, rows, size)
+        return response
+
+    def _record_call(
+        self,
+        query,
+        op: str,
+        seconds: float,
+        rows: int,
+        size: int,
+        error: Exception = None
+    ) -> None:
+        """Registrar una llamada en las métricas y en la traza del rerun"""
+        self.metrics.record(op, seconds, rows, size, error)
+
+        trace = current_trace()
+        if trace is not None:
+            trace.record(op, query_signature(query), seconds, rows, error, caller_site())
+
+    def _execute_attempts(self, query, op: str, attempts: int):
+        """Intentos de _execute con circuit breaker y backoff"""
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise DataUnavailableError(f"Circuito abierto ({op})")
+
+            try:
+                response = query.execute()
+            except httpx.TransportError as e:
+                # PoolTimeout: el pool local está lleno, Supabase no falló
+                if isinstance(e, httpx.PoolTimeout):
+                    self.breaker.release()
+                else:
+                    self.breaker.record_failure()
+
+                if attempt + 1 < attempts:
+                    time.sleep(backoff_delay(attempt, RETRY_BASE_SECONDS, RETRY_MAX_DELAY_SECONDS))
+                    continue
+
+                if isinstance(e, httpx.TimeoutException):
+                    raise DataTimeoutError(op, e) from e
+                raise DataUnavailableError(op, e) from e
+            except Exception:
+                # Supabase respondió (con un error de la consulta): está disponible
+                self.breaker.record_success()
+                raise
+
+            self.breaker.record_success()
+            return response
+
+    def _invalidate(self, user_id: str = None) -> None:
+        """
+        Invalidar la caché del usuario afectado por una escritura
+
+        Args:
+            user_id: Usuario afectado (default: el del contexto; si no se
+                conoce, se vacía toda la caché)
+        """
+        user_id = user_id or self._user_id
+
+        if self.mirror is not None:
+            self.mirror.mark_stale(user_id)
+
+        # La escritura sube la versión en Supabase: la próxima consulta toma
+        # la nueva como referencia sin volver a invalidar
+        with self._version_lock:
+            if user_id:
+                self._data_versions.pop(user_id, None)
+            else:
+                self._data_versions.clear()
+
+        if self.cache is None:
+            return
+
+        if user_id:
+            self.cache.invalidate_user(user_id)
+        else:
+            self.cache.clear()
+
+    def _check_data_version(self, user_id: str) -> bool:
+        """
+        Comparar la versión de datos del usuario con la última vista
+
+        Consulta get_data_version() como mucho cada
+        HABIT_VERSION_CHECK_INTERVAL segundos; si la versión cambió (p. ej.
+        por otro dispositivo) invalida la caché y el espejo del usuario.
+
+        Args:
+            user_id: Dueño de la lectura (solo se comprueba el del contexto)
+
+        Returns:
+            True si la versión está confirmada (la caché puede usar el TTL
+            largo), False si no se puede saber
+        """
+        if (
+            user_id != self._user_id
+            or not self._access_token
+            or not _rpc_available.get("get_data_version", True)
+        ):
+            return False
+
+        now = time.monotonic()
 
-        if not self.url or not self.key:
-            raise ValueError(
-                "Faltan credenciales de Supabase. "
-                "Asegúrate de tener un archivo .env con SUPABASE_URL y SUPABASE_KEY"
+        with self._version_lock:
+            known = self._data_versions.get(user_id)
+            if known is not None and now - known[1] < VERSION_CHECK_INTERVAL_SECONDS:
+                return True
+
+        try:
+            response = self._execute(
+                self.supabase.rpc("get_data_version", {}),
+                idempotent=True
             )
+        except Exception as e:
+            # PGRST202: la función no existe en el esquema (solo TTL)
+            if getattr(e, "code", None) == "PGRST202":
+                _rpc_available["get_data_version"] = False
+            else:
+                _log_error("Error consultando versión de datos", e)
+            return False
+
+        version = response.data
+
+        with self._version_lock:
+            previous = self._data_versions.get(user_id)
+            self._data_versions[user_id] = (version, now)
+
+        if previous is not None and previous[0] != version:
+            if self.mirror is not None:
+                self.mirror.mark_stale(user_id)
+            if self.cache is not None:
+                self.cache.invalidate_user(user_id)
 
-        self.supabase: Client = create_client(self.url, self.key)
+        return True
+
+    def _new_auth_client(self) -> SyncGoTrueClient:
+        """
+        Crear un cliente de Auth aislado para una sola operación
+
+        No persiste la sesión ni la propaga al cliente compartido, evitando
+        que el login de un usuario cambie el contexto de los demás.
+        """
+        return SyncGoTrueClient(
+            url=f"{self.url}/auth/v1",
+            headers={
+                "apiKey": self.key,
+                "Authorization": f"Bearer {self.key}"
+            },
+            auto_refresh_token=False,
+            persist_session=False,
+            http_client=get_http_client()
+        )
 
     # =========================================================================
     # AUTENTICACIÓN
@@ -52,7 +1495,7 @@ class SupabaseDB:
         """
         try:
             # Registrar en Supabase Auth
-            auth_response = self.supabase.auth.sign_up({
+            auth_response = self._new_auth_client().sign_up({
                 "email": email,
                 "password": password
             })
@@ -65,7 +1508,15 @@ class SupabaseDB:
                     "full_name": full_name
                 }
 
-                self.supabase.table("users").insert(user_data).execute()
+                # Si la confirmación de email está desactivada ya hay sesión
+                db = self
+                if auth_response.session:
+                    db = self.for_user(
+                        auth_response.session.access_token,
+                        auth_response.user.id
+                    )
+
+                db._execute(db.supabase.table("users").insert(user_data))
 
                 return {
                     "success": True,
@@ -87,10 +1538,10 @@ class SupabaseDB:
             password: Contraseña
 
         Returns:
-            Diccionario con datos del usuario o error
+            Diccionario con datos del usuario y la sesión (JWT) o error
         """
         try:
-            auth_response = self.supabase.auth.sign_in_with_password({
+            auth_response = self._new_auth_client().sign_in_with_password({
                 "email": email,
                 "password": password
             })
@@ -107,18 +1558,43 @@ class SupabaseDB:
         except Exception as e:
             return {"success": False, "message": f"Error: {str(e)}"}
 
-    def sign_out(self) -> Dict[str, Any]:
-        """Cerrar sesión"""
+    def refresh_session(self, refresh_token: str) -> Dict[str, Any]:
+        """
+        Renovar el JWT de un usuario
+
+        Args:
+            refresh_token: Refresh token de la sesión
+
+        Returns:
+            Diccionario con la nueva sesión o error
+        """
+        try:
+            auth_response = self._new_auth_client().refresh_session(refresh_token)
+
+            if auth_response.session:
+                return {"success": True, "session": auth_response.session}
+
+            return {"success": False, "message": "No se pudo renovar la sesión"}
+
+        except Exception as e:
+            return {"success": False, "message": f"Error: {str(e)}"}
+
+    def sign_out(self, access_token: str = None) -> Dict[str, Any]:
+        """Cerrar sesión (revoca el JWT del contexto o el indicado)"""
         try:
-            self.supabase.auth.sign_out()
+            access_token = access_token or self._access_token
+            if access_token:
+                self._new_auth_client().admin.sign_out(access_token)
             return {"success": True, "message": "Sesión cerrada"}
         except Exception as e:
             return {"success": False, "message": f"Error: {str(e)}"}
 
     def get_current_user(self) -> Optional[Dict[str, Any]]:
-        """Obtener usuario actual"""
+        """Obtener usuario del contexto actual"""
         try:
-            user = self.supabase.auth.get_user()
+            if not self._access_token:
+                return None
+            user = self._new_auth_client().get_user(self._access_token)
             return user.user if user else None
         except:
             return None
@@ -127,13 +1603,48 @@ class SupabaseDB:
     # CATEGORÍAS
     # =========================================================================
 
+    def _system_categories(self) -> List[Dict[str, Any]]:
+        """
+        Categorías predefinidas, leídas una vez por proceso
+
+        Se guardan en _catalog_cache (HABIT_CATEGORIES_TTL); ver
+        refresh_system_categories para recargarlas antes. Si la recarga
+        falla por timeout o falta de conexión se siguen usando las vencidas.
+
+        Raises:
+            Exception: Si falla la consulta y no hay copia previa
+        """
+        key = ("categories",)
+        hit, rows = _catalog_cache.get(key)
+
+        if not hit:
+            try:
+                response = self._execute(
+                    self.supabase.table("categories").select(_projection("categories")),
+                    op="get_system_categories"
+                )
+            except (DataTimeoutError, DataUnavailableError):
+                stale_hit, rows = _catalog_cache.get_stale(key)
+                if not stale_hit:
+                    raise
+                return _copy_result(rows)
+
+            rows = response.data or []
+            _catalog_cache.set(key, rows, "__system__")
+
+        return _copy_result(rows)
+
+    @staticmethod
+    def refresh_system_categories() -> None:
+        """Descartar las categorías del sistema cacheadas (se recargan al leer)"""
+        _catalog_cache.clear()
+
     def get_categories(self) -> pd.DataFrame:
         """Obtener todas las categorías predefinidas"""
         try:
-            response = self.supabase.table("categories").select("*").execute()
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("categories", self._system_categories())
         except Exception as e:
-            print(f"Error obteniendo categorías: {e}")
+            _log_error("Error obteniendo categorías", e)
             return pd.DataFrame()
 
     def create_user_category(
@@ -154,56 +1665,36 @@ class SupabaseDB:
             Diccionario con la categoría creada o None
         """
         try:
-            response = self.supabase.table("user_categories").insert({
+            response = self._execute(self.supabase.table("user_categories").insert({
                 "user_id": user_id,
                 "name": name.strip(),
                 "color": color
-            }).execute()
+            }))
+            self._invalidate(user_id)
 
             return response.data[0] if response.data else None
         except Exception as e:
-            print(f"Error creando categoría: {e}")
+            _log_error("Error creando categoría", e)
             return None
 
-    def get_all_categories_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+    @cached_read()
+    def get_user_categories(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
         """
-        Obtener categorías predefinidas + personalizadas del usuario
+        Obtener las categorías personalizadas del usuario
 
         Returns:
-            Lista con categorías tipo 'system' y 'personal'
+            Lista de categorías (id, name, color) o None si hubo un error
         """
         try:
-            result = []
-
-            # Categorías predefinidas
-            predefined = self.supabase.table("categories").select("*").execute()
-            if predefined.data:
-                for cat in predefined.data:
-                    result.append({
-                        "id": cat["id"],
-                        "name": cat["name"],
-                        "type": "system",
-                        "color": cat.get("color", "#3B82F6")
-                    })
-
-            # Categorías del usuario
-            user_cats = self.supabase.table("user_categories").select("*").eq(
+            response = self._execute(self.supabase.table("user_categories").select(
+                _projection("user_categories")
+            ).eq(
                 "user_id", user_id
-            ).execute()
-
-            if user_cats.data:
-                for cat in user_cats.data:
-                    result.append({
-                        "id": cat["id"],
-                        "name": cat["name"],
-                        "type": "personal",
-                        "color": cat.get("color", "#3B82F6")
-                    })
-
-            return result
+            ))
+            return response.data or []
         except Exception as e:
-            print(f"Error obteniendo categorías: {e}")
-            return []
+            _log_error("Error obteniendo categorías del usuario", e)
+            return None
 
     # =========================================================================
     # HÁBITOS/METAS
@@ -250,49 +1741,60 @@ class SupabaseDB:
                 "is_active": True
             }
 
-            response = self.supabase.table("habits").insert(habit_data).execute()
+            response = self._execute(self.supabase.table("habits").insert(habit_data))
 
             if response.data:
                 # Crear entrada en habit_metrics
                 habit_id = response.data[0]["id"]
-                self.supabase.table("habit_metrics").insert({
+                self._execute(self.supabase.table("habit_metrics").insert({
                     "habit_id": habit_id,
                     "total_minutes_invested": 0,
                     "total_sessions": 0,
                     "current_streak": 0,
                     "longest_streak": 0,
                     "completion_percentage": 0.0
-                }).execute()
+                }))
+                self._invalidate(user_id)
 
                 return response.data[0]
 
             return None
         except Exception as e:
-            print(f"Error creando hábito: {e}")
+            _log_error("Error creando hábito", e)
             return None
 
-    def get_user_habits(self, user_id: str, active_only: bool = True) -> pd.DataFrame:
+    @mirrored()
+    @cached_read()
+    def get_user_habits(
+        self,
+        user_id: str,
+        active_only: bool = True,
+        columns: str = None
+    ) -> pd.DataFrame:
         """
         Obtener hábitos del usuario
 
         Args:
             user_id: ID del usuario
             active_only: Si True, solo retorna hábitos activos
+            columns: Proyección de PROJECTIONS["habits"] o columnas (opcional)
 
         Returns:
             DataFrame con los hábitos
         """
         try:
-            query = self.supabase.table("habits").select("*").eq("user_id", user_id)
+            query = self.supabase.table("habits").select(
+                _projection("habits", columns)
+            ).eq("user_id", user_id)
 
             if active_only:
                 query = query.eq("is_active", True)
 
-            response = query.order("created_at", desc=True).execute()
+            response = self._execute(query.order("created_at", desc=True))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("habits", response.data)
         except Exception as e:
-            print(f"Error obteniendo hábitos: {e}")
+            _log_error("Error obteniendo hábitos", e)
             return pd.DataFrame()
 
     def update_habit(self, habit_id: str, updates: Dict[str, Any]) -> bool:
@@ -308,46 +1810,36 @@ class SupabaseDB:
         """
         try:
             updates["updated_at"] = datetime.now().isoformat()
-            response = self.supabase.table("habits").update(updates).eq("id", habit_id).execute()
+            response = self._execute(self.supabase.table("habits").update(updates).eq("id", habit_id))
+            self._invalidate()
             return bool(response.data)
         except Exception as e:
-            print(f"Error actualizando hábito: {e}")
-            return False
-
-    def delete_habit(self, habit_id: str) -> bool:
-        """
-        Eliminar un hábito (soft delete - marca como inactivo)
-
-        Args:
-            habit_id: ID del hábito
-
-        Returns:
-            True si se eliminó correctamente
-        """
-        try:
-            return self.update_habit(habit_id, {"is_active": False})
-        except Exception as e:
-            print(f"Error eliminando hábito: {e}")
+            _log_error("Error actualizando hábito", e)
             return False
 
-    def get_habit_progress(self, user_id: str) -> pd.DataFrame:
+    @mirrored()
+    @cached_read()
+    def get_habit_progress(self, user_id: str, columns: str = None) -> pd.DataFrame:
         """
         Obtener progreso de todos los hábitos del usuario usando la vista
 
         Args:
             user_id: ID del usuario
+            columns: Proyección o columnas a pedir (opcional)
 
         Returns:
             DataFrame con progreso detallado
         """
         try:
-            response = self.supabase.table("habit_progress").select("*").eq(
+            response = self._execute(self.supabase.table("habit_progress").select(
+                _projection("habit_progress", columns)
+            ).eq(
                 "user_id", user_id
-            ).execute()
+            ))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("habit_progress", response.data)
         except Exception as e:
-            print(f"Error obteniendo progreso: {e}")
+            _log_error("Error obteniendo progreso", e)
             return pd.DataFrame()
 
     # =========================================================================
@@ -385,45 +1877,58 @@ class SupabaseDB:
                 "description": description.strip() if description else None
             }
 
-            response = self.supabase.table("activities").insert(activity_data).execute()
+            response = self._execute(self.supabase.table("activities").insert(activity_data))
+            self._invalidate(user_id)
             return response.data[0] if response.data else None
         except Exception as e:
-            print(f"Error creando actividad: {e}")
+            _log_error("Error creando actividad", e)
             return None
 
-    def get_user_activities(self, user_id: str) -> pd.DataFrame:
-        """Obtener actividades del usuario"""
+    @mirrored()
+    @cached_read()
+    def get_user_activities(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        """
+        Obtener actividades del usuario
+
+        Args:
+            user_id: ID del usuario
+            columns: Proyección de PROJECTIONS["activities"] o columnas (opcional)
+        """
         try:
-            response = self.supabase.table("activities").select("*").eq(
+            response = self._execute(self.supabase.table("activities").select(
+                _projection("activities", columns)
+            ).eq(
                 "user_id", user_id
-            ).order("created_at", desc=True).execute()
+            ).order("created_at", desc=True))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("activities", response.data)
         except Exception as e:
-            print(f"Error obteniendo actividades: {e}")
+            _log_error("Error obteniendo actividades", e)
             return pd.DataFrame()
 
     def update_activity(self, activity_id: str, updates: Dict[str, Any]) -> bool:
         """Actualizar actividad"""
         try:
             updates["updated_at"] = datetime.now().isoformat()
-            response = self.supabase.table("activities").update(updates).eq(
+            response = self._execute(self.supabase.table("activities").update(updates).eq(
                 "id", activity_id
-            ).execute()
+            ))
+            self._invalidate()
             return bool(response.data)
         except Exception as e:
-            print(f"Error actualizando actividad: {e}")
+            _log_error("Error actualizando actividad", e)
             return False
 
     def delete_activity(self, activity_id: str) -> bool:
         """Eliminar actividad"""
         try:
-            response = self.supabase.table("activities").delete().eq(
+            response = self._execute(self.supabase.table("activities").delete().eq(
                 "id", activity_id
-            ).execute()
+            ))
+            self._invalidate()
             return True
         except Exception as e:
-            print(f"Error eliminando actividad: {e}")
+            _log_error("Error eliminando actividad", e)
             return False
 
     # =========================================================================
@@ -453,40 +1958,107 @@ class SupabaseDB:
                 return False
 
             # Verificar si ya existe la relación
-            existing = self.supabase.table("habit_activities").select("*").eq(
+            existing = self._execute(self.supabase.table("habit_activities").select("habit_id").eq(
                 "habit_id", habit_id
-            ).eq("activity_id", activity_id).execute()
+            ).eq("activity_id", activity_id))
 
             if existing.data:
                 # Actualizar peso existente
-                response = self.supabase.table("habit_activities").update({
+                response = self._execute(self.supabase.table("habit_activities").update({
                     "weight": weight,
                     "updated_at": datetime.now().isoformat()
-                }).eq("habit_id", habit_id).eq("activity_id", activity_id).execute()
+                }).eq("habit_id", habit_id).eq("activity_id", activity_id))
             else:
                 # Crear nueva vinculación
-                response = self.supabase.table("habit_activities").insert({
+                response = self._execute(self.supabase.table("habit_activities").insert({
                     "habit_id": habit_id,
                     "activity_id": activity_id,
                     "weight": weight
-                }).execute()
+                }))
 
+            self._invalidate()
             return bool(response.data)
         except Exception as e:
-            print(f"Error vinculando actividad a hábito: {e}")
+            _log_error("Error vinculando actividad a hábito", e)
+            return False
+
+    def set_activity_links(self, activity_id: str, links: Dict[str, float]) -> bool:
+        """
+        Reemplazar todos los vínculos de una actividad de una sola vez
+
+        Usa la función SQL set_activity_links (sql/set_activity_links.sql) en
+        una transacción; si no está instalada, aplica un upsert más un delete.
+
+        Args:
+            activity_id: ID de la actividad
+            links: Diccionario {habit_id: weight} con los vínculos deseados
+
+        Returns:
+            True si se guardaron correctamente
+        """
+        try:
+            if any(weight < 0 or weight > 1 for weight in links.values()):
+                print("Error: El peso debe estar entre 0 y 1")
+                return False
+
+            if _rpc_available.get("set_activity_links", True):
+                try:
+                    self._execute(self.supabase.rpc("set_activity_links", {
+                        "p_activity_id": activity_id,
+                        "p_links": {habit_id: float(weight) for habit_id, weight in links.items()}
+                    }))
+                    self._invalidate()
+                    return True
+                except Exception as e:
+                    # PGRST202: la función no existe en el esquema
+                    if getattr(e, "code", None) != "PGRST202":
+                        raise
+                    _rpc_available["set_activity_links"] = False
+
+            # Sin RPC: un upsert con los vínculos deseados + un delete del resto
+            if links:
+                now = datetime.now().isoformat()
+                self._execute(self.supabase.table("habit_activities").upsert(
+                    [
+                        {
+                            "habit_id": habit_id,
+                            "activity_id": activity_id,
+                            "weight": float(weight),
+                            "updated_at": now
+                        }
+                        for habit_id, weight in links.items()
+                    ],
+                    on_conflict="habit_id,activity_id"
+                ))
+
+            delete_query = self.supabase.table("habit_activities").delete().eq(
+                "activity_id", activity_id
+            )
+            if links:
+                delete_query = delete_query.not_.in_("habit_id", list(links.keys()))
+            self._execute(delete_query)
+
+            self._invalidate()
+            return True
+        except Exception as e:
+            _log_error("Error guardando vínculos", e)
+            self._invalidate()
             return False
 
     def unlink_activity_from_habit(self, habit_id: str, activity_id: str) -> bool:
         """Desvincular actividad de hábito"""
         try:
-            response = self.supabase.table("habit_activities").delete().eq(
+            response = self._execute(self.supabase.table("habit_activities").delete().eq(
                 "habit_id", habit_id
-            ).eq("activity_id", activity_id).execute()
+            ).eq("activity_id", activity_id))
+            self._invalidate()
             return True
         except Exception as e:
-            print(f"Error desvinculando: {e}")
+            _log_error("Error desvinculando", e)
             return False
 
+    @mirrored(user_scoped=False)
+    @cached_read(user_scoped=False)
     def get_activity_links(self, activity_id: str) -> pd.DataFrame:
         """
         Obtener todos los hábitos vinculados a una actividad
@@ -498,25 +2070,64 @@ class SupabaseDB:
             DataFrame con habit_id, habit_name, weight
         """
         try:
-            response = self.supabase.table("habit_activities").select(
-                "*, habits(id, name)"
-            ).eq("activity_id", activity_id).execute()
+            response = self._execute(self.supabase.table("habit_activities").select(
+                "habit_id, activity_id, weight, habits(id, name)"
+            ).eq("activity_id", activity_id))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("habit_activities", response.data)
         except Exception as e:
-            print(f"Error obteniendo vínculos: {e}")
+            _log_error("Error obteniendo vínculos", e)
             return pd.DataFrame()
 
-    def get_habit_activities_matrix(self, user_id: str) -> pd.DataFrame:
+    @mirrored()
+    @cached_read()
+    def get_user_activity_links(self, user_id: str) -> pd.DataFrame:
+        """
+        Obtener todos los vínculos actividad→hábito del usuario en una consulta
+
+        Reemplaza llamar a get_activity_links una vez por actividad.
+
+        Args:
+            user_id: ID del usuario
+
+        Returns:
+            DataFrame con activity_id, habit_id, habit_name, weight
+        """
+        try:
+            response = self._execute(self.supabase.table("habit_activities").select(
+                "activity_id, habit_id, weight, habits(name), activities!inner(user_id)"
+            ).eq("activities.user_id", user_id))
+
+            if not response.data:
+                return pd.DataFrame(columns=["activity_id", "habit_id", "habit_name", "weight"])
+
+            return to_frame("habit_activities", [
+                {
+                    "activity_id": link["activity_id"],
+                    "habit_id": link["habit_id"],
+                    "habit_name": (link.get("habits") or {}).get("name", "Desconocido"),
+                    "weight": link.get("weight", 1.0)
+                }
+                for link in response.data
+            ])
+        except Exception as e:
+            _log_error("Error obteniendo vínculos del usuario", e)
+            return pd.DataFrame(columns=["activity_id", "habit_id", "habit_name", "weight"])
+
+    @mirrored()
+    @cached_read()
+    def get_habit_activities_matrix(self, user_id: str, columns: str = None) -> pd.DataFrame:
         """Obtener matriz de actividades por hábito usando la vista"""
         try:
-            response = self.supabase.table("activity_habit_matrix").select("*").eq(
+            response = self._execute(self.supabase.table("activity_habit_matrix").select(
+                _projection("activity_habit_matrix", columns)
+            ).eq(
                 "user_id", user_id
-            ).execute()
+            ))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("activity_habit_matrix", response.data)
         except Exception as e:
-            print(f"Error obteniendo matriz: {e}")
+            _log_error("Error obteniendo matriz", e)
             return pd.DataFrame()
 
     # =========================================================================
@@ -550,16 +2161,9 @@ class SupabaseDB:
             Diccionario con la sesión creada o None
         """
         try:
-            if duration_minutes <= 0:
-                print("Error: La duración debe ser mayor a 0")
-                return None
-
-            if mood and (mood < 1 or mood > 5):
-                print("Error: Mood debe estar entre 1 y 5")
-                return None
-
-            if productivity_level and (productivity_level < 1 or productivity_level > 5):
-                print("Error: Productivity debe estar entre 1 y 5")
+            error = validate_session(duration_minutes, mood, productivity_level)
+            if error:
+                print(f"Error: {error}")
                 return None
 
             session_data = {
@@ -572,7 +2176,8 @@ class SupabaseDB:
                 "productivity_level": productivity_level
             }
 
-            response = self.supabase.table("sessions").insert(session_data).execute()
+            response = self._execute(self.supabase.table("sessions").insert(session_data))
+            self._invalidate()
 
             if response.data:
                 # El trigger register_session() en Supabase automáticamente
@@ -581,15 +2186,47 @@ class SupabaseDB:
 
             return None
         except Exception as e:
-            print(f"Error registrando sesión: {e}")
+            _log_error("Error registrando sesión", e)
             return None
 
+    def insert_sessions_batch(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insertar varias sesiones ya validadas en una sola petición
+
+        Las sesiones deben traer su propio "id" (UUID generado en el cliente):
+        el insert ignora ids ya existentes, así que reintentar un lote es seguro.
+        A diferencia de register_session, los errores se propagan para que
+        quien llama pueda reintentar.
+
+        Args:
+            sessions: Lista de filas para la tabla sessions
+
+        Returns:
+            Filas insertadas (las duplicadas no se devuelven)
+        """
+        if not sessions:
+            return []
+
+        response = self._execute(
+            self.supabase.table("sessions").upsert(
+                sessions,
+                on_conflict="id",
+                ignore_duplicates=True
+            ),
+            idempotent=True
+        )
+        self._invalidate()
+        return response.data or []
+
+    @mirrored()
+    @cached_read()
     def get_user_sessions(
         self,
         user_id: str,
         limit: int = 100,
         start_date: date = None,
-        end_date: date = None
+        end_date: date = None,
+        columns: str = None
     ) -> pd.DataFrame:
         """
         Obtener sesiones del usuario
@@ -599,13 +2236,15 @@ class SupabaseDB:
             limit: Número máximo de sesiones a retornar
             start_date: Fecha de inicio (opcional)
             end_date: Fecha de fin (opcional)
+            columns: Proyección de PROJECTIONS["sessions"] o columnas; debe
+                incluir el embed activities!inner(user_id) (opcional)
 
         Returns:
             DataFrame con las sesiones
         """
         try:
             query = self.supabase.table("sessions").select(
-                "*, activities!inner(user_id, name)"
+                _projection("sessions", columns)
             ).eq("activities.user_id", user_id)
 
             if start_date:
@@ -614,13 +2253,87 @@ class SupabaseDB:
             if end_date:
                 query = query.lte("session_date", end_date.isoformat())
 
-            response = query.order("session_date", desc=True).limit(limit).execute()
+            response = self._execute(query.order("session_date", desc=True).limit(limit))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("sessions", response.data)
         except Exception as e:
-            print(f"Error obteniendo sesiones: {e}")
+            _log_error("Error obteniendo sesiones", e)
             return pd.DataFrame()
 
+    def iter_user_sessions(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None,
+        page_size: int = 1000,
+        as_records: bool = False,
+        columns: str = None
+    ) -> Iterator[Any]:
+        """
+        Recorrer todas las sesiones del usuario por páginas (keyset)
+
+        Pagina con el cursor (session_date, id) en orden descendente, así cada
+        página cuesta lo mismo sin importar cuántas sesiones haya antes (sin
+        OFFSET) y la memoria queda acotada a page_size filas.
+
+        Args:
+            user_id: ID del usuario
+            start_date: Fecha de inicio (opcional)
+            end_date: Fecha de fin (opcional)
+            page_size: Filas por página
+            as_records: Si True produce listas de diccionarios en vez de DataFrames
+            columns: Proyección o columnas; debe incluir id, session_date y
+                activities!inner(user_id) (opcional)
+
+        Yields:
+            Un DataFrame (o lista de registros) por página
+
+        Raises:
+            Exception: Si una página falla, para no truncar el resultado en silencio
+        """
+        cursor = None
+
+        while True:
+            query = self.supabase.table("sessions").select(
+                _projection("sessions", columns)
+            ).eq("activities.user_id", user_id)
+
+            if start_date:
+                query = query.gte("session_date", start_date.isoformat())
+
+            if end_date:
+                query = query.lte("session_date", end_date.isoformat())
+
+            if cursor is not None:
+                last_date, last_id = cursor
+                query = query.or_(
+                    f"session_date.lt.{last_date},"
+                    f"and(session_date.eq.{last_date},id.lt.{last_id})"
+                )
+
+            try:
+                response = self._execute(
+                    query.order("session_date", desc=True)
+                    .order("id", desc=True)
+                    .limit(page_size)
+                )
+            except Exception as e:
+                _log_error("Error obteniendo página de sesiones", e)
+                raise
+
+            rows = response.data or []
+            if not rows:
+                return
+
+            yield rows if as_records else to_frame("sessions", rows)
+
+            if len(rows) < page_size:
+                return
+
+            cursor = (rows[-1]["session_date"], rows[-1]["id"])
+
+    @mirrored()
+    @cached_read()
     def get_activity_contribution(self, user_id: str) -> pd.DataFrame:
         """
         Obtener contribución de actividades a hábitos usando la vista
@@ -634,43 +2347,97 @@ class SupabaseDB:
         """
         try:
             # Necesitamos filtrar por user_id a través de activities
-            response = self.supabase.table("activity_habit_contribution").select(
+            response = self._execute(self.supabase.table("activity_habit_contribution").select(
                 "*, activities!inner(user_id)"
-            ).eq("activities.user_id", user_id).execute()
+            ).eq("activities.user_id", user_id))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("activity_habit_contribution", response.data)
         except Exception as e:
-            print(f"Error obteniendo contribuciones: {e}")
+            _log_error("Error obteniendo contribuciones", e)
             return pd.DataFrame()
 
     # =========================================================================
     # MÉTRICAS Y ESTADÍSTICAS
     # =========================================================================
 
-    def get_weekly_summary(self, user_id: str) -> pd.DataFrame:
+    @mirrored()
+    @cached_read()
+    def get_weekly_summary(self, user_id: str, columns: str = None) -> pd.DataFrame:
         """Obtener resumen semanal de progreso usando la vista"""
         try:
-            response = self.supabase.table("weekly_summary").select("*").eq(
+            response = self._execute(self.supabase.table("weekly_summary").select(
+                _projection("weekly_summary", columns)
+            ).eq(
                 "user_id", user_id
-            ).execute()
+            ))
 
-            return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+            return to_frame("weekly_summary", response.data)
         except Exception as e:
-            print(f"Error obteniendo resumen semanal: {e}")
+            _log_error("Error obteniendo resumen semanal", e)
             return pd.DataFrame()
 
+    @mirrored(user_scoped=False)
+    @cached_read(user_scoped=False)
     def get_habit_metrics(self, habit_id: str) -> Optional[Dict[str, Any]]:
         """Obtener métricas de un hábito específico"""
         try:
-            response = self.supabase.table("habit_metrics").select("*").eq(
+            response = self._execute(self.supabase.table("habit_metrics").select(
+                _projection("habit_metrics")
+            ).eq(
                 "habit_id", habit_id
-            ).execute()
+            ))
 
             return response.data[0] if response.data else None
         except Exception as e:
-            print(f"Error obteniendo métricas: {e}")
+            _log_error("Error obteniendo métricas", e)
             return None
 
+    @mirrored()
+    @cached_read()
+    def get_user_habit_metrics(self, user_id: str) -> pd.DataFrame:
+        """
+        Obtener las métricas guardadas de todos los hábitos del usuario
+
+        Args:
+            user_id: ID del usuario
+
+        Returns:
+            DataFrame con una fila de habit_metrics por hábito
+        """
+        try:
+            response = self._execute(self.supabase.table("habit_metrics").select(
+                f"{_projection('habit_metrics')}, habits!inner(user_id)"
+            ).eq("habits.user_id", user_id))
+
+            return to_frame("habit_metrics", response.data)
+        except Exception as e:
+            _log_error("Error obteniendo métricas del usuario", e)
+            return pd.DataFrame()
+
+    def upsert_habit_metrics(self, metrics: List[Dict[str, Any]]) -> bool:
+        """
+        Guardar métricas calculadas fuera de Supabase (ver utils/metrics.py)
+
+        Args:
+            metrics: Filas de habit_metrics (habit_id + columnas de métricas)
+
+        Returns:
+            True si se guardaron
+        """
+        if not metrics:
+            return True
+
+        try:
+            self._execute(
+                self.supabase.table("habit_metrics").upsert(metrics, on_conflict="habit_id"),
+                idempotent=True
+            )
+            self._invalidate()
+            return True
+        except Exception as e:
+            _log_error("Error guardando métricas", e)
+            return False
+
     def update_habit_metrics(self, habit_id: str) -> bool:
         """
         Forzar actualización de métricas de un hábito
@@ -678,10 +2445,57 @@ class SupabaseDB:
         """
         try:
             # Llamar a la función SQL update_habit_metrics
-            response = self.supabase.rpc("update_habit_metrics", {
-                "p_habit_id": habit_id
-            }).execute()
+            response = self._execute(
+                self.supabase.rpc("update_habit_metrics", {"p_habit_id": habit_id}),
+                idempotent=True
+            )
+            self._invalidate()
             return True
         except Exception as e:
-            print(f"Error actualizando métricas: {e}")
+            _log_error("Error actualizando métricas", e)
             return False
+
+    def update_habit_metrics_batch(
+        self,
+        habit_ids: List[str],
+        chunk_size: int = METRICS_BATCH_SIZE
+    ) -> int:
+        """
+        Recalcular las métricas de muchos hábitos
+
+        Usa la función SQL update_habit_metrics_batch
+        (sql/update_habit_metrics_batch.sql) con hasta chunk_size hábitos por
+        llamada; si no está instalada, llama update_habit_metrics por hábito.
+
+        Args:
+            habit_ids: IDs de los hábitos
+            chunk_size: Hábitos por llamada
+
+        Returns:
+            Número de hábitos recalculados
+        """
+        habit_ids = list(dict.fromkeys(habit_ids))
+        updated = 0
+
+        for start in range(0, len(habit_ids), chunk_size):
+            chunk = habit_ids[start:start + chunk_size]
+
+            if _rpc_available.get("update_habit_metrics_batch", True):
+                try:
+                    response = self._execute(
+                        self.supabase.rpc("update_habit_metrics_batch", {"p_habit_ids": chunk}),
+                        idempotent=True
+                    )
+                    updated += response.data if isinstance(response.data, int) else len(chunk)
+                    continue
+                except Exception as e:
+                    # PGRST202: la función no existe en el esquema
+                    if getattr(e, "code", None) != "PGRST202":
+                        _log_error("Error actualizando métricas en lote", e)
+                        continue
+                    _rpc_available["update_habit_metrics_batch"] = False
+
+            updated += sum(1 for habit_id in chunk if self.update_habit_metrics(habit_id))
+
+        self._invalidate()
+        return updated
@@ -0,0 +1,260 @@
+"""
+=============================================================================
+EXPORTACIÓN DE SESIONES - HABIT TRACKER
+=============================================================================
+Exporta todas las sesiones de un rango de fechas a CSV o Parquet leyendo por
+páginas (SupabaseDB.iter_user_sessions) y escribiendo cada página al
+terminar de recibirla: la memoria queda acotada a una página sin importar
+cuántas sesiones tenga el usuario.
+
+Uso desde la línea de comandos:
+
+    python -m utils.exporter sesiones.parquet --email usuario@correo.com
+
+Parquet requiere pyarrow (opcional, ver requirements.txt)
+"""
+
+import argparse
+import getpass
+import os
+import sys
+from datetime import date
+from typing import Dict, Iterator
+import pandas as pd
+
+from utils.database import sign_in_user_db
+from utils.schemas import to_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet no disponible
+    pa = None
+    pq = None
+
+# Filas por página leída (y por row group en Parquet)
+EXPORT_PAGE_SIZE = int(os.getenv("HABIT_EXPORT_PAGE_SIZE", "1000"))
+
+EXPORT_COLUMNS = [
+    "id", "session_date", "start_time", "activity_id", "activity_name",
+    "habits", "duration_minutes", "mood", "productivity_level", "notes"
+]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+
+def parquet_available() -> bool:
+    """Indicar si está instalado pyarrow"""
+    return pa is not None
+
+
+def _arrow_schema():
+    return pa.schema([
+        ("id", pa.string()),
+        ("session_date", pa.date32()),
+        ("start_time", pa.string()),
+        ("activity_id", pa.string()),
+        ("activity_name", pa.string()),
+        ("habits", pa.string()),
+        ("duration_minutes", pa.int32()),
+        ("mood", pa.int8()),
+        ("productivity_level", pa.int8()),
+        ("notes", pa.string())
+    ])
+
+
+def _habits_by_activity(db, user_id: str) -> Dict[str, str]:
+    """Nombres de los hábitos de cada actividad ("A, B"), una sola consulta"""
+    links = db.get_user_activity_links(user_id)
+    if links.empty:
+        return {}
+
+    return links.groupby("activity_id")["habit_name"].agg(
+        lambda names: ", ".join(sorted(names.dropna()))
+    ).to_dict()
+
+
+def _export_frame(rows: list, habits_by_activity: Dict[str, str]) -> pd.DataFrame:
+    """
+    Tipar una página de sesiones (schemas) y añadir los hábitos beneficiados
+
+    Args:
+        rows: Registros devueltos por iter_user_sessions
+        habits_by_activity: activity_id -> hábitos beneficiados
+
+    Returns:
+        DataFrame con EXPORT_COLUMNS y tipos fijos
+    """
+    page = to_frame("sessions", rows)
+
+    for column in EXPORT_COLUMNS:
+        if column not in page.columns:
+            page[column] = None
+
+    page["habits"] = page["activity_id"].map(habits_by_activity).fillna("")
+    page["session_date"] = page["session_date"].dt.date
+    # La categoría solo sirve dentro de una página: se exporta como texto
+    page["activity_name"] = page["activity_name"].astype(object)
+
+    return page[EXPORT_COLUMNS]
+
+
+def iter_export_frames(
+    db,
+    user_id: str,
+    start_date: date = None,
+    end_date: date = None,
+    page_size: int = EXPORT_PAGE_SIZE
+) -> Iterator[pd.DataFrame]:
+    """
+    Recorrer las sesiones del usuario ya aplanadas y tipadas, página a página
+
+    Args:
+        db: SupabaseDB ligado al usuario (for_user)
+        user_id: ID del usuario
+        start_date: Fecha de inicio (opcional)
+        end_date: Fecha de fin (opcional)
+        page_size: Filas por página
+
+    Yields:
+        Un DataFrame con EXPORT_COLUMNS por página
+    """
+    habits_by_activity = _habits_by_activity(db, user_id)
+
+    for rows in db.iter_user_sessions(
+        user_id,
+        start_date=start_date,
+        end_date=end_date,
+        page_size=page_size,
+        as_records=True
+    ):
+        yield _export_frame(rows, habits_by_activity)
+
+
+def write_csv(frames: Iterator[pd.DataFrame], destination) -> int:
+    """
+    Escribir páginas en un CSV (cabecera solo en la primera)
+
+    Args:
+        frames: Páginas de iter_export_frames
+        destination: Ruta del archivo
+
+    Returns:
+        Número de filas escritas
+    """
+    total = 0
+
+    with open(destination, "w", encoding="utf-8", newline="") as output:
+        pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(output, index=False)
+
+        for frame in frames:
+            frame.to_csv(output, index=False, header=False)
+            total += len(frame)
+
+    return total
+
+
+def write_parquet(frames: Iterator[pd.DataFrame], destination) -> int:
+    """
+    Escribir páginas en un Parquet (un row group por página)
+
+    Args:
+        frames: Páginas de iter_export_frames
+        destination: Ruta del archivo
+
+    Returns:
+        Número de filas escritas
+
+    Raises:
+        RuntimeError: Si pyarrow no está instalado
+    """
+    if not parquet_available():
+        raise RuntimeError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+
+    schema = _arrow_schema()
+    total = 0
+
+    with pq.ParquetWriter(destination, schema, compression="zstd") as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            total += len(frame)
+
+    return total
+
+
+def export_sessions(
+    db,
+    user_id: str,
+    destination,
+    file_format: str = "csv",
+    start_date: date = None,
+    end_date: date = None,
+    page_size: int = EXPORT_PAGE_SIZE
+) -> int:
+    """
+    Exportar las sesiones de un rango de fechas a un archivo
+
+    Args:
+        db: SupabaseDB ligado al usuario (for_user)
+        user_id: ID del usuario
+        destination: Ruta del archivo a escribir
+        file_format: "csv" o "parquet"
+        start_date: Fecha de inicio (opcional)
+        end_date: Fecha de fin (opcional)
+        page_size: Filas por página
+
+    Returns:
+        Número de sesiones exportadas
+    """
+    frames = iter_export_frames(db, user_id, start_date, end_date, page_size)
+
+    if file_format == "parquet":
+        return write_parquet(frames, destination)
+    if file_format == "csv":
+        return write_csv(frames, destination)
+
+    raise ValueError(f"Formato no soportado: {file_format}")
+
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Exportar sesiones a CSV o Parquet")
+    parser.add_argument("path", help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument("--email", required=True, help="Email del usuario")
+    parser.add_argument("--since", type=date.fromisoformat, help="Fecha de inicio (AAAA-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Fecha de fin (AAAA-MM-DD)")
+    args = parser.parse_args(argv)
+
+    file_format = os.path.splitext(args.path)[1].lower().lstrip(".")
+    if file_format not in EXPORT_FORMATS:
+        print("❌ El archivo debe terminar en .csv o .parquet", file=sys.stderr)
+        return 1
+
+    password = os.getenv("HABIT_CLI_PASSWORD") or getpass.getpass("Contraseña: ")
+
+    auth = sign_in_user_db(args.email, password)
+    if not auth["success"]:
+        print(f"❌ {auth['message']}", file=sys.stderr)
+        return 1
+
+    total = export_sessions(
+        auth["db"],
+        auth["user_id"],
+        args.path,
+        file_format,
+        start_date=args.since,
+        end_date=args.until
+    )
+
+    print(f"✅ {total} sesiones exportadas a {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,7 @@ FUNCIONES AUXILIARES - HABIT TRACKER
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Tuple
 import pandas as pd
+import streamlit as st
 
 
 def calculate_weeks_to_goal(
@@ -192,6 +193,31 @@ def calculate_weekly_compliance(
     }
 
 
+def index_activity_links(links_df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Indexar los vínculos actividad→hábito por actividad
+
+    Args:
+        links_df: DataFrame de get_user_activity_links
+
+    Returns:
+        Diccionario {activity_id: [{habit_id, habit_name, weight}, ...]}
+    """
+    index: Dict[str, List[Dict[str, Any]]] = {}
+
+    if links_df.empty:
+        return index
+
+    for link in links_df.to_dict("records"):
+        index.setdefault(link["activity_id"], []).append({
+            "habit_id": link["habit_id"],
+            "habit_name": link.get("habit_name", "Desconocido"),
+            "weight": link.get("weight", 1.0)
+        })
+
+    return index
+
+
 def validate_email(email: str) -> bool:
     """
     Validar formato de email
@@ -307,6 +333,16 @@ def get_productivity_bars(productivity: int) -> str:
     return "▮" * productivity + "▯" * (5 - productivity)
 
 
+def _session_dates(sessions_df: pd.DataFrame) -> pd.Series:
+    """Fechas de las sesiones como datetime64 (sin convertir si ya lo son)"""
+    dates = sessions_df["session_date"]
+
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+
+    return pd.to_datetime(dates)
+
+
 def aggregate_sessions_by_period(
     sessions_df: pd.DataFrame,
     period: str = "week"
@@ -324,7 +360,7 @@ def aggregate_sessions_by_period(
     if sessions_df.empty:
         return pd.DataFrame()
 
-    sessions_df["session_date"] = pd.to_datetime(sessions_df["session_date"])
+    sessions_df = sessions_df.assign(session_date=_session_dates(sessions_df))
 
     if period == "day":
         return sessions_df.groupby(
@@ -362,8 +398,7 @@ def calculate_streak(sessions_df: pd.DataFrame) -> int:
     if sessions_df.empty:
         return 0
 
-    sessions_df["session_date"] = pd.to_datetime(sessions_df["session_date"])
-    unique_dates = sorted(sessions_df["session_date"].dt.date.unique(), reverse=True)
+    unique_dates = sorted(_session_dates(sessions_df).dt.date.unique(), reverse=True)
 
     if not unique_dates:
         return 0
@@ -379,3 +414,15 @@ def calculate_streak(sessions_df: pd.DataFrame) -> int:
             break
 
     return streak
+
+
+def show_data_errors(db) -> None:
+    """
+    Mostrar los avisos de la capa de datos (timeouts, sin conexión, datos
+    cacheados) acumulados desde el último llamado, sin repetir mensajes
+
+    Args:
+        db: Base de datos de la página (get_user_db)
+    """
+    for message in dict.fromkeys(error.display_message() for error in db.pop_errors()):
+        st.warning(message)
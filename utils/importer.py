@@ -0,0 +1,250 @@
+"""
+=============================================================================
+IMPORTACIÓN MASIVA DE SESIONES - HABIT TRACKER
+=============================================================================
+Lee un archivo CSV o JSONL por bloques, resuelve los nombres de actividad a
+IDs una sola vez e inserta con SupabaseDB.register_sessions_bulk. Las
+métricas de los hábitos afectados se recalculan una vez al terminar.
+
+Uso desde la línea de comandos:
+
+    python -m utils.importer sesiones.csv --email usuario@correo.com
+
+Columnas reconocidas: activity_name (o activity_id), duration_minutes,
+session_date, start_time, notes, mood, productivity_level
+"""
+
+import argparse
+import getpass
+import os
+import sys
+from typing import Any, Callable, Dict, Iterator, Optional
+import pandas as pd
+
+from utils.database import BULK_CHUNK_SIZE, sign_in_user_db
+
+# Filas de ejemplo que se guardan de las rechazadas para el reporte
+MAX_REJECTED_SAMPLES = 100
+
+SUPPORTED_FORMATS = ("csv", "jsonl")
+
+
+def detect_format(name: str) -> str:
+    """
+    Deducir el formato a partir del nombre del archivo
+
+    Args:
+        name: Nombre o ruta del archivo
+
+    Returns:
+        "csv" o "jsonl"
+    """
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+
+    if extension in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+
+    raise ValueError(f"Formato no soportado: .{extension} (usa CSV o JSONL)")
+
+
+def read_session_chunks(
+    source,
+    file_format: str,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """
+    Leer un archivo de sesiones por bloques, sin cargarlo entero en memoria
+
+    Args:
+        source: Ruta o archivo abierto (p. ej. el de st.file_uploader)
+        file_format: "csv" o "jsonl"
+        chunk_size: Filas por bloque
+
+    Yields:
+        DataFrames de hasta chunk_size filas
+    """
+    if file_format == "csv":
+        reader = pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=True)
+    elif file_format == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        raise ValueError(f"Formato no soportado: {file_format}")
+
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _normalize_name(names: pd.Series) -> pd.Series:
+    return names.astype(str).str.strip().str.casefold()
+
+
+def resolve_activity_ids(
+    chunk: pd.DataFrame,
+    activity_ids_by_name: Dict[str, str]
+) -> pd.DataFrame:
+    """
+    Completar activity_id a partir de activity_name (sin distinguir mayúsculas)
+
+    Las filas con un nombre desconocido quedan sin activity_id y la
+    validación las rechaza.
+
+    Args:
+        chunk: Bloque leído del archivo
+        activity_ids_by_name: Nombre normalizado -> ID de actividad
+
+    Returns:
+        Bloque con la columna activity_id
+    """
+    chunk = chunk.copy()
+
+    if "activity_id" not in chunk.columns:
+        chunk["activity_id"] = None
+
+    if "activity_name" in chunk.columns:
+        by_name = _normalize_name(chunk["activity_name"]).map(activity_ids_by_name)
+        chunk["activity_id"] = chunk["activity_id"].where(chunk["activity_id"].notna(), by_name)
+
+    # Un activity_id explícito debe ser de una actividad del usuario
+    known_ids = set(activity_ids_by_name.values())
+    chunk["activity_id"] = chunk["activity_id"].where(chunk["activity_id"].isin(known_ids))
+
+    return chunk
+
+
+def import_sessions(
+    db,
+    user_id: str,
+    source,
+    file_format: str,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Importar sesiones de un archivo CSV/JSONL
+
+    Args:
+        db: SupabaseDB ligado al usuario (for_user)
+        user_id: ID del usuario
+        source: Ruta o archivo abierto
+        file_format: "csv" o "jsonl"
+        chunk_size: Filas por bloque leído y por petición de inserción
+        on_progress: Función llamada tras cada bloque con el resumen parcial
+
+    Returns:
+        Diccionario con rows, inserted, duplicates, failed, rejected,
+        rejected_samples (DataFrame con la fila de origen) y habits_recomputed
+    """
+    activities = db.get_user_activities(user_id, columns="list")
+    activity_ids_by_name = {}
+    if not activities.empty:
+        activity_ids_by_name = dict(zip(_normalize_name(activities["name"]), activities["id"]))
+
+    summary = {
+        "rows": 0,
+        "inserted": 0,
+        "duplicates": 0,
+        "failed": 0,
+        "rejected": 0,
+        "rejected_samples": pd.DataFrame(),
+        "habits_recomputed": 0
+    }
+    affected_activities = set()
+    samples = []
+
+    # Apariciones de cada sesión sin id en los bloques ya leídos: dos filas
+    # iguales en bloques distintos reciben ids distintos (ver session_ids)
+    seen = {}
+
+    for chunk in read_session_chunks(source, file_format, chunk_size):
+        # Número de fila en el archivo (1 = primera fila de datos)
+        chunk.index = range(summary["rows"] + 1, summary["rows"] + len(chunk) + 1)
+        chunk.index.name = "row"
+        summary["rows"] += len(chunk)
+
+        chunk = resolve_activity_ids(chunk, activity_ids_by_name)
+        result = db.register_sessions_bulk(
+            user_id,
+            chunk.reset_index(),
+            chunk_size=chunk_size,
+            recompute_metrics=False,
+            seen=seen
+        )
+
+        summary["inserted"] += result["inserted"]
+        summary["duplicates"] += result["duplicates"]
+        summary["failed"] += result["failed"]
+        summary["rejected"] += len(result["rejected"])
+        affected_activities.update(result["activity_ids"])
+
+        sampled = sum(len(sample) for sample in samples)
+        if sampled < MAX_REJECTED_SAMPLES and not result["rejected"].empty:
+            samples.append(result["rejected"].head(MAX_REJECTED_SAMPLES - sampled))
+
+        if on_progress:
+            on_progress(summary)
+
+    # Un solo recálculo por hábito afectado, al final de toda la carga
+    summary["habits_recomputed"] = db.refresh_metrics_for_activities(
+        user_id, affected_activities
+    )
+
+    if samples:
+        summary["rejected_samples"] = pd.concat(samples, ignore_index=True)
+
+    return summary
+
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Importar sesiones históricas desde CSV o JSONL"
+    )
+    parser.add_argument("path", help="Archivo .csv o .jsonl")
+    parser.add_argument("--email", required=True, help="Email del usuario")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="Formato (default: por extensión)")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="Filas por lote")
+    args = parser.parse_args(argv)
+
+    password = os.getenv("HABIT_CLI_PASSWORD") or getpass.getpass("Contraseña: ")
+
+    auth = sign_in_user_db(args.email, password)
+    if not auth["success"]:
+        print(f"❌ {auth['message']}", file=sys.stderr)
+        return 1
+
+    def report(progress: Dict[str, Any]) -> None:
+        print(
+            f"  {progress['rows']} filas leídas · {progress['inserted']} insertadas · "
+            f"{progress['rejected']} rechazadas",
+            flush=True
+        )
+
+    summary = import_sessions(
+        auth["db"],
+        auth["user_id"],
+        args.path,
+        args.format or detect_format(args.path),
+        chunk_size=args.chunk_size,
+        on_progress=report
+    )
+
+    print(
+        f"✅ {summary['inserted']} sesiones importadas, {summary['duplicates']} duplicadas, "
+        f"{summary['rejected']} rechazadas, {summary['failed']} con error. "
+        f"{summary['habits_recomputed']} hábitos recalculados."
+    )
+
+    for _, row in summary["rejected_samples"].head(20).iterrows():
+        print(f"  fila {row['row']}: {row['error']}")
+
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+=============================================================================
+INSTRUMENTACIÓN DE CONSULTAS - HABIT TRACKER
+=============================================================================
+Tiempo, filas, bytes y errores de cada llamada a Supabase, agregados por
+operación (método de SupabaseDB) en histogramas con p50/p95/p99.
+
+Cada llamada se entrega también a los sinks configurados:
+
+- LogSink: una línea JSON por llamada (logger "habit_tracker.queries")
+- PrometheusFileSink: archivo de texto en formato de exposición de
+  Prometheus (para node_exporter textfile collector o similar)
+
+El panel de la app lee directamente QueryMetrics.report(). Los bytes solo se
+miden (serializando la respuesta) si hay sinks o se pide measure_bytes.
+"""
+
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+# Límites de los buckets del histograma de latencia (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Muestras recientes por operación para calcular percentiles
+DEFAULT_SAMPLE_SIZE = 1024
+
+REPORT_COLUMNS = [
+    "method", "calls", "errors", "rows", "bytes", "bytes_per_call",
+    "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_s"
+]
+
+
+def payload_size(data: Any, measure_bytes: bool = True) -> tuple:
+    """
+    Filas y bytes JSON de una respuesta
+
+    Args:
+        data: Datos de la respuesta
+        measure_bytes: Serializar la respuesta para contar los bytes (si es
+            False, bytes es 0)
+
+    Returns:
+        Tupla (filas, bytes)
+    """
+    rows = len(data) if isinstance(data, list) else int(data is not None)
+    size = len(json.dumps(data, default=str)) if measure_bytes and data is not None else 0
+    return rows, size
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# =============================================================================
+# AGREGADOS POR OPERACIÓN
+# =============================================================================
+
+class OperationStats:
+    """
+    Contadores e histograma de una operación (no thread-safe: lo protege
+    QueryMetrics)
+    """
+
+    def __init__(self, sample_size: int = DEFAULT_SAMPLE_SIZE):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def add(self, seconds: float, rows: int, size: int, error: bool) -> None:
+        self.calls += 1
+        self.errors += int(error)
+        self.rows += rows
+        self.bytes += size
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.samples.append(seconds)
+
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[index] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "bytes_per_call": round(self.bytes / self.calls) if self.calls else 0,
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "total_s": round(self.total_seconds, 3)
+        }
+
+
+class QueryMetrics:
+    """
+    Registro thread-safe de las llamadas a Supabase
+
+    Compartido por todas las vistas for_user de un SupabaseDB
+    """
+
+    def __init__(
+        self,
+        sinks: List["MetricsSink"] = None,
+        sample_size: int = DEFAULT_SAMPLE_SIZE,
+        measure_bytes: bool = False
+    ):
+        """
+        Args:
+            sinks: Destinos adicionales de cada llamada (ver build_sinks)
+            sample_size: Muestras recientes por operación para percentiles
+            measure_bytes: Medir los bytes de cada respuesta aunque no haya
+                sinks (p. ej. para payload_report)
+        """
+        self.sinks: List[MetricsSink] = list(sinks or [])
+        self.sample_size = sample_size
+
+        # Serializar cada respuesta solo si alguien usa los bytes
+        self.measures_bytes = measure_bytes or bool(self.sinks)
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, OperationStats] = {}
+
+    def record(
+        self,
+        op: str,
+        seconds: float,
+        rows: int = 0,
+        size: int = 0,
+        error: Optional[Exception] = None
+    ) -> None:
+        """
+        Registrar una llamada
+
+        Args:
+            op: Operación (método de SupabaseDB)
+            seconds: Tiempo total, incluidos reintentos
+            rows: Filas recibidas
+            size: Bytes JSON recibidos
+            error: Excepción si la llamada falló
+        """
+        with self._lock:
+            stats = self._stats.get(op)
+            if stats is None:
+                stats = self._stats[op] = OperationStats(self.sample_size)
+            stats.add(seconds, rows, size, error is not None)
+
+        for sink in self.sinks:
+            try:
+                sink.emit(self, op, seconds, rows, size, error)
+            except Exception as e:
+                # Un sink roto no debe tumbar la consulta
+                print(f"Error en sink de métricas {type(sink).__name__}: {e}")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copia de los agregados: {op: {calls, errors, ..., buckets}}"""
+        with self._lock:
+            return {
+                op: {**stats.summary(), "buckets": list(stats.bucket_counts)}
+                for op, stats in self._stats.items()
+            }
+
+    def report(self) -> pd.DataFrame:
+        """
+        Reporte por operación
+
+        Returns:
+            DataFrame con REPORT_COLUMNS, ordenado por tiempo total
+        """
+        snapshot = self.snapshot()
+
+        if not snapshot:
+            return pd.DataFrame(columns=REPORT_COLUMNS)
+
+        report = pd.DataFrame([
+            {"method": op, **{k: v for k, v in stats.items() if k != "buckets"}}
+            for op, stats in snapshot.items()
+        ])
+        return report[REPORT_COLUMNS].sort_values("total_s", ascending=False).reset_index(drop=True)
+
+    def reset(self) -> None:
+        """Vaciar los agregados"""
+        with self._lock:
+            self._stats.clear()
+
+
+# =============================================================================
+# SINKS
+# =============================================================================
+
+class MetricsSink(ABC):
+    """Destino de las llamadas registradas"""
+
+    @abstractmethod
+    def emit(
+        self,
+        metrics: QueryMetrics,
+        op: str,
+        seconds: float,
+        rows: int,
+        size: int,
+        error: Optional[Exception]
+    ) -> None:
+        """Registrar una llamada"""
+
+
+class LogSink(MetricsSink):
+    """Una línea JSON por llamada"""
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("habit_tracker.queries")
+        self.level = level
+
+    def emit(self, metrics, op, seconds, rows, size, error) -> None:
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        self.logger.log(self.level, json.dumps({
+            "event": "supabase_query",
+            "op": op,
+            "ms": round(seconds * 1000, 1),
+            "rows": rows,
+            "bytes": size,
+            "error": type(error).__name__ if error is not None else None
+        }))
+
+
+class PrometheusFileSink(MetricsSink):
+    """
+    Archivo en formato de exposición de Prometheus, reescrito como mucho
+    cada interval segundos (escritura atómica)
+    """
+
+    def __init__(self, path: str, interval: float = 15.0):
+        """
+        Args:
+            path: Ruta del archivo .prom
+            interval: Segundos mínimos entre escrituras
+        """
+        self.path = path
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def emit(self, metrics, op, seconds, rows, size, error) -> None:
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._last_write < self.interval:
+                return
+            self._last_write = now
+
+        self.write(metrics)
+
+    def write(self, metrics: QueryMetrics) -> None:
+        """Escribir el archivo con los agregados actuales"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        text = format_prometheus(metrics.snapshot())
+
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as file:
+            file.write(text)
+        os.replace(temp_path, self.path)
+
+
+def format_prometheus(snapshot: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Agregados en formato de texto de Prometheus
+
+    Args:
+        snapshot: Resultado de QueryMetrics.snapshot()
+
+    Returns:
+        Texto con histograma de latencia y contadores por operación
+    """
+    lines = [
+        "# HELP habit_supabase_query_seconds Latencia de las llamadas a Supabase",
+        "# TYPE habit_supabase_query_seconds histogram"
+    ]
+
+    for op, stats in sorted(snapshot.items()):
+        cumulative = 0
+        for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], stats["buckets"]):
+            cumulative += count
+            lines.append(f'habit_supabase_query_seconds_bucket{{op="{op}",le="{bound}"}} {cumulative}')
+        lines.append(f'habit_supabase_query_seconds_sum{{op="{op}"}} {stats["total_s"]}')
+        lines.append(f'habit_supabase_query_seconds_count{{op="{op}"}} {stats["calls"]}')
+
+    for name, field, help_text in [
+        ("habit_supabase_query_errors_total", "errors", "Llamadas fallidas"),
+        ("habit_supabase_query_rows_total", "rows", "Filas recibidas"),
+        ("habit_supabase_query_bytes_total", "bytes", "Bytes JSON recibidos")
+    ]:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for op, stats in sorted(snapshot.items()):
+            lines.append(f'{name}{{op="{op}"}} {stats[field]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def build_sinks(names: str, prometheus_path: str = None, prometheus_interval: float = 15.0) -> List[MetricsSink]:
+    """
+    Crear los sinks a partir de una lista separada por comas
+
+    Args:
+        names: Ej. "log,prometheus" (HABIT_QUERY_SINKS)
+        prometheus_path: Archivo del sink "prometheus"
+        prometheus_interval: Segundos entre escrituras del archivo
+
+    Returns:
+        Lista de sinks (los nombres desconocidos se ignoran con un aviso)
+    """
+    sinks: List[MetricsSink] = []
+
+    for name in filter(None, (part.strip().lower() for part in (names or "").split(","))):
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "prometheus":
+            sinks.append(PrometheusFileSink(prometheus_path or "habit_tracker.prom", prometheus_interval))
+        else:
+            print(f"Sink de métricas desconocido: {name}")
+
+    return sinks
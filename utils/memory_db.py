@@ -0,0 +1,1260 @@
+"""
+=============================================================================
+BACKEND EN MEMORIA - HABIT TRACKER
+=============================================================================
+Implementación de HabitRepository sin red, para pruebas, benchmarks y
+pruebas de carga:
+
+- tablas en diccionarios (un MemoryStore compartido por las vistas for_user)
+- vistas habit_progress, weekly_summary, activity_habit_matrix y
+  activity_habit_contribution calculadas con utils/views.py
+- el trigger register_session (reparto ponderado a habit_metrics)
+  reproducido con utils/metrics.py en cada inserción de sesiones
+- cada operación simula un round-trip con la latencia configurada y queda
+  registrada en las métricas (query_report) y en la traza del rerun igual
+  que en SupabaseDB
+- el lock del almacén solo se toma para copiar o escribir filas; las vistas
+  y las métricas se calculan fuera de él, y el tiempo y la CPU gastados en
+  el backend se acumulan aparte (usage) para separarlos de los de la app
+
+Uso:
+
+    HABIT_DB_BACKEND=memory HABIT_MEMORY_LATENCY_MS=40 streamlit run main.py
+"""
+
+import copy
+import heapq
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from utils import views
+from utils.cache import ReadCache
+from utils.database import (
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL_SECONDS,
+    METRICS_BATCH_SIZE,
+    PROMETHEUS_FILE,
+    MEASURE_PAYLOAD_BYTES,
+    PROMETHEUS_INTERVAL_SECONDS,
+    QUERY_SINKS,
+    HabitRepository,
+    _log_error,
+    _projection,
+    cached_read,
+    validate_session
+)
+from utils.instrumentation import QueryMetrics, build_sinks, payload_size
+from utils.metrics import compute_habit_metrics
+from utils.schemas import EMBEDS, to_frame
+from utils.tracing import caller_site, current_trace
+
+# Latencia simulada por round-trip (milisegundos) y su variación aleatoria
+MEMORY_LATENCY_MS = float(os.getenv("HABIT_MEMORY_LATENCY_MS", "0"))
+MEMORY_JITTER_MS = float(os.getenv("HABIT_MEMORY_JITTER_MS", "0"))
+
+# Duración de los tokens de las sesiones simuladas
+TOKEN_TTL_SECONDS = 3600
+
+SYSTEM_CATEGORIES = [
+    {"id": 1, "name": "Salud", "color": "#10B981"},
+    {"id": 2, "name": "Aprendizaje", "color": "#3B82F6"},
+    {"id": 3, "name": "Productividad", "color": "#F59E0B"},
+    {"id": 4, "name": "Creatividad", "color": "#8B5CF6"},
+    {"id": 5, "name": "Relaciones", "color": "#EC4899"},
+    {"id": 6, "name": "Finanzas", "color": "#14B8A6"}
+]
+
+METRIC_DEFAULTS = {
+    "total_minutes_invested": 0,
+    "total_sessions": 0,
+    "current_streak": 0,
+    "longest_streak": 0,
+    "completion_percentage": 0.0
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(spec: str) -> List[str]:
+    """Separar una proyección de PostgREST por comas fuera de paréntesis"""
+    parts, depth, current = [], 0, ""
+    for char in spec:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def projected_columns(table: str, columns: str = None) -> Optional[List[str]]:
+    """
+    Columnas planas que devuelve una proyección de PROJECTIONS
+
+    Los embeds (activities!inner(user_id, name)) se traducen a sus columnas
+    aplanadas según EMBEDS (user_id, activity_name).
+
+    Returns:
+        Lista de columnas, o None si la proyección incluye "*"
+    """
+    result = []
+
+    for token in _split_top_level(_projection(table, columns)):
+        if token == "*":
+            return None
+
+        if "(" not in token:
+            result.append(token)
+            continue
+
+        embed = token.split("(")[0].split("!")[0].strip()
+        fields = [field.strip() for field in token[token.index("(") + 1:token.rindex(")")].split(",")]
+        mapping = EMBEDS.get(table, {}).get(embed, {})
+        result.extend(mapping[field] for field in fields if field in mapping)
+
+    return result
+
+
+def _project(rows: List[Dict[str, Any]], columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+    if columns is None:
+        return [dict(row) for row in rows]
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def _frames(snapshot: List[List[Dict[str, Any]]]) -> List[pd.DataFrame]:
+    """DataFrames sin tipar de una copia de MemoryStore.snapshot"""
+    return [pd.DataFrame(rows) for rows in snapshot]
+
+
+class BackendUsage:
+    """
+    Tiempo y CPU gastados dentro del backend (sin la latencia simulada)
+
+    Lo comparten las vistas for_user de un MemoryDB; las pruebas de carga lo
+    restan de la CPU del proceso para reportar la de la app por separado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.seconds = 0.0
+            self.cpu_seconds = 0.0
+
+    def record(self, seconds: float, cpu_seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+            self.cpu_seconds += cpu_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Diccionario con calls, seconds (suma entre hilos, incluye esperas
+            por el lock) y cpu_seconds (CPU de los hilos que llamaron)
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "seconds": round(self.seconds, 3),
+                "cpu_seconds": round(self.cpu_seconds, 3)
+            }
+
+
+# =============================================================================
+# ALMACÉN
+# =============================================================================
+
+class MemoryStore:
+    """
+    Tablas en memoria con índice por usuario dueño (thread-safe con lock)
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Serializa los recálculos de habit_metrics (se calculan sin el lock)
+        self.metrics_lock = threading.Lock()
+
+        self.tables: Dict[str, Dict[Any, Dict[str, Any]]] = {
+            "users": {},
+            "user_categories": {},
+            "habits": {},
+            "activities": {},
+            "habit_activities": {},
+            "sessions": {},
+            "habit_metrics": {}
+        }
+        # {tabla: {user_id: set(pk)}}
+        self.by_user: Dict[str, Dict[str, set]] = {table: {} for table in self.tables}
+        # Sesiones por actividad, para el trigger de métricas
+        self.sessions_by_activity: Dict[str, set] = {}
+
+        self.accounts: Dict[str, Dict[str, Any]] = {}
+        self.tokens: Dict[str, str] = {}
+        self.refresh_tokens: Dict[str, str] = {}
+
+    def owner(self, table: str, row: Dict[str, Any]) -> Optional[str]:
+        """Usuario dueño de una fila (como las políticas RLS)"""
+        if table == "users":
+            return row["id"]
+        if table in ("habits", "activities", "user_categories"):
+            return row["user_id"]
+        if table in ("habit_activities", "sessions"):
+            activity = self.tables["activities"].get(row["activity_id"])
+            return activity["user_id"] if activity else None
+        if table == "habit_metrics":
+            habit = self.tables["habits"].get(row["habit_id"])
+            return habit["user_id"] if habit else None
+        return None
+
+    @staticmethod
+    def primary_key(table: str, row: Dict[str, Any]) -> Any:
+        if table == "habit_activities":
+            return (row["habit_id"], row["activity_id"])
+        if table == "habit_metrics":
+            return row["habit_id"]
+        return row["id"]
+
+    def put(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Insertar o reemplazar una fila (requiere el lock)"""
+        pk = self.primary_key(table, row)
+        owner = self.owner(table, row)
+
+        self.tables[table][pk] = row
+        if owner is not None:
+            self.by_user[table].setdefault(owner, set()).add(pk)
+        if table == "sessions":
+            self.sessions_by_activity.setdefault(row["activity_id"], set()).add(pk)
+
+        return row
+
+    def delete(self, table: str, pk: Any) -> Optional[Dict[str, Any]]:
+        """Eliminar una fila (requiere el lock)"""
+        row = self.tables[table].pop(pk, None)
+        if row is None:
+            return None
+
+        owner = self.owner(table, row)
+        if table in ("habit_activities", "sessions"):
+            # La actividad puede haberse borrado ya: se busca en todos los índices
+            for keys in self.by_user[table].values():
+                keys.discard(pk)
+        elif owner is not None:
+            self.by_user[table].get(owner, set()).discard(pk)
+
+        if table == "sessions":
+            self.sessions_by_activity.get(row["activity_id"], set()).discard(pk)
+
+        return row
+
+    def user_rows(self, table: str, user_id: str) -> List[Dict[str, Any]]:
+        """Filas de una tabla del usuario (requiere el lock)"""
+        rows = self.tables[table]
+        return [rows[pk] for pk in self.by_user[table].get(user_id, ()) if pk in rows]
+
+    def snapshot(self, user_id: str, *tables: str) -> List[List[Dict[str, Any]]]:
+        """
+        Copiar las filas del usuario de varias tablas (requiere el lock)
+
+        Las copias se pueden convertir en DataFrames fuera del lock (_frames)
+        aunque otro hilo modifique las filas originales.
+        """
+        return [[dict(row) for row in self.user_rows(table, user_id)] for table in tables]
+
+
+# =============================================================================
+# BACKEND
+# =============================================================================
+
+class MemoryDB(HabitRepository):
+    """
+    Backend en memoria con la misma interfaz que SupabaseDB
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = None,
+        jitter_ms: float = None,
+        seed: int = None,
+        store: MemoryStore = None,
+        cache: bool = True
+    ):
+        """
+        Args:
+            latency_ms: Latencia simulada por round-trip (default:
+                HABIT_MEMORY_LATENCY_MS)
+            jitter_ms: Variación uniforme ± de la latencia (default:
+                HABIT_MEMORY_JITTER_MS)
+            seed: Semilla del jitter (reproducible)
+            store: Almacén a compartir entre instancias (default: uno nuevo)
+            cache: Usar la caché de lecturas como SupabaseDB
+        """
+        self.latency_ms = MEMORY_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = MEMORY_JITTER_MS if jitter_ms is None else jitter_ms
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+        self.store = store or MemoryStore()
+
+        self._access_token: Optional[str] = None
+        self._user_id: Optional[str] = None
+
+        # Mismas métricas y sinks que SupabaseDB (query_report)
+        self.metrics = QueryMetrics(
+            build_sinks(QUERY_SINKS, PROMETHEUS_FILE, PROMETHEUS_INTERVAL_SECONDS),
+            measure_bytes=MEASURE_PAYLOAD_BYTES
+        )
+        self.cache: Optional[ReadCache] = (
+            ReadCache(CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES) if cache else None
+        )
+        self.mirror = None
+        self.usage = BackendUsage()
+
+    def _simulate_latency(self) -> None:
+        if self.latency_ms <= 0 and self.jitter_ms <= 0:
+            return
+
+        with self._random_lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def _execute(
+        self,
+        action: Callable[[], Any],
+        *key,
+        op: str = None,
+        build: Callable[[Any], Any] = None
+    ) -> Any:
+        """
+        Simular un round-trip: latencia, acción bajo el lock del almacén y
+        registro en métricas y traza
+
+        action solo copia o escribe filas; el trabajo de pandas va en build,
+        fuera del lock, para que los hilos no se serialicen en él. El tiempo
+        y la CPU de action y build se acumulan en usage.
+
+        Args:
+            action: Función sin argumentos que lee/escribe el almacén
+            *key: Petición equivalente en PostgREST ("GET habits") y sus
+                parámetros; identifica los duplicados en la traza
+            op: Nombre de la operación (default: el método que llama)
+            build: Función que recibe el resultado de action y calcula la
+                respuesta sin el lock (opcional)
+
+        Returns:
+            Lo que devuelva build (o action si no hay build)
+        """
+        op = op or sys._getframe(1).f_code.co_name
+        started = time.perf_counter()
+
+        try:
+            self._simulate_latency()
+
+            backend_started, cpu_started = time.perf_counter(), time.thread_time()
+            try:
+                with self.store.lock:
+                    data = action()
+                if build is not None:
+                    data = build(data)
+            finally:
+                self.usage.record(
+                    time.perf_counter() - backend_started,
+                    time.thread_time() - cpu_started
+                )
+        except Exception as e:
+            self._record_call(op, key, time.perf_counter() - started, 0, 0, e)
+            raise
+
+        rows, size = payload_size(data, self.metrics.measures_bytes)
+        self._record_call(op, key, time.perf_counter() - started, rows, size)
+        return data
+
+    def _record_call(
+        self,
+        op: str,
+        key: tuple,
+        seconds: float,
+        rows: int,
+        size: int,
+        error: Exception = None
+    ) -> None:
+        self.metrics.record(op, seconds, rows, size, error)
+
+        trace = current_trace()
+        if trace is not None:
+            # Como query_signature: sin op, la misma petición desde dos
+            # métodos distintos también es un duplicado
+            signature = tuple(repr(value) for value in key)
+            trace.record(op, signature, seconds, rows, error, caller_site())
+
+    def _invalidate(self, user_id: str = None) -> None:
+        user_id = user_id or self._user_id
+
+        if self.cache is None:
+            return
+
+        if user_id:
+            self.cache.invalidate_user(user_id)
+        else:
+            self.cache.clear()
+
+    # =========================================================================
+    # AUTENTICACIÓN
+    # =========================================================================
+
+    def _new_session(self, user_id: str) -> SimpleNamespace:
+        """Emitir tokens para un usuario (requiere el lock)"""
+        access_token = uuid.uuid4().hex
+        refresh_token = uuid.uuid4().hex
+
+        self.store.tokens[access_token] = user_id
+        self.store.refresh_tokens[refresh_token] = user_id
+
+        return SimpleNamespace(
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_at=int(time.time()) + TOKEN_TTL_SECONDS
+        )
+
+    def _user_object(self, user_id: str) -> SimpleNamespace:
+        user = self.store.tables["users"][user_id]
+        return SimpleNamespace(id=user_id, email=user["email"])
+
+    def create_account(self, email: str, password: str, full_name: str = None) -> str:
+        """
+        Crear un usuario directamente (sin round-trip, para generar datos)
+
+        Returns:
+            ID del usuario
+        """
+        with self.store.lock:
+            account = self.store.accounts.get(email.lower())
+            if account is not None:
+                return account["id"]
+
+            user_id = str(uuid.uuid4())
+            self.store.accounts[email.lower()] = {"id": user_id, "password": password}
+            self.store.put("users", {
+                "id": user_id,
+                "email": email,
+                "full_name": full_name,
+                "created_at": _now()
+            })
+            return user_id
+
+    def sign_up(self, email: str, password: str, full_name: str = None) -> Dict[str, Any]:
+        try:
+            def action():
+                if email.lower() in self.store.accounts:
+                    raise ValueError("User already registered")
+                return self.create_account(email, password, full_name)
+
+            user_id = self._execute(action, "POST auth/signup", email)
+
+            with self.store.lock:
+                user = self._user_object(user_id)
+
+            return {"success": True, "user": user, "message": "Usuario registrado exitosamente"}
+        except Exception as e:
+            return {"success": False, "message": f"Error: {str(e)}"}
+
+    def sign_in(self, email: str, password: str) -> Dict[str, Any]:
+        try:
+            def action():
+                account = self.store.accounts.get(email.lower())
+                if account is None or account["password"] != password:
+                    return None
+                return {"user_id": account["id"]}
+
+            result = self._execute(action, "POST auth/token", email)
+            if result is None:
+                return {"success": False, "message": "Error: Invalid login credentials"}
+
+            with self.store.lock:
+                return {
+                    "success": True,
+                    "user": self._user_object(result["user_id"]),
+                    "session": self._new_session(result["user_id"])
+                }
+        except Exception as e:
+            return {"success": False, "message": f"Error: {str(e)}"}
+
+    def refresh_session(self, refresh_token: str) -> Dict[str, Any]:
+        try:
+            user_id = self._execute(
+                lambda: self.store.refresh_tokens.pop(refresh_token, None),
+                "POST auth/token", refresh_token
+            )
+            if user_id is None:
+                return {"success": False, "message": "No se pudo renovar la sesión"}
+
+            with self.store.lock:
+                return {"success": True, "session": self._new_session(user_id)}
+        except Exception as e:
+            return {"success": False, "message": f"Error: {str(e)}"}
+
+    def sign_out(self, access_token: str = None) -> Dict[str, Any]:
+        access_token = access_token or self._access_token
+        if access_token:
+            def action():
+                self.store.tokens.pop(access_token, None)
+
+            self._execute(action, "POST auth/logout", access_token)
+        return {"success": True, "message": "Sesión cerrada"}
+
+    def get_current_user(self) -> Optional[Any]:
+        if not self._access_token:
+            return None
+
+        with self.store.lock:
+            user_id = self.store.tokens.get(self._access_token)
+            return self._user_object(user_id) if user_id else None
+
+    # =========================================================================
+    # CATEGORÍAS
+    # =========================================================================
+
+    def _system_categories(self) -> List[Dict[str, Any]]:
+        return copy.deepcopy(SYSTEM_CATEGORIES)
+
+    def get_categories(self) -> pd.DataFrame:
+        return to_frame("categories", self._system_categories())
+
+    def create_user_category(
+        self,
+        user_id: str,
+        name: str,
+        color: str = "#3B82F6"
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            row = self._execute(lambda: dict(self.store.put("user_categories", {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "name": name.strip(),
+                "color": color,
+                "created_at": _now()
+            })), "POST user_categories", user_id, name)
+            self._invalidate(user_id)
+            return row
+        except Exception as e:
+            _log_error("Error creando categoría", e)
+            return None
+
+    @cached_read()
+    def get_user_categories(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            return self._execute(
+                lambda: _project(
+                    self.store.user_rows("user_categories", user_id),
+                    projected_columns("user_categories")
+                ),
+                "GET user_categories", user_id
+            )
+        except Exception as e:
+            _log_error("Error obteniendo categorías del usuario", e)
+            return None
+
+    # =========================================================================
+    # HÁBITOS/METAS
+    # =========================================================================
+
+    def create_habit(
+        self,
+        user_id: str,
+        name: str,
+        target_minutes_per_week: int = 420,
+        max_minutes_per_week: int = 900,
+        total_hours_goal: int = 100,
+        description: str = None,
+        category_id: int = None
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            if not name or not name.strip():
+                print("Error: El nombre del hábito no puede estar vacío")
+                return None
+
+            now = _now()
+            habit = self._execute(lambda: dict(self.store.put("habits", {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "name": name.strip(),
+                "description": description.strip() if description else None,
+                "category_id": category_id,
+                "target_minutes_per_week": target_minutes_per_week,
+                "max_minutes_per_week": max_minutes_per_week,
+                "total_hours_goal": total_hours_goal,
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now
+            })), "POST habits", user_id, name)
+
+            # Segundo round-trip, como en SupabaseDB
+            self._execute(lambda: dict(self.store.put("habit_metrics", {
+                "habit_id": habit["id"],
+                **METRIC_DEFAULTS,
+                "updated_at": now
+            })), "POST habit_metrics", habit["id"], op="create_habit")
+            self._invalidate(user_id)
+
+            return habit
+        except Exception as e:
+            _log_error("Error creando hábito", e)
+            return None
+
+    @cached_read()
+    def get_user_habits(
+        self,
+        user_id: str,
+        active_only: bool = True,
+        columns: str = None
+    ) -> pd.DataFrame:
+        try:
+            def action():
+                rows = self.store.user_rows("habits", user_id)
+                if active_only:
+                    rows = [row for row in rows if row.get("is_active")]
+                rows = sorted(rows, key=lambda row: row["created_at"], reverse=True)
+                return _project(rows, projected_columns("habits", columns))
+
+            return to_frame("habits", self._execute(action, "GET habits", user_id, active_only, columns))
+        except Exception as e:
+            _log_error("Error obteniendo hábitos", e)
+            return pd.DataFrame()
+
+    def _update(self, table: str, pk: Any, updates: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Actualizar una fila por clave (requiere el lock)"""
+        row = self.store.tables[table].get(pk)
+        if row is None:
+            return []
+        row.update(updates)
+        return [dict(row)]
+
+    def update_habit(self, habit_id: str, updates: Dict[str, Any]) -> bool:
+        try:
+            updates["updated_at"] = _now()
+            rows = self._execute(
+                lambda: self._update("habits", habit_id, updates), "PATCH habits", habit_id, updates
+            )
+            self._invalidate()
+            return bool(rows)
+        except Exception as e:
+            _log_error("Error actualizando hábito", e)
+            return False
+
+    @cached_read()
+    def get_habit_progress(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        try:
+            def build(snapshot):
+                progress = views.habit_progress(*_frames(snapshot))
+                return _project(
+                    self._view_records(progress),
+                    projected_columns("habit_progress", columns)
+                )
+
+            return to_frame("habit_progress", self._execute(
+                lambda: self.store.snapshot(user_id, "habits", "habit_metrics"),
+                "GET habit_progress", user_id, columns,
+                build=build
+            ))
+        except Exception as e:
+            _log_error("Error obteniendo progreso", e)
+            return pd.DataFrame()
+
+    # =========================================================================
+    # ACTIVIDADES
+    # =========================================================================
+
+    def create_activity(
+        self,
+        user_id: str,
+        name: str,
+        category_id: int = None,
+        description: str = None
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            if not name or not name.strip():
+                print("Error: El nombre de la actividad no puede estar vacío")
+                return None
+
+            now = _now()
+            activity = self._execute(lambda: dict(self.store.put("activities", {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "name": name.strip(),
+                "category_id": category_id,
+                "description": description.strip() if description else None,
+                "created_at": now,
+                "updated_at": now
+            })), "POST activities", user_id, name)
+            self._invalidate(user_id)
+            return activity
+        except Exception as e:
+            _log_error("Error creando actividad", e)
+            return None
+
+    @cached_read()
+    def get_user_activities(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        try:
+            def action():
+                rows = sorted(
+                    self.store.user_rows("activities", user_id),
+                    key=lambda row: row["created_at"],
+                    reverse=True
+                )
+                return _project(rows, projected_columns("activities", columns))
+
+            return to_frame("activities", self._execute(action, "GET activities", user_id, columns))
+        except Exception as e:
+            _log_error("Error obteniendo actividades", e)
+            return pd.DataFrame()
+
+    def update_activity(self, activity_id: str, updates: Dict[str, Any]) -> bool:
+        try:
+            updates["updated_at"] = _now()
+            rows = self._execute(
+                lambda: self._update("activities", activity_id, updates),
+                "PATCH activities", activity_id, updates
+            )
+            self._invalidate()
+            return bool(rows)
+        except Exception as e:
+            _log_error("Error actualizando actividad", e)
+            return False
+
+    def delete_activity(self, activity_id: str) -> bool:
+        try:
+            def action():
+                # ON DELETE CASCADE de vínculos y sesiones
+                for pk in [pk for pk in self.store.tables["habit_activities"] if pk[1] == activity_id]:
+                    self.store.delete("habit_activities", pk)
+                for pk in list(self.store.sessions_by_activity.pop(activity_id, ())):
+                    self.store.delete("sessions", pk)
+                self.store.delete("activities", activity_id)
+                return None
+
+            self._execute(action, "DELETE activities", activity_id)
+            self._invalidate()
+            return True
+        except Exception as e:
+            _log_error("Error eliminando actividad", e)
+            return False
+
+    # =========================================================================
+    # VINCULACIÓN HÁBITOS-ACTIVIDADES
+    # =========================================================================
+
+    def _put_link(self, habit_id: str, activity_id: str, weight: float, now: str) -> Dict[str, Any]:
+        existing = self.store.tables["habit_activities"].get((habit_id, activity_id))
+        return dict(self.store.put("habit_activities", {
+            "habit_id": habit_id,
+            "activity_id": activity_id,
+            "weight": float(weight),
+            "created_at": existing["created_at"] if existing else now,
+            "updated_at": now
+        }))
+
+    def link_activity_to_habit(
+        self,
+        habit_id: str,
+        activity_id: str,
+        weight: float = 1.0
+    ) -> bool:
+        try:
+            if weight < 0 or weight > 1:
+                print("Error: El peso debe estar entre 0 y 1")
+                return False
+
+            row = self._execute(
+                lambda: self._put_link(habit_id, activity_id, weight, _now()),
+                "POST habit_activities", habit_id, activity_id, weight
+            )
+            self._invalidate()
+            return bool(row)
+        except Exception as e:
+            _log_error("Error vinculando actividad a hábito", e)
+            return False
+
+    def set_activity_links(self, activity_id: str, links: Dict[str, float]) -> bool:
+        try:
+            if any(weight < 0 or weight > 1 for weight in links.values()):
+                print("Error: El peso debe estar entre 0 y 1")
+                return False
+
+            def action():
+                # Una transacción, como la función SQL set_activity_links
+                now = _now()
+                for pk in [
+                    pk for pk in self.store.tables["habit_activities"]
+                    if pk[1] == activity_id and pk[0] not in links
+                ]:
+                    self.store.delete("habit_activities", pk)
+                for habit_id, weight in links.items():
+                    self._put_link(habit_id, activity_id, weight, now)
+                return None
+
+            self._execute(action, "POST rpc/set_activity_links", activity_id, sorted(links.items()))
+            self._invalidate()
+            return True
+        except Exception as e:
+            _log_error("Error guardando vínculos", e)
+            self._invalidate()
+            return False
+
+    def unlink_activity_from_habit(self, habit_id: str, activity_id: str) -> bool:
+        try:
+            def action():
+                self.store.delete("habit_activities", (habit_id, activity_id))
+
+            self._execute(action, "DELETE habit_activities", habit_id, activity_id)
+            self._invalidate()
+            return True
+        except Exception as e:
+            _log_error("Error desvinculando", e)
+            return False
+
+    def _links_with_names(self, links: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        habits = self.store.tables["habits"]
+        return [
+            {
+                "habit_id": link["habit_id"],
+                "activity_id": link["activity_id"],
+                "weight": link["weight"],
+                "habit_name": habits.get(link["habit_id"], {}).get("name", "Desconocido")
+            }
+            for link in links
+        ]
+
+    @cached_read(user_scoped=False)
+    def get_activity_links(self, activity_id: str) -> pd.DataFrame:
+        try:
+            def action():
+                activity = self.store.tables["activities"].get(activity_id)
+                if activity is None:
+                    return []
+                return self._links_with_names([
+                    link for link in self.store.user_rows("habit_activities", activity["user_id"])
+                    if link["activity_id"] == activity_id
+                ])
+
+            return to_frame("habit_activities", self._execute(action, "GET habit_activities", activity_id))
+        except Exception as e:
+            _log_error("Error obteniendo vínculos", e)
+            return pd.DataFrame()
+
+    @cached_read()
+    def get_user_activity_links(self, user_id: str) -> pd.DataFrame:
+        columns = ["activity_id", "habit_id", "habit_name", "weight"]
+        try:
+            rows = self._execute(
+                lambda: self._links_with_names(self.store.user_rows("habit_activities", user_id)),
+                "GET habit_activities", user_id
+            )
+            if not rows:
+                return pd.DataFrame(columns=columns)
+            return to_frame("habit_activities", rows)[columns]
+        except Exception as e:
+            _log_error("Error obteniendo vínculos del usuario", e)
+            return pd.DataFrame(columns=columns)
+
+    def _view_records(self, view: pd.DataFrame) -> List[Dict[str, Any]]:
+        return json.loads(view.to_json(orient="records", date_format="iso")) if not view.empty else []
+
+    @cached_read()
+    def get_habit_activities_matrix(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        try:
+            def build(snapshot):
+                matrix = views.activity_habit_matrix(*_frames(snapshot))
+                return _project(
+                    self._view_records(matrix),
+                    projected_columns("activity_habit_matrix", columns)
+                )
+
+            return to_frame("activity_habit_matrix", self._execute(
+                lambda: self.store.snapshot(user_id, "activities", "habit_activities", "habits", "sessions"),
+                "GET activity_habit_matrix", user_id, columns,
+                build=build
+            ))
+        except Exception as e:
+            _log_error("Error obteniendo matriz", e)
+            return pd.DataFrame()
+
+    # =========================================================================
+    # SESIONES
+    # =========================================================================
+
+    def _recompute_metrics(self, habit_ids) -> int:
+        """
+        Recalcular habit_metrics de los hábitos dados (sin el lock del almacén)
+
+        Es lo que hacen el trigger register_session y update_habit_metrics
+        en Supabase: minutos ponderados, sesiones, rachas y % del objetivo.
+        Las filas se copian bajo el lock y el cálculo corre fuera de él;
+        metrics_lock serializa los recálculos para que uno con una copia más
+        vieja no pise el resultado de otro más nuevo.
+        """
+        with self.store.metrics_lock:
+            with self.store.lock:
+                habits = self.store.tables["habits"]
+                habit_ids = [habit_id for habit_id in dict.fromkeys(habit_ids) if habit_id in habits]
+                if not habit_ids:
+                    return 0
+
+                wanted = set(habit_ids)
+                links = [
+                    dict(link) for link in self.store.tables["habit_activities"].values()
+                    if link["habit_id"] in wanted
+                ]
+                sessions_table = self.store.tables["sessions"]
+                sessions = [
+                    dict(sessions_table[pk])
+                    for activity_id in {link["activity_id"] for link in links}
+                    for pk in self.store.sessions_by_activity.get(activity_id, ())
+                ]
+                habit_rows = [dict(habits[habit_id]) for habit_id in habit_ids]
+
+            computed = compute_habit_metrics(
+                pd.DataFrame(habit_rows),
+                pd.DataFrame(links),
+                pd.DataFrame(sessions)
+            )
+            rows = json.loads(computed.to_json(orient="records"))
+
+            now = _now()
+            with self.store.lock:
+                for row in rows:
+                    # El hábito pudo borrarse mientras se calculaba
+                    if row["habit_id"] in self.store.tables["habits"]:
+                        self.store.put("habit_metrics", {**row, "updated_at": now})
+
+        return len(habit_ids)
+
+    def _insert_sessions(self, sessions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Insertar sesiones (requiere el lock)
+
+        Returns:
+            Sesiones insertadas y hábitos cuyas métricas hay que recalcular
+            (_metrics_trigger, fuera del lock)
+        """
+        table = self.store.tables["sessions"]
+        now = _now()
+        inserted = []
+
+        # Clave foránea: el lote entero falla antes de insertar nada
+        activities = self.store.tables["activities"]
+        for session in sessions:
+            if session["activity_id"] not in activities:
+                raise ValueError(f"Actividad inexistente: {session['activity_id']}")
+
+        for session in sessions:
+            if session["id"] in table:
+                continue
+            inserted.append(dict(self.store.put("sessions", {**session, "created_at": now})))
+
+        activity_ids = {session["activity_id"] for session in inserted}
+        habit_ids = [
+            link["habit_id"] for link in self.store.tables["habit_activities"].values()
+            if link["activity_id"] in activity_ids and link["weight"] > 0
+        ]
+
+        return inserted, habit_ids
+
+    def _metrics_trigger(self, result: Tuple[List[Dict[str, Any]], List[str]]) -> List[Dict[str, Any]]:
+        """Trigger de métricas de un _insert_sessions (sin el lock); devuelve las sesiones insertadas"""
+        inserted, habit_ids = result
+        self._recompute_metrics(habit_ids)
+        return inserted
+
+    def register_session(
+        self,
+        activity_id: str,
+        duration_minutes: int,
+        session_date: date = None,
+        start_time: str = None,
+        notes: str = None,
+        mood: int = None,
+        productivity_level: int = None
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            error = validate_session(duration_minutes, mood, productivity_level)
+            if error:
+                print(f"Error: {error}")
+                return None
+
+            session = {
+                "id": str(uuid.uuid4()),
+                "activity_id": activity_id,
+                "duration_minutes": duration_minutes,
+                "session_date": (session_date or date.today()).isoformat(),
+                "start_time": start_time,
+                "notes": notes,
+                "mood": mood,
+                "productivity_level": productivity_level
+            }
+
+            inserted = self._execute(
+                lambda: self._insert_sessions([session]), "POST sessions", activity_id, session["id"],
+                build=self._metrics_trigger
+            )
+            self._invalidate()
+            return inserted[0] if inserted else None
+        except Exception as e:
+            _log_error("Error registrando sesión", e)
+            return None
+
+    def insert_sessions_batch(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not sessions:
+            return []
+
+        inserted = self._execute(
+            lambda: self._insert_sessions(sessions),
+            "POST sessions", [session["id"] for session in sessions],
+            build=self._metrics_trigger
+        )
+        self._invalidate()
+        return inserted
+
+    def _user_sessions(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None,
+        before: Tuple[str, str] = None,
+        limit: int = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Sesiones del usuario con activity_name y user_id, más recientes primero
+        (requiere el lock)
+
+        Args:
+            before: Cursor (session_date, id): solo las sesiones anteriores
+            limit: Máximo de sesiones (elige las primeras sin ordenar el resto)
+        """
+        activities = self.store.tables["activities"]
+        start = start_date.isoformat() if start_date else None
+        end = end_date.isoformat() if end_date else None
+
+        sessions = []
+        for session in self.store.user_rows("sessions", user_id):
+            if start and session["session_date"] < start:
+                continue
+            if end and session["session_date"] > end:
+                continue
+            if before and (session["session_date"], session["id"]) >= before:
+                continue
+            sessions.append(session)
+
+        def session_key(session):
+            return (session["session_date"], session["id"])
+
+        if limit is None:
+            sessions.sort(key=session_key, reverse=True)
+        else:
+            sessions = heapq.nlargest(limit, sessions, key=session_key)
+
+        return [
+            {
+                **session,
+                "user_id": user_id,
+                "activity_name": activities.get(session["activity_id"], {}).get("name")
+            }
+            for session in sessions
+        ]
+
+    @cached_read()
+    def get_user_sessions(
+        self,
+        user_id: str,
+        limit: int = 100,
+        start_date: date = None,
+        end_date: date = None,
+        columns: str = None
+    ) -> pd.DataFrame:
+        try:
+            rows = self._execute(
+                lambda: _project(
+                    self._user_sessions(user_id, start_date, end_date, limit=limit),
+                    projected_columns("sessions", columns)
+                ),
+                "GET sessions", user_id, limit, start_date, end_date, columns
+            )
+            return to_frame("sessions", rows)
+        except Exception as e:
+            _log_error("Error obteniendo sesiones", e)
+            return pd.DataFrame()
+
+    def iter_user_sessions(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None,
+        page_size: int = 1000,
+        as_records: bool = False,
+        columns: str = None
+    ) -> Iterator[Any]:
+        projection = projected_columns("sessions", columns)
+        cursor = None
+
+        while True:
+            try:
+                rows = self._execute(
+                    lambda: _project(
+                        self._user_sessions(
+                            user_id, start_date, end_date, before=cursor, limit=page_size
+                        ),
+                        projection
+                    ),
+                    "GET sessions", user_id, start_date, end_date, cursor, page_size, columns
+                )
+            except Exception as e:
+                _log_error("Error obteniendo página de sesiones", e)
+                raise
+
+            if not rows:
+                return
+
+            yield rows if as_records else to_frame("sessions", rows)
+
+            if len(rows) < page_size:
+                return
+
+            cursor = (rows[-1]["session_date"], rows[-1]["id"])
+
+    @cached_read()
+    def get_activity_contribution(self, user_id: str) -> pd.DataFrame:
+        try:
+            return to_frame("activity_habit_contribution", self._execute(
+                lambda: self.store.snapshot(user_id, "activities", "habit_activities", "habits", "sessions"),
+                "GET activity_habit_contribution", user_id,
+                build=lambda snapshot: self._view_records(
+                    views.activity_habit_contribution(*_frames(snapshot))
+                )
+            ))
+        except Exception as e:
+            _log_error("Error obteniendo contribuciones", e)
+            return pd.DataFrame()
+
+    # =========================================================================
+    # MÉTRICAS Y ESTADÍSTICAS
+    # =========================================================================
+
+    @cached_read()
+    def get_weekly_summary(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        try:
+            def build(snapshot):
+                summary = views.weekly_summary(*_frames(snapshot))
+                return _project(
+                    self._view_records(summary),
+                    projected_columns("weekly_summary", columns)
+                )
+
+            return to_frame("weekly_summary", self._execute(
+                lambda: self.store.snapshot(user_id, "habits", "habit_activities", "sessions"),
+                "GET weekly_summary", user_id, columns,
+                build=build
+            ))
+        except Exception as e:
+            _log_error("Error obteniendo resumen semanal", e)
+            return pd.DataFrame()
+
+    @cached_read(user_scoped=False)
+    def get_habit_metrics(self, habit_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            rows = self._execute(
+                lambda: _project(
+                    [row for row in [self.store.tables["habit_metrics"].get(habit_id)] if row],
+                    projected_columns("habit_metrics")
+                ),
+                "GET habit_metrics", habit_id
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            _log_error("Error obteniendo métricas", e)
+            return None
+
+    @cached_read()
+    def get_user_habit_metrics(self, user_id: str) -> pd.DataFrame:
+        try:
+            rows = self._execute(
+                lambda: _project(
+                    self.store.user_rows("habit_metrics", user_id),
+                    projected_columns("habit_metrics")
+                ),
+                "GET habit_metrics", user_id
+            )
+            return to_frame("habit_metrics", rows)
+        except Exception as e:
+            _log_error("Error obteniendo métricas del usuario", e)
+            return pd.DataFrame()
+
+    def upsert_habit_metrics(self, metrics: List[Dict[str, Any]]) -> bool:
+        if not metrics:
+            return True
+
+        try:
+            def action():
+                now = _now()
+                for row in metrics:
+                    existing = self.store.tables["habit_metrics"].get(row["habit_id"], {})
+                    self.store.put("habit_metrics", {**existing, **row, "updated_at": now})
+                return None
+
+            self._execute(action, "POST habit_metrics", [row["habit_id"] for row in metrics])
+            self._invalidate()
+            return True
+        except Exception as e:
+            _log_error("Error guardando métricas", e)
+            return False
+
+    def update_habit_metrics(self, habit_id: str) -> bool:
+        try:
+            self._execute(
+                lambda: [habit_id], "POST rpc/update_habit_metrics", habit_id,
+                build=self._recompute_metrics
+            )
+            self._invalidate()
+            return True
+        except Exception as e:
+            _log_error("Error actualizando métricas", e)
+            return False
+
+    def update_habit_metrics_batch(
+        self,
+        habit_ids: List[str],
+        chunk_size: int = METRICS_BATCH_SIZE
+    ) -> int:
+        habit_ids = list(dict.fromkeys(habit_ids))
+        updated = 0
+
+        for start in range(0, len(habit_ids), chunk_size):
+            chunk = habit_ids[start:start + chunk_size]
+            try:
+                updated += self._execute(
+                    lambda: chunk, "POST rpc/update_habit_metrics_batch", chunk,
+                    build=self._recompute_metrics
+                )
+            except Exception as e:
+                _log_error("Error actualizando métricas en lote", e)
+
+        self._invalidate()
+        return updated
@@ -0,0 +1,338 @@
+"""
+=============================================================================
+MOTOR DE MÉTRICAS LOCAL - HABIT TRACKER
+=============================================================================
+Calcula en una sola pasada vectorizada las métricas de todos los hábitos de
+un usuario (lo mismo que el trigger register_session y la función
+update_habit_metrics calculan en Supabase hábito por hábito):
+
+- minutos y sesiones: matriz de pesos actividad×hábito por los totales de
+  cada actividad
+- rachas: días consecutivos con al menos una sesión que contribuye
+
+Sirve para verificar la tabla habit_metrics o reconstruirla sin una llamada
+RPC por hábito. Uso desde la línea de comandos:
+
+    python -m utils.metrics --email usuario@correo.com [--backfill]
+"""
+
+import argparse
+import getpass
+import json
+import os
+import sys
+from datetime import date
+from typing import Dict
+import numpy as np
+import pandas as pd
+
+from utils.database import sign_in_user_db
+from utils.schemas import coerce
+from utils.views import METRIC_COLUMNS, with_columns
+
+# Diferencia máxima aceptada al comparar métricas con decimales
+DEFAULT_TOLERANCE = 0.5
+
+
+def weight_matrix(links: pd.DataFrame, habit_ids) -> pd.DataFrame:
+    """
+    Matriz de pesos actividad×hábito a partir de habit_activities
+
+    Args:
+        links: Vínculos (activity_id, habit_id, weight)
+        habit_ids: Columnas de la matriz (hábitos sin vínculos quedan en 0)
+
+    Returns:
+        DataFrame con índice activity_id, columnas habit_id y el peso
+    """
+    links = with_columns(links, ["activity_id", "habit_id", "weight"])
+    links = links[links["weight"].astype(float) > 0]
+
+    if links.empty:
+        return pd.DataFrame(
+            0.0,
+            index=pd.Index([], name="activity_id"),
+            columns=list(habit_ids)
+        )
+
+    matrix = links.pivot_table(
+        index="activity_id",
+        columns="habit_id",
+        values="weight",
+        aggfunc="sum",
+        fill_value=0.0
+    )
+    return matrix.reindex(columns=list(habit_ids), fill_value=0.0).astype(float)
+
+
+def _streaks(
+    links: pd.DataFrame,
+    sessions: pd.DataFrame,
+    today: date
+) -> pd.DataFrame:
+    """
+    Racha actual y más larga de cada hábito
+
+    La racha actual es la última serie de días consecutivos si termina hoy o
+    ayer; si no, 0.
+
+    Returns:
+        DataFrame con índice habit_id y columnas current_streak, longest_streak
+    """
+    days = sessions[["activity_id", "session_date"]].merge(
+        links[["activity_id", "habit_id"]],
+        on="activity_id",
+        how="inner"
+    )
+    if days.empty:
+        return pd.DataFrame(columns=["current_streak", "longest_streak"])
+
+    # Días como enteros para detectar huecos con diff()
+    day_numbers = pd.to_datetime(days["session_date"]).dt.normalize()
+    days = pd.DataFrame({
+        "habit_id": days["habit_id"].astype(str),
+        "day": (day_numbers - pd.Timestamp("1970-01-01")).dt.days
+    }).drop_duplicates().sort_values(["habit_id", "day"])
+
+    new_run = (days["habit_id"] != days["habit_id"].shift()) | (days["day"].diff() != 1)
+    runs = days.assign(run=new_run.cumsum()).groupby("run").agg(
+        habit_id=("habit_id", "first"),
+        length=("day", "size"),
+        last_day=("day", "max")
+    )
+
+    by_habit = runs.groupby("habit_id")
+    longest = by_habit["length"].max()
+
+    last_runs = runs.loc[by_habit["last_day"].idxmax()].set_index("habit_id")
+    today_number = (pd.Timestamp(today) - pd.Timestamp("1970-01-01")).days
+    current = last_runs["length"].where(last_runs["last_day"] >= today_number - 1, 0)
+
+    return pd.DataFrame({"current_streak": current, "longest_streak": longest})
+
+
+def compute_habit_metrics(
+    habits: pd.DataFrame,
+    links: pd.DataFrame,
+    sessions: pd.DataFrame,
+    today: date = None
+) -> pd.DataFrame:
+    """
+    Calcular las métricas de todos los hábitos en una pasada
+
+    Args:
+        habits: Hábitos (id, total_hours_goal)
+        links: Vínculos habit_activities (activity_id, habit_id, weight)
+        sessions: Sesiones (id, activity_id, session_date, duration_minutes)
+        today: Fecha de referencia para la racha actual (default: hoy)
+
+    Returns:
+        DataFrame con habit_id y las columnas de habit_metrics
+    """
+    habits = with_columns(habits, ["id", "total_hours_goal"])
+    sessions = with_columns(sessions, ["id", "activity_id", "session_date", "duration_minutes"])
+    links = with_columns(links, ["activity_id", "habit_id", "weight"])
+
+    habit_ids = habits["id"].astype(str).tolist()
+    weights = weight_matrix(links, habit_ids)
+
+    # Totales por actividad, alineados con las filas de la matriz
+    per_activity = sessions.groupby("activity_id").agg(
+        minutes=("duration_minutes", "sum"),
+        sessions=("id", "count")
+    ).reindex(weights.index, fill_value=0)
+
+    matrix = weights.to_numpy()
+    minutes = matrix.T @ per_activity["minutes"].to_numpy(dtype=float)
+    counts = (matrix > 0).T @ per_activity["sessions"].to_numpy(dtype=float)
+
+    metrics = pd.DataFrame({
+        "habit_id": habit_ids,
+        "total_minutes_invested": minutes,
+        "total_sessions": counts.astype(int)
+    })
+
+    linked = links[links["weight"].astype(float) > 0]
+    streaks = _streaks(linked, sessions, today or date.today())
+    metrics = metrics.join(streaks, on="habit_id")
+    metrics[["current_streak", "longest_streak"]] = (
+        metrics[["current_streak", "longest_streak"]].fillna(0).astype(int)
+    )
+
+    goal_minutes = pd.to_numeric(habits["total_hours_goal"], errors="coerce").fillna(0).to_numpy() * 60
+    with np.errstate(divide="ignore", invalid="ignore"):
+        completion = np.where(goal_minutes > 0, minutes / goal_minutes * 100, 0.0)
+    metrics["completion_percentage"] = np.clip(completion, 0.0, 100.0).round(2)
+
+    return coerce("habit_metrics", metrics[["habit_id"] + METRIC_COLUMNS])
+
+
+def compare_metrics(
+    computed: pd.DataFrame,
+    stored: pd.DataFrame,
+    tolerance: float = DEFAULT_TOLERANCE
+) -> pd.DataFrame:
+    """
+    Comparar métricas calculadas con las guardadas en habit_metrics
+
+    Args:
+        computed: Resultado de compute_habit_metrics
+        stored: Filas de habit_metrics
+        tolerance: Diferencia máxima aceptada por columna
+
+    Returns:
+        DataFrame con habit_id, columnas *_stored y *_computed y
+        "mismatch" (columnas que difieren, "missing" si no hay fila guardada)
+        solo para los hábitos que no coinciden
+    """
+    stored = with_columns(stored, ["habit_id"] + METRIC_COLUMNS)
+
+    merged = computed.merge(
+        stored[["habit_id"] + METRIC_COLUMNS],
+        on="habit_id",
+        how="left",
+        suffixes=("_computed", "_stored"),
+        indicator=True
+    )
+
+    mismatch = pd.Series("", index=merged.index)
+    for column in METRIC_COLUMNS:
+        difference = (
+            pd.to_numeric(merged[f"{column}_computed"], errors="coerce").astype(float)
+            - pd.to_numeric(merged[f"{column}_stored"], errors="coerce").astype(float)
+        ).abs()
+        differs = ~(difference <= tolerance)
+        mismatch = mismatch.mask(differs, mismatch + column + ", ")
+
+    mismatch = mismatch.str.rstrip(", ")
+    mismatch = mismatch.mask(merged["_merge"] == "left_only", "missing")
+    merged["mismatch"] = mismatch
+
+    return merged[merged["mismatch"] != ""].drop(columns=["_merge"]).reset_index(drop=True)
+
+
+# =============================================================================
+# CON SUPABASEDB
+# =============================================================================
+
+def load_metric_inputs(db, user_id: str) -> Dict[str, pd.DataFrame]:
+    """
+    Leer lo necesario para calcular las métricas de un usuario
+
+    Args:
+        db: SupabaseDB ligado al usuario (for_user)
+        user_id: ID del usuario
+
+    Returns:
+        Diccionario con habits, links y sessions (todas las sesiones)
+    """
+    data = db.fetch_many(
+        habits=("get_user_habits", user_id, {"active_only": False, "columns": "goals"}),
+        links=("get_user_activity_links", user_id)
+    )
+
+    pages = list(db.iter_user_sessions(user_id, columns="metrics"))
+    data["sessions"] = pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+    return data
+
+
+def compute_user_metrics(db, user_id: str, today: date = None) -> pd.DataFrame:
+    """Calcular las métricas de todos los hábitos de un usuario"""
+    data = load_metric_inputs(db, user_id)
+    return compute_habit_metrics(data["habits"], data["links"], data["sessions"], today)
+
+
+def verify_user_metrics(
+    db,
+    user_id: str,
+    tolerance: float = DEFAULT_TOLERANCE
+) -> pd.DataFrame:
+    """
+    Verificar habit_metrics de un usuario contra el cálculo local
+
+    Returns:
+        Hábitos cuyas métricas guardadas no coinciden (ver compare_metrics)
+    """
+    return compare_metrics(
+        compute_user_metrics(db, user_id),
+        db.get_user_habit_metrics(user_id),
+        tolerance
+    )
+
+
+def backfill_user_metrics(db, user_id: str, only_mismatched: bool = True) -> int:
+    """
+    Reescribir habit_metrics con el cálculo local
+
+    Args:
+        db: SupabaseDB ligado al usuario (for_user)
+        user_id: ID del usuario
+        only_mismatched: Escribir solo los hábitos que no coinciden
+
+    Returns:
+        Número de hábitos escritos (0 si falló la escritura)
+    """
+    computed = compute_user_metrics(db, user_id)
+
+    if only_mismatched:
+        mismatched = compare_metrics(computed, db.get_user_habit_metrics(user_id))
+        computed = computed[computed["habit_id"].isin(mismatched["habit_id"])]
+
+    if computed.empty:
+        return 0
+
+    # to_json convierte NA en null y los enteros de numpy en int
+    rows = json.loads(computed.to_json(orient="records"))
+
+    return len(rows) if db.upsert_habit_metrics(rows) else 0
+
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verificar o reconstruir habit_metrics")
+    parser.add_argument("--email", required=True, help="Email del usuario")
+    parser.add_argument("--backfill", action="store_true", help="Reescribir las métricas que no coinciden")
+    parser.add_argument("--all", action="store_true", help="Con --backfill, reescribir todos los hábitos")
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Recalcular todos los hábitos en Supabase (update_habit_metrics_batch)"
+    )
+    args = parser.parse_args(argv)
+
+    password = os.getenv("HABIT_CLI_PASSWORD") or getpass.getpass("Contraseña: ")
+
+    auth = sign_in_user_db(args.email, password)
+    if not auth["success"]:
+        print(f"❌ {auth['message']}", file=sys.stderr)
+        return 1
+
+    if args.server:
+        habits = auth["db"].get_user_habits(auth["user_id"], active_only=False, columns="goals")
+        ids = habits["id"].tolist() if not habits.empty else []
+        updated = auth["db"].update_habit_metrics_batch(ids)
+        print(f"✅ {updated} hábitos recalculados en Supabase")
+        return 0
+
+    if args.backfill:
+        written = backfill_user_metrics(auth["db"], auth["user_id"], only_mismatched=not args.all)
+        print(f"✅ {written} hábitos actualizados")
+        return 0
+
+    mismatched = verify_user_metrics(auth["db"], auth["user_id"])
+    if mismatched.empty:
+        print("✅ Todas las métricas coinciden")
+        return 0
+
+    print(f"⚠️ {len(mismatched)} hábitos con métricas distintas:")
+    for _, row in mismatched.iterrows():
+        print(f"  {row['habit_id']}: {row['mismatch']}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,525 @@
+"""
+=============================================================================
+ESPEJO LOCAL (SQLITE) - HABIT TRACKER
+=============================================================================
+Copia local de habits, activities, habit_activities, sessions y
+habit_metrics de cada usuario, sincronizada de forma incremental con
+Supabase. SupabaseDB lee de aquí cuando HABIT_MIRROR_PATH está configurado;
+las escrituras siguen yendo a Supabase y marcan el espejo para re-sincronizar.
+
+Cada usuario se sincroniza con su propio lock y las descargas se hacen sin
+el lock de SQLite: la sincronización de un usuario no frena a los demás.
+Las sesiones editadas se detectan por updated_at (sql/sessions_updated_at.sql).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Optional, List, Dict, Any
+import pandas as pd
+
+from utils import views
+from utils.schemas import coerce
+
+# Filas por página al descargar cambios
+SYNC_PAGE_SIZE = 1000
+
+# Cómo se sincroniza cada tabla: columnas de cursor (None = copia completa)
+# y select con el embed necesario para filtrar por usuario
+MIRRORED_TABLES: Dict[str, Dict[str, Any]] = {
+    "habits": {
+        "select": "*",
+        "user_filter": "user_id",
+        "cursor": ("updated_at", "created_at")
+    },
+    "activities": {
+        "select": "*",
+        "user_filter": "user_id",
+        "cursor": ("updated_at", "created_at")
+    },
+    "habit_activities": {
+        "select": "*, activities!inner(user_id)",
+        "user_filter": "activities.user_id",
+        "cursor": ("updated_at", "created_at")
+    },
+    "sessions": {
+        "select": "*, activities!inner(user_id, name)",
+        "user_filter": "activities.user_id",
+        "cursor": ("updated_at", "created_at")
+    },
+    "habit_metrics": {
+        "select": "*, habits!inner(user_id)",
+        "user_filter": "habits.user_id",
+        "cursor": None
+    }
+}
+
+
+def _primary_key_columns(table: str) -> tuple:
+    """Columnas de la clave primaria de una tabla del espejo"""
+    if table == "habit_activities":
+        return ("habit_id", "activity_id")
+    if table == "habit_metrics":
+        return ("habit_id",)
+    return ("id",)
+
+
+def _primary_key(table: str, row: Dict[str, Any]) -> str:
+    """Clave primaria de una fila del espejo"""
+    return ":".join(str(row[column]) for column in _primary_key_columns(table))
+
+
+def _row_cursor(row: Dict[str, Any], columns: tuple) -> str:
+    """Mayor valor de las columnas de cursor de una fila"""
+    return max((str(row.get(column) or "") for column in columns), default="")
+
+
+class LocalMirror:
+    """
+    Espejo SQLite (un archivo por despliegue) de los datos de cada usuario
+    """
+
+    def __init__(self, path: str, max_age_seconds: float = 30.0):
+        """
+        Args:
+            path: Ruta del archivo SQLite
+            max_age_seconds: Antigüedad máxima antes de volver a sincronizar
+        """
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS mirror_rows (
+                tbl TEXT NOT NULL,
+                pk TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (tbl, pk)
+            );
+            CREATE INDEX IF NOT EXISTS mirror_rows_user
+                ON mirror_rows (user_id, tbl);
+            CREATE TABLE IF NOT EXISTS mirror_cursors (
+                user_id TEXT NOT NULL,
+                tbl TEXT NOT NULL,
+                cursor TEXT NOT NULL,
+                PRIMARY KEY (user_id, tbl)
+            );
+            CREATE TEMP TABLE IF NOT EXISTS mirror_valid_keys (
+                tbl TEXT NOT NULL,
+                pk TEXT NOT NULL,
+                PRIMARY KEY (tbl, pk)
+            );
+        """)
+        self._conn.commit()
+
+        self._synced_at: Dict[str, float] = {}
+        self._stale: set = set()
+        self._frames: Dict[tuple, pd.DataFrame] = {}
+        # Sube con cada sincronización: un DataFrame leído antes no se memoiza
+        self._generations: Dict[str, int] = {}
+
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._user_locks_guard = threading.Lock()
+
+    # =========================================================================
+    # SINCRONIZACIÓN
+    # =========================================================================
+
+    def is_ready(self, db, user_id: str) -> bool:
+        """
+        Sincronizar si hace falta e indicar si el espejo puede responder
+
+        Si la sincronización falla (p. ej. Supabase caído) se sigue sirviendo
+        lo último descargado.
+
+        Args:
+            db: SupabaseDB ligado al usuario (for_user)
+            user_id: ID del usuario
+
+        Returns:
+            True si el usuario tiene datos sincronizados alguna vez
+        """
+        with self._lock:
+            synced_at = self._synced_at.get(user_id)
+            fresh = (
+                synced_at is not None
+                and user_id not in self._stale
+                and time.monotonic() - synced_at < self.max_age_seconds
+            )
+
+        if not fresh:
+            try:
+                self.sync_user(db, user_id)
+            except Exception as e:
+                # Import diferido: utils.database importa este módulo
+                from utils.database import _log_error
+                _log_error("Error sincronizando espejo local", e)
+
+        return self._has_cursor(user_id)
+
+    def mark_stale(self, user_id: str = None) -> None:
+        """Forzar re-sincronización en la próxima lectura (todos si user_id es None)"""
+        with self._lock:
+            if user_id is None:
+                self._stale.update(self._synced_at.keys())
+            else:
+                self._stale.add(user_id)
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._user_locks_guard:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def sync_user(self, db, user_id: str) -> Dict[str, int]:
+        """
+        Descargar los cambios de un usuario desde el último cursor
+
+        Las descargas se hacen solo con el lock del usuario; el lock de
+        SQLite se toma al final para guardar todo en una transacción.
+
+        Args:
+            db: SupabaseDB ligado al usuario (for_user)
+            user_id: ID del usuario
+
+        Returns:
+            Diccionario {tabla: filas descargadas}
+        """
+        with self._user_lock(user_id):
+            with self._lock:
+                # Se marca antes de descargar para no perder escrituras concurrentes
+                self._stale.discard(user_id)
+                cursors = {
+                    table: self._get_cursor(user_id, table) if spec["cursor"] else None
+                    for table, spec in MIRRORED_TABLES.items()
+                }
+
+            try:
+                pulled = {
+                    table: self._fetch_table(db, user_id, table, spec, cursors[table])
+                    for table, spec in MIRRORED_TABLES.items()
+                }
+                valid_keys = self._fetch_keys(db, user_id)
+            except Exception:
+                with self._lock:
+                    self._stale.add(user_id)
+                raise
+
+            with self._lock:
+                try:
+                    for table, spec in MIRRORED_TABLES.items():
+                        self._store_table(user_id, table, spec, pulled[table], cursors[table])
+
+                    self._reconcile_deletes(user_id, valid_keys)
+                    self._conn.commit()
+                except Exception:
+                    # Sin escrituras a medias: se conserva la última copia completa
+                    self._conn.rollback()
+                    self._stale.add(user_id)
+                    raise
+
+                self._frames = {
+                    key: frame for key, frame in self._frames.items() if key[0] != user_id
+                }
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+                self._synced_at[user_id] = time.monotonic()
+
+        return {table: len(rows) for table, rows in pulled.items()}
+
+    def _fetch_table(
+        self,
+        db,
+        user_id: str,
+        table: str,
+        spec: Dict[str, Any],
+        cursor: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Descargar por páginas las filas nuevas o modificadas de una tabla (sin el lock)"""
+        cursor_columns = spec["cursor"]
+        rows: List[Dict[str, Any]] = []
+
+        while True:
+            query = db.supabase.table(table).select(spec["select"]).eq(
+                spec["user_filter"], user_id
+            )
+
+            if cursor:
+                query = query.or_(",".join(
+                    f'{column}.gte."{cursor}"' for column in cursor_columns
+                ))
+
+            # Orden total para paginar por OFFSET: una carga masiva deja
+            # muchas filas con el mismo created_at, y sin desempate PostgreSQL
+            # puede ordenarlas distinto en cada página y saltarse algunas
+            order_columns = (cursor_columns[-1],) if cursor_columns else ()
+            for column in order_columns + _primary_key_columns(table):
+                query = query.order(column)
+            query = query.range(len(rows), len(rows) + SYNC_PAGE_SIZE - 1)
+
+            page = db._execute(query, op=f"mirror_sync_{table}").data or []
+            rows.extend(page)
+
+            if len(page) < SYNC_PAGE_SIZE:
+                return rows
+
+    def _store_table(
+        self,
+        user_id: str,
+        table: str,
+        spec: Dict[str, Any],
+        rows: List[Dict[str, Any]],
+        cursor: Optional[str]
+    ) -> None:
+        """Guardar las filas descargadas y el nuevo cursor (requiere el lock)"""
+        cursor_columns = spec["cursor"]
+
+        if cursor_columns is None:
+            # Copia completa (tabla pequeña: una fila por hábito)
+            self._conn.execute(
+                "DELETE FROM mirror_rows WHERE tbl = ? AND user_id = ?", (table, user_id)
+            )
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO mirror_rows (tbl, pk, user_id, data) VALUES (?, ?, ?, ?)",
+            [
+                (table, _primary_key(table, row), user_id, json.dumps(row, default=str))
+                for row in rows
+            ]
+        )
+
+        new_cursor = cursor or ""
+        if cursor_columns:
+            for row in rows:
+                new_cursor = max(new_cursor, _row_cursor(row, cursor_columns))
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO mirror_cursors (user_id, tbl, cursor) VALUES (?, ?, ?)",
+            (user_id, table, new_cursor)
+        )
+
+    def _fetch_keys(self, db, user_id: str) -> Dict[str, set]:
+        """
+        Claves vigentes de actividades y vínculos (sin el lock)
+
+        Los cursores no ven borrados (actividades y vínculos se borran de
+        verdad), así que se comparan solo las claves, que es una consulta liviana.
+        """
+        activity_ids = {
+            str(row["id"]) for row in db._execute(
+                db.supabase.table("activities").select("id").eq("user_id", user_id),
+                op="mirror_sync_keys"
+            ).data or []
+        }
+        link_keys = {
+            _primary_key("habit_activities", row) for row in db._execute(
+                db.supabase.table("habit_activities").select(
+                    "habit_id, activity_id, activities!inner(user_id)"
+                ).eq("activities.user_id", user_id),
+                op="mirror_sync_keys"
+            ).data or []
+        }
+        return {"activities": activity_ids, "habit_activities": link_keys}
+
+    def _reconcile_deletes(self, user_id: str, valid_keys: Dict[str, set]) -> None:
+        """Quitar del espejo lo borrado en Supabase, en SQL (requiere el lock)"""
+        self._conn.execute("DELETE FROM mirror_valid_keys")
+        self._conn.executemany(
+            "INSERT INTO mirror_valid_keys (tbl, pk) VALUES (?, ?)",
+            [(table, pk) for table, keys in valid_keys.items() for pk in keys]
+        )
+
+        for table in valid_keys:
+            self._conn.execute(
+                """
+                DELETE FROM mirror_rows
+                WHERE tbl = ? AND user_id = ?
+                  AND pk NOT IN (SELECT pk FROM mirror_valid_keys WHERE tbl = ?)
+                """,
+                (table, user_id, table)
+            )
+
+        # Las sesiones de actividades borradas se eliminan en cascada
+        self._conn.execute(
+            """
+            DELETE FROM mirror_rows
+            WHERE tbl = 'sessions' AND user_id = ?
+              AND json_extract(data, '$.activity_id') NOT IN (
+                  SELECT pk FROM mirror_valid_keys WHERE tbl = 'activities'
+              )
+            """,
+            (user_id,)
+        )
+
+    def _get_cursor(self, user_id: str, table: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT cursor FROM mirror_cursors WHERE user_id = ? AND tbl = ?", (user_id, table)
+        ).fetchone()
+        return row[0] if row and row[0] else None
+
+    def _has_cursor(self, user_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM mirror_cursors WHERE user_id = ? LIMIT 1", (user_id,)
+            ).fetchone()
+            return row is not None
+
+    # =========================================================================
+    # LECTURA
+    # =========================================================================
+
+    def _load(self, table: str, user_id: str) -> List[Dict[str, Any]]:
+        """Filas de una tabla del usuario"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM mirror_rows WHERE tbl = ? AND user_id = ?", (table, user_id)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def _frame(self, table: str, user_id: str) -> pd.DataFrame:
+        """DataFrame de una tabla del usuario (memoizado hasta la próxima sincronización)"""
+        key = (user_id, table)
+
+        with self._lock:
+            frame = self._frames.get(key)
+            generation = self._generations.get(user_id, 0)
+
+        if frame is None:
+            frame = pd.DataFrame(self._load(table, user_id))
+
+            # Si hubo una sincronización mientras se leía, no se memoiza
+            with self._lock:
+                if self._generations.get(user_id, 0) == generation:
+                    self._frames[key] = frame
+
+        return frame.copy()
+
+    def get_user_habits(self, user_id: str, active_only: bool = True, columns: str = None) -> pd.DataFrame:
+        habits = self._frame("habits", user_id)
+        if habits.empty:
+            return habits
+        if active_only:
+            habits = habits[habits["is_active"] == True]
+        return coerce("habits", habits.sort_values("created_at", ascending=False).reset_index(drop=True))
+
+    def get_user_activities(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        activities = self._frame("activities", user_id)
+        if activities.empty:
+            return activities
+        return coerce(
+            "activities",
+            activities.sort_values("created_at", ascending=False).reset_index(drop=True)
+        )
+
+    def get_user_activity_links(self, user_id: str) -> pd.DataFrame:
+        links = self._frame("habit_activities", user_id)
+        columns = ["activity_id", "habit_id", "habit_name", "weight"]
+        if links.empty:
+            return pd.DataFrame(columns=columns)
+
+        names = self._frame("habits", user_id)
+        names = dict(zip(names["id"], names["name"])) if not names.empty else {}
+        links["habit_name"] = links["habit_id"].map(names).fillna("Desconocido")
+        return coerce("habit_activities", links[columns])
+
+    def get_activity_links(self, activity_id: str, user_id: str = None) -> pd.DataFrame:
+        links = self._frame("habit_activities", user_id)
+        if links.empty:
+            return links
+
+        links = links[links["activity_id"] == activity_id].reset_index(drop=True)
+        names = self._frame("habits", user_id)
+        names = dict(zip(names["id"], names["name"])) if not names.empty else {}
+        links["habit_name"] = links["habit_id"].map(names)
+        return coerce("habit_activities", links)
+
+    def get_user_sessions(
+        self,
+        user_id: str,
+        limit: int = 100,
+        start_date: date = None,
+        end_date: date = None,
+        columns: str = None
+    ) -> pd.DataFrame:
+        sessions = self._sessions_in_range(user_id, start_date, end_date)
+        if sessions.empty:
+            return sessions
+        return coerce("sessions", sessions.head(limit).reset_index(drop=True))
+
+    def _sessions_in_range(self, user_id: str, start_date: date, end_date: date) -> pd.DataFrame:
+        sessions = self._frame("sessions", user_id)
+        if sessions.empty:
+            return sessions
+
+        if start_date:
+            sessions = sessions[sessions["session_date"] >= start_date.isoformat()]
+        if end_date:
+            sessions = sessions[sessions["session_date"] <= end_date.isoformat()]
+
+        return sessions.sort_values(["session_date", "id"], ascending=False)
+
+    def get_user_session_stats(
+        self,
+        user_id: str,
+        start_date: date = None,
+        end_date: date = None
+    ) -> Dict[str, Any]:
+        sessions = self._sessions_in_range(user_id, start_date, end_date)
+        total_sessions = len(sessions)
+        total_minutes = int(sessions["duration_minutes"].sum()) if total_sessions else 0
+        moods = sessions["mood"].dropna() if total_sessions and "mood" in sessions else pd.Series(dtype=float)
+
+        return {
+            "total_sessions": total_sessions,
+            "total_minutes": total_minutes,
+            "avg_minutes": total_minutes / total_sessions if total_sessions else 0,
+            "avg_mood": float(moods.mean()) if not moods.empty else None
+        }
+
+    def get_habit_metrics(self, habit_id: str, user_id: str = None) -> Optional[Dict[str, Any]]:
+        metrics = self._frame("habit_metrics", user_id)
+        if metrics.empty:
+            return None
+
+        rows = metrics[metrics["habit_id"] == habit_id]
+        if rows.empty:
+            return None
+
+        return rows.drop(columns=["habits"], errors="ignore").iloc[0].to_dict()
+
+    def get_user_habit_metrics(self, user_id: str) -> pd.DataFrame:
+        return coerce("habit_metrics", self._frame("habit_metrics", user_id))
+
+    def get_habit_progress(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        return coerce("habit_progress", views.habit_progress(
+            self._frame("habits", user_id),
+            self._frame("habit_metrics", user_id)
+        ))
+
+    def get_weekly_summary(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        return coerce("weekly_summary", views.weekly_summary(
+            self._frame("habits", user_id),
+            self._frame("habit_activities", user_id),
+            self._frame("sessions", user_id)
+        ))
+
+    def get_habit_activities_matrix(self, user_id: str, columns: str = None) -> pd.DataFrame:
+        return coerce("activity_habit_matrix", views.activity_habit_matrix(
+            self._frame("activities", user_id),
+            self._frame("habit_activities", user_id),
+            self._frame("habits", user_id),
+            self._frame("sessions", user_id)
+        ))
+
+    def get_activity_contribution(self, user_id: str) -> pd.DataFrame:
+        return coerce("activity_habit_contribution", views.activity_habit_contribution(
+            self._frame("activities", user_id),
+            self._frame("habit_activities", user_id),
+            self._frame("habits", user_id),
+            self._frame("sessions", user_id)
+        ))
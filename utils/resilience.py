@@ -0,0 +1,185 @@
+"""
+=============================================================================
+RESILIENCIA DE LA CAPA DE DATOS - HABIT TRACKER
+=============================================================================
+Errores tipados, backoff con jitter y circuit breaker para las peticiones a
+Supabase (ver SupabaseDB._execute). El tiempo máximo por petición lo aplica
+el cliente httpx compartido (ver get_http_client).
+"""
+
+import random
+import threading
+import time
+from typing import Optional
+import httpx
+
+
+# =============================================================================
+# ERRORES
+# =============================================================================
+
+class DataLayerError(Exception):
+    """
+    Error de la capa de datos que las páginas pueden mostrar
+
+    Attributes:
+        message: Descripción de la operación que falló
+        cause: Excepción original (si la hay)
+        served_stale: True si en su lugar se devolvieron datos cacheados
+    """
+
+    user_message = "⚠️ No se pudieron cargar algunos datos."
+
+    def __init__(self, message: str, cause: Exception = None):
+        super().__init__(f"{message}: {cause}" if cause else message)
+        self.message = message
+        self.cause = cause
+        self.served_stale = False
+
+    def display_message(self) -> str:
+        """Texto para mostrar en la página"""
+        if self.served_stale:
+            return f"{self.user_message} Mostrando los últimos datos disponibles."
+        return self.user_message
+
+
+class DataTimeoutError(DataLayerError):
+    """La petición superó el tiempo máximo"""
+
+    user_message = "⏱️ Supabase está tardando demasiado en responder."
+
+
+class DataUnavailableError(DataLayerError):
+    """Supabase no responde (circuit breaker abierto o error de red)"""
+
+    user_message = "🔌 No hay conexión con la base de datos en este momento."
+
+
+class DataQueryError(DataLayerError):
+    """Supabase respondió con un error (permisos, datos inválidos, ...)"""
+
+    user_message = "❌ La base de datos rechazó la operación."
+
+
+class DataAuthError(DataQueryError):
+    """Supabase rechazó el JWT (caducado o inválido)"""
+
+    user_message = "🔑 Tu sesión expiró. Vuelve a iniciar sesión."
+
+
+# Códigos de PostgREST para un JWT caducado o inválido (y el status HTTP
+# que postgrest-py pone como código cuando la respuesta no es JSON)
+AUTH_ERROR_CODES = {"401", "PGRST301", "PGRST302", "PGRST303"}
+
+
+def as_data_error(message: str, error: Exception) -> DataLayerError:
+    """
+    Convertir cualquier excepción de la capa de datos en un error tipado
+
+    Args:
+        message: Descripción de la operación que falló
+        error: Excepción capturada
+
+    Returns:
+        DataLayerError del tipo que corresponde a la causa
+    """
+    if isinstance(error, DataLayerError):
+        return type(error)(message, error)
+
+    if isinstance(error, httpx.TimeoutException):
+        return DataTimeoutError(message, error)
+
+    if isinstance(error, httpx.TransportError):
+        return DataUnavailableError(message, error)
+
+    if str(getattr(error, "code", None)) in AUTH_ERROR_CODES:
+        return DataAuthError(message, error)
+
+    return DataQueryError(message, error)
+
+
+# =============================================================================
+# REINTENTOS
+# =============================================================================
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Espera antes del reintento número attempt (backoff exponencial con
+    jitter completo)
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitBreaker:
+    """
+    Circuit breaker thread-safe (cerrado → abierto → semiabierto)
+
+    Tras failure_threshold fallos seguidos se abre y rechaza llamadas durante
+    reset_timeout segundos; luego deja pasar una de prueba y se cierra si
+    sale bien.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: Fallos consecutivos para abrir el circuito
+            reset_timeout: Segundos abierto antes de probar de nuevo
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" o "half_open\""""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Indicar si se puede hacer una llamada ahora"""
+        with self._lock:
+            state = self._state()
+
+            if state == "closed":
+                return True
+
+            if state == "half_open" and not self._probing:
+                # Solo una llamada de prueba a la vez
+                self._probing = True
+                return True
+
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self) -> None:
+        """La llamada no llegó a Supabase: no cuenta como fallo ni como éxito"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
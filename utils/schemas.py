@@ -0,0 +1,236 @@
+"""
+=============================================================================
+ESQUEMAS DE DATAFRAMES - HABIT TRACKER
+=============================================================================
+Tipos declarados de cada tabla/vista y aplanado de los recursos embebidos
+(activities, habits) para que todas las lecturas devuelvan DataFrames
+tipados una sola vez, al obtener los datos:
+
+- fechas como datetime64 (sin pd.to_datetime en cada página)
+- nombres repetidos (activity_name, habit_name) como category
+- mood/productividad y minutos como enteros con nulos (Int8/Int32)
+- los embeds pasan a columnas (activities.name -> activity_name)
+"""
+
+from typing import Any, Dict, List, Optional
+import pandas as pd
+
+# =============================================================================
+# TIPOS POR TABLA / VISTA
+# =============================================================================
+# Solo se convierten las columnas presentes (cada lectura pide su proyección).
+# Los textos libres (description, notes) quedan como object para que None
+# siga siendo falsy en las páginas. Los conteos que las vistas siempre
+# devuelven usan int32 sin nulos (mejor soporte en Plotly); si llega un nulo
+# la conversión falla y la columna se deja como está.
+
+_TIMESTAMPS = {
+    "created_at": "datetime",
+    "updated_at": "datetime"
+}
+
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "categories": {
+        "id": "string",
+        "name": "string",
+        "color": "string"
+    },
+    "user_categories": {
+        "id": "string",
+        "user_id": "string",
+        "name": "string",
+        "color": "string",
+        **_TIMESTAMPS
+    },
+    "habits": {
+        "id": "string",
+        "user_id": "string",
+        "category_id": "string",
+        "name": "string",
+        "target_minutes_per_week": "Int32",
+        "max_minutes_per_week": "Int32",
+        "total_hours_goal": "Int32",
+        "is_active": "boolean",
+        **_TIMESTAMPS
+    },
+    "activities": {
+        "id": "string",
+        "user_id": "string",
+        "category_id": "string",
+        "name": "string",
+        **_TIMESTAMPS
+    },
+    "habit_activities": {
+        "habit_id": "string",
+        "activity_id": "string",
+        "user_id": "string",
+        "habit_name": "category",
+        "weight": "float64",
+        **_TIMESTAMPS
+    },
+    "sessions": {
+        "id": "string",
+        "activity_id": "string",
+        "user_id": "string",
+        "activity_name": "category",
+        "session_date": "date",
+        "start_time": "string",
+        "duration_minutes": "Int32",
+        "mood": "Int8",
+        "productivity_level": "Int8",
+        **_TIMESTAMPS
+    },
+    "habit_metrics": {
+        "habit_id": "string",
+        "total_minutes_invested": "float64",
+        "total_sessions": "int32",
+        "current_streak": "int32",
+        "longest_streak": "int32",
+        "completion_percentage": "float64",
+        "last_session_date": "date",
+        **_TIMESTAMPS
+    },
+    "habit_progress": {
+        "id": "string",
+        "user_id": "string",
+        "name": "string",
+        "target_minutes_per_week": "Int32",
+        "max_minutes_per_week": "Int32",
+        "total_hours_goal": "Int32",
+        "is_active": "boolean",
+        "total_minutes_invested": "float64",
+        "total_sessions": "int32",
+        "current_streak": "int32",
+        "longest_streak": "int32",
+        "completion_percentage": "float64"
+    },
+    "weekly_summary": {
+        "habit_id": "string",
+        "user_id": "string",
+        "name": "string",
+        "target_minutes_per_week": "Int32",
+        "max_minutes_per_week": "Int32",
+        "minutes_this_week": "float64"
+    },
+    "activity_habit_matrix": {
+        "id": "string",
+        "user_id": "string",
+        "activity_name": "string",
+        "number_of_habits": "int32",
+        "benefited_habits": "string",
+        "total_sessions": "int32",
+        "total_minutes": "float64"
+    },
+    "activity_habit_contribution": {
+        "session_id": "string",
+        "session_date": "date",
+        "activity_id": "string",
+        "activity_name": "category",
+        "habit_id": "string",
+        "habit_name": "category",
+        "duration_minutes": "Int32",
+        "weight": "float64",
+        "contributed_minutes": "float64"
+    }
+}
+
+# Recursos embebidos por PostgREST: columna del embed -> {campo: columna plana}
+EMBEDS: Dict[str, Dict[str, Dict[str, str]]] = {
+    "sessions": {
+        "activities": {"name": "activity_name", "user_id": "user_id"}
+    },
+    "habit_activities": {
+        "habits": {"name": "habit_name"},
+        "activities": {"user_id": "user_id"}
+    },
+    "habit_metrics": {
+        "habits": {}
+    }
+}
+
+
+# =============================================================================
+# CONVERSIÓN
+# =============================================================================
+
+def flatten_embeds(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pasar los recursos embebidos (dicts) a columnas planas
+
+    Args:
+        table: Nombre de la tabla o vista
+        df: DataFrame con columnas de embed
+
+    Returns:
+        DataFrame sin columnas de embed
+    """
+    for embed, fields in EMBEDS.get(table, {}).items():
+        if embed not in df.columns:
+            continue
+
+        embedded = [value if isinstance(value, dict) else {} for value in df[embed]]
+
+        for field, column in fields.items():
+            if column not in df.columns:
+                df[column] = [value.get(field) for value in embedded]
+
+        df = df.drop(columns=[embed])
+
+    return df
+
+
+def _coerce_column(series: pd.Series, dtype: str) -> pd.Series:
+    if dtype == "datetime":
+        return pd.to_datetime(series, utc=True, errors="coerce", format="ISO8601")
+
+    if dtype == "date":
+        return pd.to_datetime(series, errors="coerce", format="ISO8601").dt.normalize()
+
+    if dtype in ("string", "category", "boolean"):
+        return series.astype(dtype)
+
+    return pd.to_numeric(series, errors="coerce").astype(dtype)
+
+
+def coerce(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplanar embeds y aplicar los tipos declarados de una tabla/vista
+
+    Args:
+        table: Nombre de la tabla o vista (clave de SCHEMAS)
+        df: DataFrame tal como llega de Supabase o del espejo (se modifica)
+
+    Returns:
+        DataFrame tipado (las columnas no declaradas quedan igual)
+    """
+    df = flatten_embeds(table, df)
+
+    for column, dtype in SCHEMAS.get(table, {}).items():
+        if column not in df.columns:
+            continue
+
+        try:
+            df[column] = _coerce_column(df[column], dtype)
+        except (TypeError, ValueError):
+            # Valor inesperado (p. ej. decimales en una columna entera):
+            # se deja la columna como llegó en lugar de fallar la lectura
+            pass
+
+    return df
+
+
+def to_frame(table: str, rows: Optional[List[Dict[str, Any]]]) -> pd.DataFrame:
+    """
+    Construir el DataFrame tipado de una respuesta
+
+    Args:
+        table: Nombre de la tabla o vista (clave de SCHEMAS)
+        rows: Registros de response.data
+
+    Returns:
+        DataFrame tipado, o vacío si no hay filas
+    """
+    if not rows:
+        return pd.DataFrame()
+
+    return coerce(table, pd.DataFrame(rows))
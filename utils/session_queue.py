@@ -0,0 +1,415 @@
+"""
+=============================================================================
+COLA DE ESCRITURA DE SESIONES (WRITE-BEHIND) - HABIT TRACKER
+=============================================================================
+Acepta sesiones al instante, las guarda en un journal en disco y un hilo de
+fondo las inserta en Supabase por lotes, con reintentos y backoff.
+
+El journal solo guarda el user_id de cada sesión, nunca tokens: el JWT para
+insertar se toma del último SupabaseDB del usuario visto por la cola (bind),
+así que tras un reinicio, o si el JWT caduca, las sesiones esperan hasta que
+el usuario vuelve.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Optional, List, Dict, Any
+
+from utils.database import validate_session
+from utils.resilience import DataAuthError, DataQueryError, as_data_error
+
+# Configuración por defecto
+JOURNAL_PATH = os.getenv("HABIT_SESSION_JOURNAL", ".habit_tracker/session_journal.jsonl")
+BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 300.0
+
+# El journal solo crece (cambios y lápidas al final); se compacta cuando
+# tiene más de COMPACT_MIN_LINES líneas y COMPACT_RATIO veces las entradas vivas
+COMPACT_MIN_LINES = 1000
+COMPACT_RATIO = 4
+
+_queue_lock = threading.Lock()
+_shared_queue: Optional["SessionWriteQueue"] = None
+
+
+def get_session_queue() -> "SessionWriteQueue":
+    """Obtener la cola de sesiones compartida del proceso"""
+    global _shared_queue
+
+    if _shared_queue is None:
+        with _queue_lock:
+            if _shared_queue is None:
+                _shared_queue = SessionWriteQueue(JOURNAL_PATH)
+
+    return _shared_queue
+
+
+class SessionWriteQueue:
+    """
+    Cola durable de sesiones pendientes de insertar en Supabase
+    """
+
+    def __init__(
+        self,
+        journal_path: str,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        max_attempts: int = MAX_ATTEMPTS
+    ):
+        """
+        Args:
+            journal_path: Archivo JSONL donde se persisten las entradas
+            batch_size: Sesiones máximas por insert
+            flush_interval: Segundos entre vaciados del hilo de fondo
+            max_attempts: Intentos antes de marcar una sesión como fallida
+        """
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dbs: Dict[str, Any] = {}
+        self._worker: Optional[threading.Thread] = None
+        self._journal_lines = 0
+
+        directory = os.path.dirname(journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._load_journal()
+
+    # =========================================================================
+    # JOURNAL
+    # =========================================================================
+
+    def _load_journal(self) -> None:
+        """Recuperar las entradas pendientes/fallidas de una ejecución anterior"""
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                line = line.strip()
+                if not line:
+                    continue
+                self._journal_lines += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea cortada por un apagado a mitad de escritura
+                    continue
+
+                # Lápida: la sesión ya se insertó
+                if record.get("done"):
+                    self._entries.pop(record["id"], None)
+                    continue
+
+                # Cada registro reemplaza al anterior de la misma sesión
+                record["next_attempt"] = 0.0
+                self._entries[record["session"]["id"]] = record
+
+    def _append_journal(self, records: List[Dict[str, Any]]) -> None:
+        """Añadir registros al final del journal y forzarlos a disco (un fsync)"""
+        if not records:
+            return
+
+        with open(self.journal_path, "a", encoding="utf-8") as journal:
+            for record in records:
+                journal.write(json.dumps(record) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        self._journal_lines += len(records)
+
+    def _compact_journal(self) -> None:
+        """Reescribir el journal si acumula demasiados registros obsoletos"""
+        if self._journal_lines > max(COMPACT_MIN_LINES, COMPACT_RATIO * len(self._entries)):
+            self._rewrite_journal()
+
+    def _rewrite_journal(self) -> None:
+        """Reescribir el journal con las entradas actuales (atómico)"""
+        tmp_path = f"{self.journal_path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as journal:
+            for entry in self._entries.values():
+                journal.write(json.dumps(self._journal_record(entry)) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        os.replace(tmp_path, self.journal_path)
+        self._journal_lines = len(self._entries)
+
+    @staticmethod
+    def _journal_record(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "user_id": entry["user_id"],
+            "session": entry["session"],
+            "attempts": entry["attempts"],
+            "status": entry["status"],
+            "last_error": entry.get("last_error")
+        }
+
+    # =========================================================================
+    # API
+    # =========================================================================
+
+    def bind(self, db, user_id: str) -> None:
+        """
+        Registrar el SupabaseDB (con JWT vigente) con el que insertar las
+        sesiones de un usuario
+
+        Args:
+            db: SupabaseDB ligado al usuario (for_user)
+            user_id: ID del usuario
+        """
+        with self._lock:
+            self._dbs[user_id] = db
+
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def enqueue(
+        self,
+        db,
+        user_id: str,
+        activity_id: str,
+        duration_minutes: int,
+        session_date: date = None,
+        start_time: str = None,
+        notes: str = None,
+        mood: int = None,
+        productivity_level: int = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Aceptar una sesión: se persiste en el journal y se inserta en segundo plano
+
+        Args:
+            db: SupabaseDB ligado al usuario (for_user)
+            user_id: ID del usuario
+            (resto: ver SupabaseDB.register_session)
+
+        Returns:
+            Diccionario con la sesión encolada o None si no es válida
+        """
+        error = validate_session(duration_minutes, mood, productivity_level)
+        if error:
+            print(f"Error: {error}")
+            return None
+
+        session = {
+            "id": str(uuid.uuid4()),
+            "activity_id": activity_id,
+            "duration_minutes": duration_minutes,
+            "session_date": (session_date or date.today()).isoformat(),
+            "start_time": start_time,
+            "notes": notes,
+            "mood": mood,
+            "productivity_level": productivity_level
+        }
+        entry = {
+            "user_id": user_id,
+            "session": session,
+            "attempts": 0,
+            "status": "pending",
+            "next_attempt": 0.0
+        }
+
+        with self._lock:
+            self._append_journal([self._journal_record(entry)])
+            self._entries[session["id"]] = entry
+            self._dbs[user_id] = db
+
+        self._ensure_worker()
+        self._wakeup.set()
+        return session
+
+    def stats(self, user_id: str = None) -> Dict[str, int]:
+        """
+        Contar sesiones pendientes y fallidas
+
+        Args:
+            user_id: Filtrar por usuario (opcional)
+
+        Returns:
+            Diccionario con pending y failed
+        """
+        with self._lock:
+            entries = [
+                entry for entry in self._entries.values()
+                if user_id is None or entry["user_id"] == user_id
+            ]
+
+        return {
+            "pending": sum(1 for entry in entries if entry["status"] == "pending"),
+            "failed": sum(1 for entry in entries if entry["status"] == "failed")
+        }
+
+    def failed_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        """Sesiones fallidas de un usuario, con el último error"""
+        with self._lock:
+            return [
+                {**entry["session"], "last_error": entry.get("last_error")}
+                for entry in self._entries.values()
+                if entry["user_id"] == user_id and entry["status"] == "failed"
+            ]
+
+    def retry_failed(self, user_id: str) -> int:
+        """
+        Volver a encolar las sesiones fallidas de un usuario
+
+        Returns:
+            Número de sesiones reintentadas
+        """
+        with self._lock:
+            retried = [
+                entry for entry in self._entries.values()
+                if entry["user_id"] == user_id and entry["status"] == "failed"
+            ]
+            for entry in retried:
+                entry["status"] = "pending"
+                entry["attempts"] = 0
+                entry["next_attempt"] = 0.0
+
+            self._append_journal([self._journal_record(entry) for entry in retried])
+            self._compact_journal()
+
+        self._ensure_worker()
+        self._wakeup.set()
+        return len(retried)
+
+    # =========================================================================
+    # VACIADO EN SEGUNDO PLANO
+    # =========================================================================
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="session-write-behind",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error vaciando cola de sesiones: {e}")
+
+    def flush(self) -> int:
+        """
+        Insertar por lotes las sesiones pendientes listas para (re)intentar
+
+        Returns:
+            Número de sesiones insertadas en esta pasada
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            ready: Dict[str, List[Dict[str, Any]]] = {}
+            for entry in self._entries.values():
+                if (
+                    entry["status"] == "pending"
+                    and entry["next_attempt"] <= now
+                    and entry["user_id"] in self._dbs
+                ):
+                    ready.setdefault(entry["user_id"], []).append(entry)
+            dbs = dict(self._dbs)
+
+        flushed = 0
+
+        for user_id, entries in ready.items():
+            for start in range(0, len(entries), self.batch_size):
+                # El JWT caducó en un lote anterior: esperar al próximo bind
+                with self._lock:
+                    if self._dbs.get(user_id) is not dbs[user_id]:
+                        break
+
+                batch = entries[start:start + self.batch_size]
+                flushed += self._flush_batch(dbs[user_id], batch)
+
+        return flushed
+
+    def _flush_batch(self, db, batch: List[Dict[str, Any]]) -> int:
+        """
+        Insertar un lote
+
+        Los timeouts y errores de red se reintentan con backoff. Si Supabase
+        rechaza el lote (DataQueryError), se parte en dos hasta aislar las
+        sesiones inválidas, que se marcan como fallidas sin reintentos; el
+        resto del lote se inserta. Si rechaza el JWT (DataAuthError), el lote
+        sigue pendiente sin gastar intentos hasta que bind aporte uno nuevo.
+
+        Returns:
+            Número de sesiones insertadas
+        """
+        try:
+            db.insert_sessions_batch([entry["session"] for entry in batch])
+        except Exception as e:
+            error = as_data_error("Insertar sesiones", e)
+
+            if isinstance(error, DataAuthError):
+                self._await_rebind(db, batch, e)
+                return 0
+
+            if isinstance(error, DataQueryError) and len(batch) > 1:
+                middle = len(batch) // 2
+                return self._flush_batch(db, batch[:middle]) + self._flush_batch(db, batch[middle:])
+
+            self._record_failure(batch, e, retry=not isinstance(error, DataQueryError))
+            return 0
+
+        with self._lock:
+            for entry in batch:
+                self._entries.pop(entry["session"]["id"], None)
+            self._append_journal([{"id": entry["session"]["id"], "done": True} for entry in batch])
+            self._compact_journal()
+
+        return len(batch)
+
+    def _await_rebind(self, db, batch: List[Dict[str, Any]], error: Exception) -> None:
+        """Soltar el SupabaseDB con el JWT caducado; el lote espera al próximo bind"""
+        user_id = batch[0]["user_id"]
+
+        with self._lock:
+            if self._dbs.get(user_id) is db:
+                del self._dbs[user_id]
+
+            for entry in batch:
+                entry["last_error"] = str(error)
+
+    def _record_failure(self, batch: List[Dict[str, Any]], error: Exception, retry: bool) -> None:
+        """Anotar un intento fallido; programar el reintento con backoff o marcar como fallida"""
+        with self._lock:
+            for entry in batch:
+                entry["attempts"] += 1
+                entry["last_error"] = str(error)
+
+                if not retry or entry["attempts"] >= self.max_attempts:
+                    entry["status"] = "failed"
+                else:
+                    # Backoff exponencial con jitter completo
+                    delay = min(
+                        BACKOFF_MAX_SECONDS,
+                        BACKOFF_BASE_SECONDS * 2 ** entry["attempts"]
+                    )
+                    entry["next_attempt"] = time.monotonic() + random.uniform(0, delay)
+
+            self._append_journal([self._journal_record(entry) for entry in batch])
+            self._compact_journal()
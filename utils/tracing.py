@@ -0,0 +1,322 @@
+"""
+=============================================================================
+TRAZA DE CONSULTAS POR RERUN - HABIT TRACKER
+=============================================================================
+Registra cada round-trip a Supabase hecho durante una ejecución del script
+(un rerun de Streamlit), con la página y la línea que lo originó, y marca
+las consultas repetidas dentro del mismo rerun (N+1, lecturas duplicadas).
+
+Con HABIT_TRACE_QUERIES=1, get_user_db abre una traza por rerun y al
+empezar la siguiente registra el resumen de la anterior (logger
+"habit_tracker.trace"); last_trace(página) devuelve la última de cada una.
+
+En pruebas (también junta los reruns de esa página que empiecen en otros
+hilos mientras dura el bloque, como los de AppTest):
+
+    with trace_queries("01_Dashboard") as trace:
+        ...  # código que usa SupabaseDB, o AppTest.from_file(...).run()
+    trace.assert_budget(3)
+"""
+
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+# Carpeta de la capa de datos: sus frames no cuentan como "quien llama"
+_UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_DIR = os.path.dirname(_UTILS_DIR)
+
+_current_trace: contextvars.ContextVar[Optional["QueryTrace"]] = contextvars.ContextVar(
+    "habit_query_trace", default=None
+)
+_call_site: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "habit_query_call_site", default=None
+)
+
+_last_traces_lock = threading.Lock()
+_last_traces: Dict[str, "QueryTrace"] = {}
+# Trazas abiertas con trace_queries: begin_rerun de esa página las reutiliza
+_pinned_traces: Dict[str, "QueryTrace"] = {}
+
+logger = logging.getLogger("habit_tracker.trace")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Un rerun hizo más round-trips (o duplicados) de los permitidos"""
+
+
+class QueryTrace:
+    """
+    Round-trips de un rerun (thread-safe: fetch_many registra desde su pool)
+    """
+
+    def __init__(self, page: str):
+        """
+        Args:
+            page: Nombre de la página (p. ej. "01_Dashboard" o "main")
+        """
+        self.page = page
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._seen: Dict[tuple, int] = {}
+
+    def record(
+        self,
+        op: str,
+        signature: tuple,
+        seconds: float,
+        rows: int,
+        error: Optional[Exception],
+        caller: Optional[str]
+    ) -> None:
+        """
+        Registrar un round-trip
+
+        Args:
+            op: Método de SupabaseDB
+            signature: Identifica la petición (método HTTP, ruta, parámetros,
+                cuerpo); dos iguales en un rerun son duplicadas
+            seconds: Tiempo de la llamada
+            rows: Filas recibidas
+            error: Excepción si falló
+            caller: "archivo:línea" de la página que originó la llamada
+        """
+        with self._lock:
+            previous = self._seen.get(signature, 0)
+            self._seen[signature] = previous + 1
+
+            self._records.append({
+                "op": op,
+                "caller": caller or "?",
+                "ms": round(seconds * 1000, 1),
+                "rows": rows,
+                "error": type(error).__name__ if error is not None else None,
+                "duplicate": previous > 0
+            })
+
+    @property
+    def round_trips(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+    @property
+    def duplicates(self) -> int:
+        with self._lock:
+            return sum(record["duplicate"] for record in self._records)
+
+    def records(self) -> pd.DataFrame:
+        """Round-trips en orden: op, caller, ms, rows, error, duplicate"""
+        with self._lock:
+            return pd.DataFrame(
+                list(self._records),
+                columns=["op", "caller", "ms", "rows", "error", "duplicate"]
+            )
+
+    def report(self) -> pd.DataFrame:
+        """
+        Round-trips agrupados por método y línea
+
+        Returns:
+            DataFrame con op, caller, calls, duplicates, total_ms y rows,
+            ordenado de más a menos llamadas
+        """
+        records = self.records()
+
+        if records.empty:
+            return pd.DataFrame(columns=["op", "caller", "calls", "duplicates", "total_ms", "rows"])
+
+        report = records.groupby(["op", "caller"], as_index=False).agg(
+            calls=("op", "size"),
+            duplicates=("duplicate", "sum"),
+            total_ms=("ms", "sum"),
+            rows=("rows", "sum")
+        )
+        return report.sort_values(["calls", "total_ms"], ascending=False).reset_index(drop=True)
+
+    def summary(self) -> str:
+        """Resumen de una línea"""
+        with self._lock:
+            total_ms = sum(record["ms"] for record in self._records)
+
+        return (
+            f"{self.page}: {self.round_trips} round-trips, "
+            f"{self.duplicates} duplicados, {total_ms:.0f} ms"
+        )
+
+    def assert_budget(self, max_round_trips: int, max_duplicates: int = 0) -> None:
+        """
+        Fallar si el rerun superó el presupuesto de round-trips
+
+        Args:
+            max_round_trips: Round-trips permitidos
+            max_duplicates: Consultas repetidas permitidas
+
+        Raises:
+            QueryBudgetExceeded: Con el reporte por método y línea
+        """
+        if self.round_trips <= max_round_trips and self.duplicates <= max_duplicates:
+            return
+
+        raise QueryBudgetExceeded(
+            f"{self.summary()} (presupuesto: {max_round_trips} round-trips, "
+            f"{max_duplicates} duplicados)\n{self.report().to_string(index=False)}"
+        )
+
+
+# =============================================================================
+# CONTEXTO
+# =============================================================================
+
+def current_trace() -> Optional[QueryTrace]:
+    """Traza activa en este contexto (None si no se está trazando)"""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_queries(page: str) -> Iterator[QueryTrace]:
+    """
+    Trazar los round-trips hechos dentro del bloque
+
+    Los reruns de la página que empiecen en otros hilos mientras dura el
+    bloque (begin_rerun) se registran en la misma traza.
+
+    Args:
+        page: Nombre de la página (el de page_name)
+
+    Yields:
+        QueryTrace que se llena mientras dura el bloque
+    """
+    trace = QueryTrace(page)
+    token = _current_trace.set(trace)
+
+    with _last_traces_lock:
+        previous = _pinned_traces.get(page)
+        _pinned_traces[page] = trace
+
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+        with _last_traces_lock:
+            if previous is None:
+                _pinned_traces.pop(page, None)
+            else:
+                _pinned_traces[page] = previous
+
+
+def begin_rerun(page: str) -> QueryTrace:
+    """
+    Empezar la traza de un rerun de Streamlit
+
+    No hay un punto fijo donde termina el script, así que la traza queda
+    activa hasta el siguiente begin_rerun del mismo hilo; ahí se registra el
+    resumen de la anterior.
+
+    Args:
+        page: Página que se está ejecutando
+
+    Returns:
+        La nueva traza (también disponible con last_trace), o la abierta
+        con trace_queries para esa página
+    """
+    previous = _current_trace.get()
+    if previous is not None:
+        logger.info(previous.summary())
+
+    with _last_traces_lock:
+        trace = _pinned_traces.get(page) or QueryTrace(page)
+        _last_traces[page] = trace
+
+    _current_trace.set(trace)
+
+    return trace
+
+
+def last_trace(page: str) -> Optional[QueryTrace]:
+    """Última traza de rerun de una página (begin_rerun)"""
+    with _last_traces_lock:
+        return _last_traces.get(page)
+
+
+def page_name(filename: str) -> str:
+    """Nombre de página a partir del archivo del script"""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+# =============================================================================
+# ORIGEN DE LAS LLAMADAS
+# =============================================================================
+
+def caller_site(skip: int = 1) -> Optional[str]:
+    """
+    Primer frame fuera de utils/ dentro del repositorio ("archivo:línea")
+
+    Args:
+        skip: Frames a saltar desde quien llama
+
+    Returns:
+        Ubicación en la página, el valor fijado por run_at_site, o None
+    """
+    site = _call_site.get()
+    if site is not None:
+        return site
+
+    frame = sys._getframe(skip)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+
+        if not filename.startswith(_UTILS_DIR):
+            if filename.startswith(_REPO_DIR):
+                return f"{os.path.relpath(filename, _REPO_DIR)}:{frame.f_lineno}"
+            return None
+
+        frame = frame.f_back
+
+    return None
+
+
+def run_at_site(site: Optional[str], func: Callable, *args, **kwargs) -> Any:
+    """
+    Ejecutar func atribuyendo sus llamadas a site (para hilos de un pool,
+    cuyo stack no llega a la página). Usar dentro de un contexto copiado.
+    """
+    if site is not None:
+        _call_site.set(site)
+    return func(*args, **kwargs)
+
+
+def request_config(query: Any) -> Any:
+    """
+    Petición HTTP que ejecutará un request builder de postgrest
+
+    postgrest 2.x guarda método, ruta, cabeceras, parámetros y cuerpo en
+    query.request; las versiones anteriores los tenían en el propio builder.
+    """
+    return getattr(query, "request", query)
+
+
+def query_signature(query: Any) -> Tuple:
+    """
+    Identificador de una petición de postgrest para detectar duplicados
+
+    No incluye el método de SupabaseDB que la hizo: la misma petición desde
+    dos métodos distintos también es un duplicado.
+    """
+    request = request_config(query)
+    body = getattr(request, "json", None)
+    return (
+        getattr(request, "http_method", None),
+        str(getattr(request, "path", "")),
+        str(getattr(request, "params", "")),
+        repr(body) if body is not None else None
+    )
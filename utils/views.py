@@ -0,0 +1,203 @@
+"""
+=============================================================================
+VISTAS EN PANDAS - HABIT TRACKER
+=============================================================================
+Reproduce en memoria las vistas SQL de Supabase (habit_progress,
+weekly_summary, activity_habit_matrix, activity_habit_contribution) a partir
+de las tablas, para los backends que no consultan PostgREST
+"""
+
+from datetime import date
+from typing import Optional
+import pandas as pd
+
+from utils.helpers import get_week_boundaries
+
+METRIC_COLUMNS = [
+    "total_minutes_invested",
+    "total_sessions",
+    "current_streak",
+    "longest_streak",
+    "completion_percentage"
+]
+
+
+def with_columns(df: Optional[pd.DataFrame], columns: list) -> pd.DataFrame:
+    """Asegurar que un DataFrame (posiblemente vacío) tenga las columnas dadas"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columns)
+
+    df = df.copy()
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None
+    return df
+
+
+def session_contributions(
+    sessions: pd.DataFrame,
+    links: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Repartir cada sesión entre los hábitos vinculados a su actividad
+
+    Args:
+        sessions: Sesiones (id, activity_id, session_date, duration_minutes)
+        links: Vínculos (habit_id, activity_id, weight)
+
+    Returns:
+        DataFrame con una fila por (sesión, hábito) y contributed_minutes
+    """
+    sessions = with_columns(sessions, ["id", "activity_id", "session_date", "duration_minutes"])
+    links = with_columns(links, ["habit_id", "activity_id", "weight"])
+
+    contributions = sessions.rename(columns={"id": "session_id"}).merge(
+        links[["habit_id", "activity_id", "weight"]],
+        on="activity_id",
+        how="inner"
+    )
+    contributions["contributed_minutes"] = (
+        contributions["duration_minutes"].astype(float) * contributions["weight"].astype(float)
+    )
+    return contributions
+
+
+def habit_progress(
+    habits: pd.DataFrame,
+    metrics: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Vista habit_progress: hábitos del usuario con sus métricas
+
+    Args:
+        habits: Tabla habits del usuario
+        metrics: Tabla habit_metrics de esos hábitos
+
+    Returns:
+        DataFrame con columnas de habits + métricas (0 si no hay fila)
+    """
+    habits = with_columns(habits, ["id", "name", "total_hours_goal"])
+    metrics = with_columns(metrics, ["habit_id"] + METRIC_COLUMNS)
+
+    progress = habits.merge(
+        metrics[["habit_id"] + METRIC_COLUMNS],
+        left_on="id",
+        right_on="habit_id",
+        how="left"
+    ).drop(columns=["habit_id"])
+
+    progress[METRIC_COLUMNS] = progress[METRIC_COLUMNS].fillna(0)
+    return progress
+
+
+def weekly_summary(
+    habits: pd.DataFrame,
+    links: pd.DataFrame,
+    sessions: pd.DataFrame,
+    reference_date: date = None
+) -> pd.DataFrame:
+    """
+    Vista weekly_summary: minutos ponderados de la semana por hábito activo
+
+    Args:
+        habits: Tabla habits del usuario
+        links: Vínculos habit_activities
+        sessions: Sesiones del usuario
+        reference_date: Fecha dentro de la semana (default: hoy)
+
+    Returns:
+        DataFrame con habit_id, name, target/max semanales y minutes_this_week
+    """
+    habits = with_columns(habits, [
+        "id", "user_id", "name", "target_minutes_per_week", "max_minutes_per_week", "is_active"
+    ])
+    habits = habits[habits["is_active"].fillna(False).astype(bool)]
+
+    week_start, week_end = get_week_boundaries(reference_date)
+    sessions = with_columns(sessions, ["id", "activity_id", "session_date", "duration_minutes"])
+    session_dates = pd.to_datetime(sessions["session_date"]).dt.date
+    this_week = sessions[(session_dates >= week_start) & (session_dates <= week_end)]
+
+    minutes = session_contributions(this_week, links).groupby("habit_id")[
+        "contributed_minutes"
+    ].sum()
+
+    summary = habits[[
+        "id", "user_id", "name", "target_minutes_per_week", "max_minutes_per_week"
+    ]].rename(columns={"id": "habit_id"})
+    summary["minutes_this_week"] = summary["habit_id"].map(minutes).fillna(0).round().astype(int)
+    return summary.reset_index(drop=True)
+
+
+def activity_habit_matrix(
+    activities: pd.DataFrame,
+    links: pd.DataFrame,
+    habits: pd.DataFrame,
+    sessions: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Vista activity_habit_matrix: resumen de vínculos y tiempo por actividad
+
+    Returns:
+        DataFrame con id, user_id, activity_name, number_of_habits,
+        benefited_habits, total_sessions y total_minutes
+    """
+    activities = with_columns(activities, ["id", "user_id", "name"])
+    links = with_columns(links, ["habit_id", "activity_id", "weight"])
+    habits = with_columns(habits, ["id", "name"])
+    sessions = with_columns(sessions, ["id", "activity_id", "duration_minutes"])
+
+    named_links = links.merge(
+        habits[["id", "name"]].rename(columns={"id": "habit_id", "name": "habit_name"}),
+        on="habit_id",
+        how="left"
+    )
+    link_stats = named_links.groupby("activity_id").agg(
+        number_of_habits=("habit_id", "count"),
+        benefited_habits=("habit_name", lambda names: ", ".join(sorted(names.dropna())))
+    )
+    session_stats = sessions.groupby("activity_id").agg(
+        total_sessions=("id", "count"),
+        total_minutes=("duration_minutes", "sum")
+    )
+
+    matrix = activities[["id", "user_id", "name"]].rename(columns={"name": "activity_name"})
+    matrix = matrix.join(link_stats, on="id").join(session_stats, on="id")
+    matrix["number_of_habits"] = matrix["number_of_habits"].fillna(0).astype(int)
+    matrix["total_sessions"] = matrix["total_sessions"].fillna(0).astype(int)
+    matrix["total_minutes"] = matrix["total_minutes"].fillna(0)
+    matrix["benefited_habits"] = matrix["benefited_habits"].fillna("")
+    return matrix.reset_index(drop=True)
+
+
+def activity_habit_contribution(
+    activities: pd.DataFrame,
+    links: pd.DataFrame,
+    habits: pd.DataFrame,
+    sessions: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Vista activity_habit_contribution: una fila por sesión y hábito beneficiado
+
+    Returns:
+        DataFrame con session_id, session_date, activity_id, activity_name,
+        habit_id, habit_name, duration_minutes, weight y contributed_minutes
+    """
+    activities = with_columns(activities, ["id", "name"])
+    habits = with_columns(habits, ["id", "name"])
+
+    contributions = session_contributions(sessions, links)
+    contributions = contributions.merge(
+        activities[["id", "name"]].rename(columns={"id": "activity_id", "name": "activity_name"}),
+        on="activity_id",
+        how="left"
+    ).merge(
+        habits[["id", "name"]].rename(columns={"id": "habit_id", "name": "habit_name"}),
+        on="habit_id",
+        how="left"
+    )
+
+    return contributions[[
+        "session_id", "session_date", "activity_id", "activity_name",
+        "habit_id", "habit_name", "duration_minutes", "weight", "contributed_minutes"
+    ]].reset_index(drop=True)
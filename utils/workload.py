@@ -0,0 +1,602 @@
+"""
+=============================================================================
+GENERADOR DE CARGA SINTÉTICA - HABIT TRACKER
+=============================================================================
+Genera datos realistas y reproducibles (misma semilla = mismos datos) para
+dimensionar la app y alimentar los benchmarks:
+
+- usuarios con un nivel de actividad sesgado (lognormal: pocos usuarios
+  intensivos, muchos ocasionales)
+- hábitos y actividades por usuario, vínculos muchos-a-muchos con peso
+- años de sesiones diarias con duración lognormal, actividades elegidas con
+  sesgo tipo Zipf y mood/productividad correlacionados
+
+Cada usuario se genera por separado (la memoria no crece con el número de
+usuarios) y se carga por las rutas masivas del backend:
+set_activity_links por actividad y register_sessions_bulk por lotes. Los IDs
+de las sesiones salen de la semilla, así que repetir una carga no duplica
+datos.
+
+Uso desde la línea de comandos (backend según HABIT_DB_BACKEND):
+
+    python -m utils.workload --size medium --seed 7
+    python -m utils.workload --size huge --users 50 --set activity_skew=1.5 --dry-run
+"""
+
+import argparse
+import getpass
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, Optional
+import numpy as np
+import pandas as pd
+
+from utils.database import BULK_CHUNK_SIZE, get_db
+
+# Tamaños predefinidos (por usuario, salvo "users")
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "small": {
+        "users": 3,
+        "habits_per_user": 4,
+        "activities_per_user": 6,
+        "links_per_activity": 1.5,
+        "days": 90,
+        "sessions_per_active_day": 1.5
+    },
+    "medium": {
+        "users": 100,
+        "habits_per_user": 12,
+        "activities_per_user": 20,
+        "links_per_activity": 2.0,
+        "days": 365,
+        "sessions_per_active_day": 2.5
+    },
+    "huge": {
+        "users": 2000,
+        "habits_per_user": 40,
+        "activities_per_user": 60,
+        "links_per_activity": 3.0,
+        "days": 3 * 365,
+        "sessions_per_active_day": 4.0
+    }
+}
+
+# Distribuciones (ajustables con make_profile o --set)
+DEFAULT_DISTRIBUTIONS: Dict[str, Any] = {
+    # Sigma lognormal del nivel de actividad de cada usuario (0 = todos iguales)
+    "user_skew": 0.6,
+    # Exponente Zipf de la preferencia por actividades (0 = uniforme)
+    "activity_skew": 1.1,
+    # Probabilidad de registrar algo un día cualquiera (usuario promedio)
+    "active_day_rate": 0.7,
+    # Duración lognormal: media en minutos y sigma
+    "duration_mean": 45.0,
+    "duration_sigma": 0.6,
+    # Fracción de sesiones con mood/productividad y con notas
+    "mood_rate": 0.8,
+    "notes_rate": 0.1,
+    # Fracción de hábitos desactivados
+    "inactive_habit_rate": 0.1
+}
+
+HABIT_NAMES = [
+    "Leer", "Ejercicio", "Meditar", "Programar", "Inglés", "Guitarra", "Escribir",
+    "Cocinar", "Dormir bien", "Ahorrar", "Dibujar", "Estudiar", "Correr 10K", "Fotografía"
+]
+
+ACTIVITY_NAMES = [
+    "Correr", "Leer un libro", "Curso online", "Practicar guitarra", "Yoga", "Escribir diario",
+    "Podcast", "Gimnasio", "Meditación guiada", "Proyecto personal", "Caminar", "Clase de idiomas",
+    "Bicicleta", "Tutorial", "Cocinar receta nueva", "Revisar presupuesto"
+]
+
+NOTES = [
+    "Buena sesión", "Me costó concentrarme", "Avancé bastante", "Poco tiempo hoy",
+    "Repasé lo anterior", "Muy productivo"
+]
+
+TARGET_MINUTES_CHOICES = [150, 210, 300, 420, 600]
+HOURS_GOAL_CHOICES = [20, 50, 100, 200, 500]
+LINK_WEIGHT_CHOICES = [0.25, 0.5, 0.75, 1.0]
+
+# Probabilidades de mood 1..5
+MOOD_PROBABILITIES = [0.05, 0.1, 0.3, 0.35, 0.2]
+
+SYSTEM_CATEGORY_IDS = [1, 2, 3, 4, 5, 6]
+
+# Espacio de nombres de los ids de sesiones sintéticas
+WORKLOAD_ID_NAMESPACE = uuid.UUID("3d0c7e2a-9b41-4f6e-8a55-1c2e7b9d4f60")
+
+
+def make_profile(size: str = "small", **overrides) -> Dict[str, Any]:
+    """
+    Construir un perfil de carga
+
+    Args:
+        size: "small", "medium" o "huge"
+        **overrides: Valores de PROFILES o DEFAULT_DISTRIBUTIONS a cambiar
+
+    Returns:
+        Diccionario con tamaños y distribuciones
+    """
+    if size not in PROFILES:
+        raise ValueError(f"Tamaño desconocido: {size} (usa {', '.join(PROFILES)})")
+
+    profile = {**DEFAULT_DISTRIBUTIONS, **PROFILES[size]}
+
+    unknown = set(overrides) - set(profile)
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos: {', '.join(sorted(unknown))}")
+
+    profile.update(overrides)
+    profile["size"] = size
+    return profile
+
+
+def _unique_names(pool: list, count: int) -> list:
+    """Nombres distintos: los del pool y luego numerados ("Leer 2")"""
+    return [
+        pool[i % len(pool)] + (f" {i // len(pool) + 1}" if i >= len(pool) else "")
+        for i in range(count)
+    ]
+
+
+def _count(rng: np.random.Generator, mean: float, scale: float, minimum: int = 1) -> int:
+    """Cantidad Poisson alrededor de mean·scale, acotada a [minimum, 3·mean]"""
+    drawn = rng.poisson(max(mean * scale, 0))
+    return int(np.clip(drawn, minimum, max(minimum, round(3 * mean))))
+
+
+# =============================================================================
+# GENERACIÓN
+# =============================================================================
+
+def generate_user(
+    profile: Dict[str, Any],
+    seed: int,
+    index: int,
+    today: date = None
+) -> Dict[str, Any]:
+    """
+    Generar los datos de un usuario
+
+    El resultado solo depende de (seed, index, perfil, today): se puede
+    regenerar cualquier usuario sin generar los anteriores.
+
+    Args:
+        profile: Resultado de make_profile
+        seed: Semilla de la carga
+        index: Número de usuario (0..users-1)
+        today: Último día con sesiones (default: hoy)
+
+    Returns:
+        Diccionario con email, full_name, level y DataFrames habits,
+        activities, links (activity_name, habit_name, weight) y sessions
+        (con activity_name en lugar de activity_id)
+    """
+    rng = np.random.default_rng([seed, index])
+    today = today or date.today()
+
+    # Nivel de actividad con media 1
+    sigma = profile["user_skew"]
+    level = float(rng.lognormal(-sigma ** 2 / 2, sigma)) if sigma > 0 else 1.0
+    scale = np.sqrt(level)
+
+    # Hábitos
+    habit_count = _count(rng, profile["habits_per_user"], scale)
+    targets = rng.choice(TARGET_MINUTES_CHOICES, habit_count)
+    habits = pd.DataFrame({
+        "name": _unique_names(HABIT_NAMES, habit_count),
+        "category_id": rng.choice(SYSTEM_CATEGORY_IDS, habit_count),
+        "target_minutes_per_week": targets,
+        "max_minutes_per_week": targets * 2,
+        "total_hours_goal": rng.choice(HOURS_GOAL_CHOICES, habit_count),
+        "is_active": rng.random(habit_count) >= profile["inactive_habit_rate"]
+    })
+
+    # Actividades
+    activity_count = _count(rng, profile["activities_per_user"], scale)
+    activities = pd.DataFrame({
+        "name": _unique_names(ACTIVITY_NAMES, activity_count),
+        "category_id": rng.choice(SYSTEM_CATEGORY_IDS, activity_count)
+    })
+
+    # Vínculos: la primera meta de cada actividad con peso 1, el resto al azar
+    links = []
+    for activity in activities["name"]:
+        k = int(np.clip(1 + rng.poisson(max(profile["links_per_activity"] - 1, 0)), 1, habit_count))
+        chosen = rng.choice(habit_count, k, replace=False)
+        weights = [1.0] + list(rng.choice(LINK_WEIGHT_CHOICES, k - 1))
+        links.extend(
+            {"activity_name": activity, "habit_name": habits["name"].iat[h], "weight": float(w)}
+            for h, w in zip(chosen, weights)
+        )
+
+    sessions = _generate_sessions(rng, profile, level, activities["name"].tolist(), today, (seed, index))
+
+    return {
+        "index": index,
+        "email": f"workload+{seed}-{index}@example.com",
+        "full_name": f"Usuario {index + 1}",
+        "level": level,
+        "habits": habits,
+        "activities": activities,
+        "links": pd.DataFrame(links, columns=["activity_name", "habit_name", "weight"]),
+        "sessions": sessions
+    }
+
+
+def _generate_sessions(
+    rng: np.random.Generator,
+    profile: Dict[str, Any],
+    level: float,
+    activity_names: list,
+    today: date,
+    key: tuple
+) -> pd.DataFrame:
+    """Sesiones diarias de un usuario (vectorizado); key = (seed, index)"""
+    days = int(profile["days"])
+    active_rate = float(np.clip(profile["active_day_rate"] * level, 0.02, 0.98))
+
+    # Los días activos tienen al menos una sesión
+    active = rng.random(days) < active_rate
+    extra = rng.poisson(max(profile["sessions_per_active_day"] - 1, 0), days)
+    per_day = (1 + extra) * active
+    total = int(per_day.sum())
+
+    day_offsets = np.repeat(np.arange(days - 1, -1, -1), per_day)
+    session_dates = pd.Timestamp(today) - pd.to_timedelta(day_offsets, unit="D")
+
+    # Preferencia por actividades: peso 1/rango^skew con un orden al azar
+    ranks = rng.permutation(len(activity_names)) + 1
+    preference = 1.0 / ranks ** profile["activity_skew"]
+    picked = rng.choice(len(activity_names), total, p=preference / preference.sum())
+
+    mean, sigma = profile["duration_mean"], profile["duration_sigma"]
+    durations = rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, total)
+    durations = (np.clip(np.round(durations / 5) * 5, 5, 240)).astype(int)
+
+    hours = rng.integers(6, 23, total)
+    minutes = rng.choice([0, 15, 30, 45], total)
+
+    has_mood = rng.random(total) < profile["mood_rate"]
+    mood = rng.choice([1, 2, 3, 4, 5], total, p=MOOD_PROBABILITIES)
+    productivity = np.clip(mood + rng.integers(-1, 2, total), 1, 5)
+
+    has_notes = rng.random(total) < profile["notes_rate"]
+    notes = rng.choice(NOTES, total)
+
+    # IDs deterministas por (seed, index, días hacia atrás, orden en el día):
+    # recargar la misma semilla no duplica sesiones, tampoco otro día
+    ordinals = np.arange(total) - np.repeat(np.cumsum(per_day) - per_day, per_day)
+    ids = [
+        str(uuid.uuid5(WORKLOAD_ID_NAMESPACE, f"{key[0]}-{key[1]}-{offset}-{ordinal}"))
+        for offset, ordinal in zip(day_offsets, ordinals)
+    ]
+
+    return pd.DataFrame({
+        "id": ids,
+        "activity_name": np.asarray(activity_names, dtype=object)[picked],
+        "session_date": session_dates.strftime("%Y-%m-%d"),
+        "start_time": [f"{h:02d}:{m:02d}" for h, m in zip(hours, minutes)],
+        "duration_minutes": durations,
+        "mood": pd.Series(mood, dtype="Int64").where(has_mood),
+        "productivity_level": pd.Series(productivity, dtype="Int64").where(has_mood),
+        "notes": pd.Series(notes, dtype=object).where(has_notes, None)
+    })
+
+
+def generate_workload(
+    profile: Dict[str, Any],
+    seed: int,
+    today: date = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generar los usuarios de una carga, uno a la vez
+
+    Yields:
+        Datos de cada usuario (ver generate_user)
+    """
+    for index in range(int(profile["users"])):
+        yield generate_user(profile, seed, index, today)
+
+
+def dataset_summary(dataset: Dict[str, Any]) -> Dict[str, int]:
+    """Filas por tabla de un usuario generado"""
+    return {
+        "habits": len(dataset["habits"]),
+        "activities": len(dataset["activities"]),
+        "links": len(dataset["links"]),
+        "sessions": len(dataset["sessions"])
+    }
+
+
+# =============================================================================
+# CARGA
+# =============================================================================
+
+def ensure_user(db, email: str, password: str, full_name: str = None) -> Dict[str, Any]:
+    """
+    Iniciar sesión con un usuario de la carga, registrándolo si no existe
+
+    Args:
+        db: Backend compartido (get_db, SupabaseDB o MemoryDB)
+        email: Email del usuario
+        password: Contraseña
+        full_name: Nombre para el registro
+
+    Returns:
+        Diccionario con success, db (ligado al usuario), user_id y session,
+        o success y message si falla
+    """
+    auth = db.sign_in(email, password)
+
+    if not auth["success"]:
+        created = db.sign_up(email, password, full_name)
+        if not created["success"]:
+            return created
+        auth = db.sign_in(email, password)
+
+    if not auth["success"]:
+        return auth
+
+    user_id = auth["user"].id
+    return {
+        "success": True,
+        "db": db.for_user(auth["session"].access_token, user_id),
+        "user_id": user_id,
+        "session": auth["session"]
+    }
+
+
+def load_user(
+    db,
+    dataset: Dict[str, Any],
+    password: str,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Cargar un usuario generado en un backend
+
+    Reutiliza los hábitos y actividades que ya existen con el mismo nombre y
+    las sesiones ya cargadas se ignoran (IDs deterministas), así que una
+    carga interrumpida se puede repetir.
+
+    Args:
+        db: Backend compartido (get_db, SupabaseDB o MemoryDB)
+        dataset: Resultado de generate_user
+        password: Contraseña del usuario
+        chunk_size: Sesiones por petición
+
+    Returns:
+        Diccionario con success, email, user_id, habits, activities, links,
+        inserted, duplicates, rejected, failed y habits_recomputed
+    """
+    auth = ensure_user(db, dataset["email"], password, dataset["full_name"])
+    if not auth["success"]:
+        return {"success": False, "email": dataset["email"], "message": auth.get("message")}
+
+    user_db, user_id = auth["db"], auth["user_id"]
+    summary = {
+        "success": True,
+        "email": dataset["email"],
+        "user_id": user_id,
+        "habits": 0,
+        "activities": 0,
+        "links": 0
+    }
+
+    existing = user_db.get_user_habits(user_id, active_only=False, columns="list")
+    habit_ids = dict(zip(existing["name"], existing["id"])) if not existing.empty else {}
+
+    for habit in dataset["habits"].to_dict("records"):
+        if habit["name"] in habit_ids:
+            continue
+
+        created = user_db.create_habit(
+            user_id,
+            habit["name"],
+            target_minutes_per_week=int(habit["target_minutes_per_week"]),
+            max_minutes_per_week=int(habit["max_minutes_per_week"]),
+            total_hours_goal=int(habit["total_hours_goal"]),
+            category_id=int(habit["category_id"])
+        )
+        if created is None:
+            continue
+
+        habit_ids[habit["name"]] = created["id"]
+        summary["habits"] += 1
+
+        if not habit["is_active"]:
+            user_db.delete_habit(created["id"])
+
+    existing = user_db.get_user_activities(user_id, columns="list")
+    activity_ids = dict(zip(existing["name"], existing["id"])) if not existing.empty else {}
+
+    for activity in dataset["activities"].to_dict("records"):
+        if activity["name"] in activity_ids:
+            continue
+
+        created = user_db.create_activity(user_id, activity["name"], int(activity["category_id"]))
+        if created is not None:
+            activity_ids[activity["name"]] = created["id"]
+            summary["activities"] += 1
+
+    # Un set_activity_links (una transacción) por actividad
+    for activity, links in dataset["links"].groupby("activity_name"):
+        if activity not in activity_ids:
+            continue
+
+        weights = {
+            habit_ids[row.habit_name]: row.weight
+            for row in links.itertuples()
+            if row.habit_name in habit_ids
+        }
+        if weights and user_db.set_activity_links(activity_ids[activity], weights):
+            summary["links"] += len(weights)
+
+    sessions = dataset["sessions"].assign(
+        activity_id=dataset["sessions"]["activity_name"].map(activity_ids)
+    )
+    result = user_db.register_sessions_bulk(user_id, sessions, chunk_size=chunk_size)
+
+    summary.update({
+        "inserted": result["inserted"],
+        "duplicates": result["duplicates"],
+        "rejected": len(result["rejected"]),
+        "failed": result["failed"],
+        "habits_recomputed": result["habits_recomputed"]
+    })
+    return summary
+
+
+def load_workload(
+    db,
+    profile: Dict[str, Any],
+    seed: int,
+    password: str,
+    today: date = None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    workers: int = 1,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Generar y cargar una carga completa
+
+    Args:
+        db: Backend compartido (get_db, SupabaseDB o MemoryDB)
+        profile: Resultado de make_profile
+        seed: Semilla
+        password: Contraseña de todos los usuarios generados
+        today: Último día con sesiones (default: hoy)
+        chunk_size: Sesiones por petición
+        workers: Usuarios cargados en paralelo
+        on_progress: Función llamada con el resumen de cada usuario
+
+    Returns:
+        Diccionario con users (lista de {email, user_id}), totales por
+        tabla, failed_users y seconds
+    """
+    started = time.perf_counter()
+    totals = {
+        "users": [],
+        "habits": 0,
+        "activities": 0,
+        "links": 0,
+        "inserted": 0,
+        "duplicates": 0,
+        "rejected": 0,
+        "failed": 0,
+        "failed_users": 0
+    }
+
+    def load(index: int) -> Dict[str, Any]:
+        # Se genera dentro del hilo: solo hay workers usuarios en memoria
+        return load_user(db, generate_user(profile, seed, index, today), password, chunk_size)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="workload") as executor:
+        for summary in executor.map(load, range(int(profile["users"]))):
+            if not summary["success"]:
+                totals["failed_users"] += 1
+                print(f"❌ {summary['email']}: {summary.get('message')}", file=sys.stderr)
+                continue
+
+            totals["users"].append({"email": summary["email"], "user_id": summary["user_id"]})
+            for key in ("habits", "activities", "links", "inserted", "duplicates", "rejected", "failed"):
+                totals[key] += summary[key]
+
+            if on_progress:
+                on_progress(summary)
+
+    totals["seconds"] = round(time.perf_counter() - started, 2)
+    return totals
+
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+def _parse_overrides(pairs) -> Dict[str, Any]:
+    overrides = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        number = float(value)
+        overrides[key.strip()] = int(number) if number.is_integer() and "." not in value else number
+    return overrides
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generar y cargar datos sintéticos")
+    parser.add_argument("--size", choices=list(PROFILES), default="small", help="Tamaño predefinido")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla (misma semilla = mismos datos)")
+    parser.add_argument("--users", type=int, help="Número de usuarios (default: el del tamaño)")
+    parser.add_argument(
+        "--set",
+        action="append",
+        metavar="CLAVE=VALOR",
+        help="Cambiar un parámetro del perfil (p. ej. days=730, activity_skew=1.5)"
+    )
+    parser.add_argument("--today", type=date.fromisoformat, help="Último día con sesiones (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=4, help="Usuarios cargados en paralelo")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="Sesiones por petición")
+    parser.add_argument("--dry-run", action="store_true", help="Solo generar y contar, sin cargar")
+    args = parser.parse_args(argv)
+
+    try:
+        overrides = _parse_overrides(args.set)
+        if args.users is not None:
+            overrides["users"] = args.users
+
+        profile = make_profile(args.size, **overrides)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    if args.dry_run:
+        totals = {"habits": 0, "activities": 0, "links": 0, "sessions": 0}
+        for dataset in generate_workload(profile, args.seed, args.today):
+            for key, count in dataset_summary(dataset).items():
+                totals[key] += count
+
+        print(
+            f"✅ {profile['users']} usuarios · {totals['habits']} hábitos · "
+            f"{totals['activities']} actividades · {totals['links']} vínculos · "
+            f"{totals['sessions']} sesiones"
+        )
+        return 0
+
+    password = os.getenv("HABIT_CLI_PASSWORD") or getpass.getpass("Contraseña de los usuarios: ")
+
+    def report(summary: Dict[str, Any]) -> None:
+        print(
+            f"  {summary['email']}: {summary['habits']} hábitos, {summary['activities']} actividades, "
+            f"{summary['inserted']} sesiones",
+            flush=True
+        )
+
+    totals = load_workload(
+        get_db(),
+        profile,
+        args.seed,
+        password,
+        today=args.today,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        on_progress=report
+    )
+
+    print(
+        f"✅ {len(totals['users'])} usuarios cargados en {totals['seconds']}s: "
+        f"{totals['habits']} hábitos, {totals['activities']} actividades, {totals['links']} vínculos, "
+        f"{totals['inserted']} sesiones ({totals['duplicates']} ya existían, "
+        f"{totals['failed']} con error)"
+    )
+    return 0 if totals["failed_users"] == 0 and totals["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())